@@ -1,5 +1,7 @@
 import os
 import sqlite3
+import threading
+from urllib.request import pathname2url
 
 def get_db_path() -> str:
     return os.getenv("DB_PATH", "draftedi.db")
@@ -7,6 +9,20 @@ def get_db_path() -> str:
 def get_edi_db_path() -> str:
     return os.getenv("EDI_DB_BASE_PATH", "/var/www/draftedi/edi_db")
 
+def get_edi_mmap_size() -> int:
+    return int(os.getenv("EDI_DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+def edi_db_immutable() -> bool:
+    # immutable skips all locking and change detection; turn off if spec DBs are replaced while running
+    return os.getenv("EDI_DB_IMMUTABLE", "1").lower() not in ("0", "false", "no")
+
+def get_spec_store_path() -> str:
+    return os.getenv("SPEC_STORE_PATH") or os.path.join(get_edi_db_path(), "spec_store.db")
+
+def edi_db_exists(version: str) -> bool:
+    # sqlite3.connect would quietly create an empty file for an unknown version
+    return os.path.exists(os.path.join(get_edi_db_path(), f'x12-{version}.db'))
+
 def connect() -> sqlite3.Connection:
     conn = sqlite3.connect(get_db_path(), timeout=30)
     conn.row_factory = sqlite3.Row
@@ -25,4 +41,50 @@ def connect_edi(version: str) -> sqlite3.Connection:
     conn.execute("PRAGMA synchronous = NORMAL;")
     conn.execute("PRAGMA busy_timeout = 30000;")
 
-    return conn
\ No newline at end of file
+    return conn
+
+# The spec DBs are static reference data: read them through read-only (by default immutable)
+# URI connections with a large mmap window. connect_edi above is for maintenance only.
+def connect_edi_readonly(version: str) -> sqlite3.Connection:
+    return _connect_readonly(os.path.join(get_edi_db_path(), f'x12-{version}.db'))
+
+def _connect_readonly(path: str) -> sqlite3.Connection:
+    path = os.path.abspath(path)
+    mode = "mode=ro&immutable=1" if edi_db_immutable() else "mode=ro"
+    conn = sqlite3.connect(f"file:{pathname2url(path)}?{mode}", uri=True, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA mmap_size = {get_edi_mmap_size()};")
+    conn.execute("PRAGMA query_only = ON;")
+
+    return conn
+
+_edi_local = threading.local()
+_edi_generation = 0
+
+def get_edi_conn(version: str | None) -> sqlite3.Connection:
+    """
+    Read-only connection to a spec DB (version None: the consolidated spec store), opened once
+    per (thread, version) and reused across requests. Don't close it; call
+    close_edi_connections() after replacing an edi_db file.
+    """
+    conns = getattr(_edi_local, "conns", None)
+    if conns is None or _edi_local.generation != _edi_generation:
+        for conn in (conns or {}).values():
+            conn.close()
+        conns = _edi_local.conns = {}
+        _edi_local.generation = _edi_generation
+
+    conn = conns.get(version)
+    if conn is None:
+        conn = conns[version] = connect_edi_readonly(version) if version is not None else _connect_readonly(get_spec_store_path())
+
+    return conn
+
+def get_spec_store_conn() -> sqlite3.Connection:
+    """Read-only connection to the consolidated spec store (see app.db.spec_store), cached like get_edi_conn."""
+    return get_edi_conn(None)
+
+def close_edi_connections() -> None:
+    """Retire every cached spec DB connection; each thread reopens on its next get_edi_conn."""
+    global _edi_generation
+    _edi_generation += 1
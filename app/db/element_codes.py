@@ -0,0 +1,89 @@
+from app.db.conn import get_edi_conn
+from app.db.spec_snapshot import load_snapshot
+from app.db.spec_store import get_store_element_codes, get_store_segment_elements, store_has_version
+
+def get_element_codes(version, element_id):
+    """(code value, description) pairs for one element, in table order. Empty if it has no code list."""
+    if store_has_version(version):
+        return [(row['element_code_value'], row['element_code_content']) for row in get_store_element_codes(version, element_id=element_id)]
+
+    snapshot = load_snapshot(version)
+    if snapshot is not None:
+        return list(snapshot['codes'].get(str(element_id), []))
+
+    with get_edi_conn(version) as conn:
+        cursor = conn.cursor()
+
+        # element_codes.element_id is INTEGER for numeric ids; the bound text is converted by the column affinity
+        cursor.execute("""
+            SELECT
+                element_code_value,
+                element_code_content
+            FROM element_codes
+            WHERE element_id = ?
+            ORDER BY element_code_id
+        """, (
+            str(element_id),
+        ))
+
+        return [(row['element_code_value'], row['element_code_content']) for row in cursor.fetchall()]
+
+def get_all_element_codes(version):
+    """{element_id: [(code value, description), ...]} for every coded element of the version."""
+    if store_has_version(version):
+        codes = {}
+        for row in get_store_element_codes(version):
+            codes.setdefault(row['element_id'], []).append((row['element_code_value'], row['element_code_content']))
+        return codes
+
+    snapshot = load_snapshot(version)
+    if snapshot is not None:
+        return {element_id: list(rows) for element_id, rows in snapshot['codes'].items()}
+
+    with get_edi_conn(version) as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT
+                CAST(element_id AS TEXT) AS element_id,
+                element_code_value,
+                element_code_content
+            FROM element_codes
+            ORDER BY element_code_id
+        """)
+
+        codes = {}
+        for row in cursor.fetchall():
+            codes.setdefault(row['element_id'], []).append((row['element_code_value'], row['element_code_content']))
+
+        return codes
+
+def get_segment_element_id(version, segment_id, element_pos):
+    """element_id at position element_pos (1-based) of segment_id, e.g. ('N1', 1) -> '98'. None if unknown or composite."""
+    if store_has_version(version):
+        rows = get_store_segment_elements(version, segment_id=segment_id)
+    else:
+        snapshot = load_snapshot(version)
+        rows = snapshot['elements'].get(segment_id, []) if snapshot is not None else None
+
+    if rows is not None:
+        for row in rows:
+            if int(row['segment_element_sequence']) == element_pos:
+                return row['element_id']
+        return None
+
+    with get_edi_conn(version) as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT
+                element_id
+            FROM segment_elements
+            WHERE segment_id = ? AND CAST(segment_element_sequence AS INTEGER) = ?
+        """, (
+            segment_id,
+            element_pos,
+        ))
+
+        row = cursor.fetchone()
+        return row['element_id'] if row else None
@@ -0,0 +1,139 @@
+import json
+import time
+from datetime import datetime, timezone
+
+from app.db.conn import connect
+
+def _now_iso():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+def _job_dict(row):
+    job = dict(row)
+    job["validate"] = bool(job["validate"])
+    job["result"] = json.loads(job.pop("result_json")) if job["result_json"] else None
+    job["timings"] = json.loads(job.pop("timings_json")) if job["timings_json"] else None
+    return job
+
+def create_ingest_job(spool_path, filename=None, file_size=None, duplicate_policy=None, validate=False, conn=None):
+    """Queue a spooled upload; returns the job_id."""
+    if conn is None:
+        with connect() as conn:
+            return create_ingest_job(spool_path, filename, file_size, duplicate_policy, validate, conn)
+
+    cursor = conn.execute(
+        """
+        INSERT INTO ingest_jobs (status, spool_path, filename, file_size, duplicate_policy, validate, created_at)
+        VALUES ('queued', ?, ?, ?, ?, ?, ?)
+        """,
+        (spool_path, filename, file_size, duplicate_policy, int(validate), _now_iso()),
+    )
+    conn.commit()
+    return cursor.lastrowid
+
+def get_ingest_job(job_id, conn=None):
+    """The job row (result/timings decoded), or None."""
+    if conn is None:
+        with connect() as conn:
+            return get_ingest_job(job_id, conn)
+
+    row = conn.execute("SELECT * FROM ingest_jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return _job_dict(row) if row else None
+
+def claim_ingest_job(worker, lease_seconds, max_attempts, conn=None):
+    """
+    Take the oldest runnable job for worker: queued, or running with an expired lease (its worker
+    died). Jobs whose lease ran out max_attempts times are failed instead. Returns the claimed job
+    or None. One BEGIN IMMEDIATE transaction, so concurrent workers (threads or processes) never
+    claim the same job.
+    """
+    if conn is None:
+        with connect() as conn:
+            return claim_ingest_job(worker, lease_seconds, max_attempts, conn)
+
+    now = time.time()
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        cursor.execute(
+            """
+            UPDATE ingest_jobs
+            SET status = 'failed', error = ?, finished_at = ?, lease_until = NULL
+            WHERE status = 'running' AND lease_until < ? AND attempts >= ?
+            """,
+            (f"Abandoned after {max_attempts} attempts (worker stopped mid-job)", _now_iso(), now, max_attempts),
+        )
+
+        row = cursor.execute(
+            """
+            SELECT job_id
+            FROM ingest_jobs
+            WHERE status = 'queued' OR (status = 'running' AND lease_until < ?)
+            ORDER BY job_id
+            LIMIT 1
+            """,
+            (now,),
+        ).fetchone()
+
+        if row is None:
+            conn.commit()
+            return None
+
+        cursor.execute(
+            """
+            UPDATE ingest_jobs
+            SET status = 'running', attempts = attempts + 1, worker = ?, lease_until = ?, started_at = ?, error = NULL
+            WHERE job_id = ?
+            """,
+            (worker, now + lease_seconds, _now_iso(), row["job_id"]),
+        )
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+    return get_ingest_job(row["job_id"], conn)
+
+def renew_ingest_job_lease(job_id, worker, lease_seconds, conn=None):
+    """Extend a running job's lease; False if worker no longer holds it."""
+    if conn is None:
+        with connect() as conn:
+            return renew_ingest_job_lease(job_id, worker, lease_seconds, conn)
+
+    cursor = conn.execute(
+        "UPDATE ingest_jobs SET lease_until = ? WHERE job_id = ? AND worker = ? AND status = 'running'",
+        (time.time() + lease_seconds, job_id, worker),
+    )
+    conn.commit()
+    return cursor.rowcount == 1
+
+def finish_ingest_job(job_id, worker, status, result=None, timings=None, error=None, conn=None):
+    """
+    Record the outcome (succeeded / failed, or queued to retry) of a job worker still holds.
+    False if the lease was lost meanwhile and another worker owns the job now.
+    """
+    if conn is None:
+        with connect() as conn:
+            return finish_ingest_job(job_id, worker, status, result, timings, error, conn)
+
+    result = result or {}
+    cursor = conn.execute(
+        """
+        UPDATE ingest_jobs
+        SET status = ?, lease_until = NULL, file_hash = ?, file_id = ?, result_json = ?, timings_json = ?,
+            error = ?, finished_at = ?
+        WHERE job_id = ? AND worker = ? AND status = 'running'
+        """,
+        (
+            status,
+            result.get("file_hash"),
+            result.get("file_id"),
+            json.dumps(result) if result else None,
+            json.dumps(timings) if timings else None,
+            error,
+            _now_iso() if status != "queued" else None,
+            job_id,
+            worker,
+        ),
+    )
+    conn.commit()
+    return cursor.rowcount == 1
@@ -19,8 +19,8 @@ def create_transaction_set_mapping(transaction_set_map_dict):
     fields = (
         transaction_set_map_dict.get("interchange_set_id"),
         transaction_set_map_dict.get("mapping_name"),
-        template_json,
         transaction_set_map_dict.get("mapping_version", "1.0"),
+        template_json,
         sample_input,
         transaction_set_map_dict.get("sample_output_edi"),
         transaction_set_map_dict.get("is_active", 1),
@@ -1,12 +1,14 @@
 from app.db.conn import connect
 
-def lookup_trading_partner_and_interchange(isa_sender_id, isa_receiver_id, sender_qual, receiver_qual, gs_sender_id, gs_receiver_id):
+def lookup_trading_partner_and_interchange(isa_sender_id, isa_receiver_id, sender_qual, receiver_qual, gs_sender_id, gs_receiver_id, conn=None):
     """
     Best-effort mapping to your configured interchanges in trading_partners.db.
 
     Matches on:
       interchanges.isa_sender_id == ISA06 and interchanges.isa_receiver_id == ISA08
 
+    Pass conn to run on an existing connection instead of opening one.
+
     Returns: (partner_id, interchange_id) or (None, None)
     """
     def _clean(v):
@@ -19,10 +21,16 @@ def lookup_trading_partner_and_interchange(isa_sender_id, isa_receiver_id, sende
     gs_sender_id    = _clean(gs_sender_id)
     gs_receiver_id  = _clean(gs_receiver_id)
 
-    with connect() as conn:
-        cursor = conn.cursor()
+    if conn is None:
+        with connect() as conn:
+            return _lookup_interchange(conn, isa_sender_id, isa_receiver_id, sender_qual, receiver_qual, gs_sender_id, gs_receiver_id)
 
-        sql = """
+    return _lookup_interchange(conn, isa_sender_id, isa_receiver_id, sender_qual, receiver_qual, gs_sender_id, gs_receiver_id)
+
+def _lookup_interchange(conn, isa_sender_id, isa_receiver_id, sender_qual, receiver_qual, gs_sender_id, gs_receiver_id):
+    cursor = conn.cursor()
+
+    sql = """
             SELECT
                 i.interchange_id,
                 i.interchange_partner_id AS partner_id
@@ -35,19 +43,17 @@ def lookup_trading_partner_and_interchange(isa_sender_id, isa_receiver_id, sende
             AND i.gs_receiver_id = ?
             LIMIT 1
             """
-        
-
-        cursor.execute(
-            sql,
-            (isa_sender_id, isa_receiver_id, sender_qual, receiver_qual, gs_sender_id, gs_receiver_id),
-        )
+    
 
-        row = cursor.fetchone()
+    cursor.execute(
+        sql,
+        (isa_sender_id, isa_receiver_id, sender_qual, receiver_qual, gs_sender_id, gs_receiver_id),
+    )
 
-        print(row)
+    row = cursor.fetchone()
 
-        if not row:
-            return None, None
+    if not row:
+        return None, None
 
     return int(row["partner_id"]), int(row["interchange_id"])
 
@@ -1,4 +1,4 @@
-from app.db.conn import connect
+from app.db.conn import connect, connect_edi
 
 def create_tables() -> None:
     conn = connect()
@@ -187,10 +187,58 @@ def create_tables() -> None:
         );
     """)
 
+    # Durable upload queue (see app.services.ingest_jobs)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_jobs (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            status TEXT NOT NULL DEFAULT 'queued', -- queued | running | succeeded | failed
+            spool_path TEXT NOT NULL,
+            filename TEXT,
+            file_size INTEGER,
+            duplicate_policy TEXT,
+            validate INTEGER NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            worker TEXT,
+            lease_until REAL, -- unix time; a running job past its lease is picked up again
+            file_hash TEXT,
+            file_id INTEGER,
+            result_json TEXT,
+            timings_json TEXT,
+            error TEXT,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT
+        );
+    """)
+
     cur.execute("CREATE INDEX IF NOT EXISTS idx_edi_files_hash ON edi_files(file_hash);")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_edi_segments_tx_pos ON edi_segments(transaction_id, position);")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_edi_elements_seg_pos ON edi_elements(segment_row_id, element_pos);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_ingest_jobs_status ON ingest_jobs(status, job_id);")
+
+
+    conn.commit()
+    conn.close()
+
+def create_edi_indexes(version: str) -> None:
+    """
+    Maintenance for one spec DB (edi_db/x12-<version>.db): add the lookup indexes the spec
+    loaders need, refresh planner stats, and fold the WAL back into the file (rollback journal)
+    so it can be opened read-only/immutable.
+    """
+    conn = connect_edi(version)
+    cur = conn.cursor()
 
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tss_transaction_set ON transaction_set_segments(transaction_set_id, transaction_set_segment_id);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tss_segment ON transaction_set_segments(segment_id);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tss_notes_segment ON transaction_set_segment_notes(transaction_set_segment_id);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tss_rc_segment ON transaction_set_segment_relational_conditions(transaction_set_segment_id);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_segment_elements_segment ON segment_elements(segment_id, segment_element_id);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_segment_element_notes_element ON segment_element_notes(segment_element_id);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_element_codes_element ON element_codes(element_id);")
+    cur.execute("ANALYZE;")
 
     conn.commit()
+    cur.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+    cur.execute("PRAGMA journal_mode = DELETE;")
     conn.close()
@@ -0,0 +1,277 @@
+import hashlib
+import logging
+import os
+import pickle
+import sys
+import tempfile
+import threading
+from contextlib import closing
+
+from app.db.conn import connect_edi_readonly, edi_db_exists, get_edi_db_path
+
+# -------------------------
+# Precompiled spec snapshots
+# -------------------------
+# One pickle per edi_db/x12-<version>.db holding every table the spec loaders read, already
+# grouped by the keys they look up (transaction set, transaction_set_segment_id, segment_id,
+# segment_element_id, element_id). A worker loads a version with one file read instead of
+# walking SQLite. Each snapshot records the size, mtime and SHA-256 of its source DB; a snapshot
+# that no longer matches is rebuilt automatically.
+
+SNAPSHOT_FORMAT = 1
+
+logger = logging.getLogger(__name__)
+
+_snapshots = {}
+_lock = threading.Lock()
+
+def snapshots_enabled():
+    return os.getenv("SPEC_SNAPSHOTS", "1").lower() not in ("0", "false", "no")
+
+def get_snapshot_path():
+    return os.getenv("SPEC_SNAPSHOT_PATH") or os.path.join(get_edi_db_path(), "snapshots")
+
+def snapshot_file(version):
+    return os.path.join(get_snapshot_path(), f"x12-{version}.snapshot")
+
+def _source_file(version):
+    return os.path.join(get_edi_db_path(), f"x12-{version}.db")
+
+def _file_sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def source_checksum(version):
+    """(size, mtime_ns, sha256) of the source spec DB."""
+    path = _source_file(version)
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": _file_sha256(path)}
+
+_checksums = {}
+
+def spec_checksum(version):
+    """source_checksum, re-hashed only when the file's size or mtime changes (one stat per call)."""
+    stat = os.stat(_source_file(version))
+    checksum = _checksums.get(version)
+    if checksum is None or checksum["size"] != stat.st_size or checksum["mtime_ns"] != stat.st_mtime_ns:
+        checksum = _checksums[version] = source_checksum(version)
+    return checksum
+
+def _group(rows, key):
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row[key], []).append(row)
+    return grouped
+
+def build_snapshot(version):
+    """Read the whole spec DB for version (one query per table) into the snapshot dict."""
+    with closing(connect_edi_readonly(version)) as conn:
+        cursor = conn.cursor()
+
+        def _rows(sql):
+            cursor.execute(sql)
+            return [dict(row) for row in cursor.fetchall()]
+
+        transaction_sets = _rows("""
+            SELECT
+                transaction_set_id,
+                transaction_set_name,
+                transaction_set_functional_group_id,
+                transaction_set_purpose
+            FROM transaction_sets
+        """)
+
+        segments = _rows("""
+            SELECT
+                transaction_set_segment_id,
+                transaction_set_id,
+                segment_id,
+                segment_loop_id,
+                segment_sequence,
+                segment_area,
+                segment_requirement,
+                segment_maximum_use,
+                segment_loop_level,
+                segment_loop_repeat
+            FROM transaction_set_segments
+            ORDER BY transaction_set_segment_id
+        """)
+
+        notes = _rows("""
+            SELECT
+                transaction_set_segment_id,
+                transaction_set_segment_note_type,
+                transaction_set_segment_note_paragraph_number,
+                transaction_set_segment_note_content
+            FROM transaction_set_segment_notes
+            ORDER BY transaction_set_segment_id, rowid
+        """)
+
+        conditions = _rows("""
+            SELECT
+                transaction_set_segment_id,
+                transaction_set_segment_rc_elements,
+                transaction_set_segment_rc_type
+            FROM transaction_set_segment_relational_conditions
+            ORDER BY transaction_set_segment_id, rowid
+        """)
+
+        elements = _rows("""
+            SELECT
+                se.segment_element_id,
+                se.segment_id,
+                se.element_id,
+                se.segment_element_requirement,
+                se.segment_element_sequence,
+                se.segment_element_repetition_count,
+                e.element_name,
+                e.element_type,
+                e.element_definition,
+                e.element_max_length,
+                e.element_min_length,
+                e.element_code_count
+            FROM segment_elements as se
+            LEFT JOIN elements as e ON se.element_id = e.element_id
+            ORDER BY se.segment_element_id
+        """)
+
+        element_notes = _rows("""
+            SELECT
+                segment_element_id,
+                segment_element_note_content,
+                segment_element_note_paragraph_number,
+                segment_element_note_type
+            FROM segment_element_notes
+            ORDER BY segment_element_id, rowid
+        """)
+
+        # element_codes.element_id is stored as INTEGER for most rows
+        codes = _rows("""
+            SELECT
+                CAST(element_id AS TEXT) AS element_id,
+                element_code_value,
+                element_code_content
+            FROM element_codes
+            ORDER BY element_code_id
+        """)
+
+    # taken after the connection is closed, in case opening it touched the file
+    source = source_checksum(version)
+
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "python": sys.version_info[:2],
+        "version": version,
+        "source": source,
+        "transaction_sets": transaction_sets,
+        "segments": _group(segments, "transaction_set_id"),
+        "notes": _group(notes, "transaction_set_segment_id"),
+        "conditions": _group(conditions, "transaction_set_segment_id"),
+        "elements": _group(elements, "segment_id"),
+        "element_notes": _group(element_notes, "segment_element_id"),
+        "codes": {
+            element_id: [(row["element_code_value"], row["element_code_content"]) for row in rows]
+            for element_id, rows in _group(codes, "element_id").items()
+        },
+    }
+
+def write_snapshot(version, snapshot):
+    """Write atomically (temp file + rename) so concurrent workers never read a partial file."""
+    path = snapshot_file(version)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f".x12-{version}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    return path
+
+def read_snapshot(version):
+    """The stored snapshot for version, or None if it is missing, unreadable or stale."""
+    try:
+        with open(snapshot_file(version), "rb") as f:
+            snapshot = pickle.loads(f.read())
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return None
+
+    if snapshot.get("format") != SNAPSHOT_FORMAT or tuple(snapshot.get("python", ())) != sys.version_info[:2]:
+        return None
+
+    if not is_fresh(version, snapshot["source"]):
+        return None
+
+    return snapshot
+
+def is_fresh(version, source):
+    """Does the recorded source checksum still match the spec DB? Size/mtime first, SHA-256 if they moved."""
+    path = _source_file(version)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+
+    if stat.st_size != source["size"]:
+        return False
+    if stat.st_mtime_ns == source["mtime_ns"]:
+        return True
+
+    # touched but maybe not changed (copied back, restored from backup)
+    return _file_sha256(path) == source["sha256"]
+
+def load_snapshot(version):
+    """
+    Snapshot for version, loaded once per process. A missing or stale file is rebuilt from the
+    spec DB and written back (if the snapshot directory is not writable it is kept in memory).
+    Returns None when snapshots are disabled (SPEC_SNAPSHOTS=0) or there is no spec DB.
+    """
+    if not snapshots_enabled():
+        return None
+
+    snapshot = _snapshots.get(version)
+    if snapshot is not None:
+        return snapshot
+
+    with _lock:
+        snapshot = _snapshots.get(version)
+        if snapshot is not None:
+            return snapshot
+
+        if not edi_db_exists(version):
+            return None
+
+        snapshot = read_snapshot(version)
+        if snapshot is None:
+            snapshot = build_snapshot(version)
+            try:
+                write_snapshot(version, snapshot)
+            except OSError as e:
+                logger.warning("Spec snapshot for %s not written: %s", version, e)
+
+        _snapshots[version] = snapshot
+        return snapshot
+
+def forget_snapshots(version=None):
+    """Drop loaded snapshots from this process (all, or one version); the next use re-checks the file."""
+    with _lock:
+        if version is None:
+            _snapshots.clear()
+        else:
+            _snapshots.pop(version, None)
+
+def list_versions():
+    """Versions that have a spec DB, e.g. ['002001', ..., '004030']."""
+    versions = []
+    for name in sorted(os.listdir(get_edi_db_path())):
+        if name.startswith("x12-") and name.endswith(".db"):
+            versions.append(name[len("x12-"):-len(".db")])
+    return versions
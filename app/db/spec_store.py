@@ -0,0 +1,711 @@
+import logging
+import os
+import sqlite3
+import time
+
+from app.db.conn import connect_edi_readonly, get_edi_db_path, get_spec_store_conn, get_spec_store_path
+from app.db.spec_snapshot import source_checksum, spec_checksum
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# Consolidated spec store
+# -------------------------
+# One SQLite file holding every edi_db/x12-<version>.db, with each definition stored once and
+# shared by every version (and every set/segment/element) that uses it:
+#
+#   element_defs, code_defs                 an element definition, one code with its description
+#   code_lists                              ordered code_defs of an element's code list
+#   segment_element_defs (+ _notes)         one element row of a segment, with its notes
+#   segment_defs, segment_def_elements      a segment: name/purpose + ordered element rows
+#   structure_row_defs (+ _notes, _conds)   one transaction_set_segments row with notes/conditions
+#   structures                              a transaction set's ordered rows
+#   transaction_set_defs                    name / functional group / purpose
+#
+# The *_versions tables say which definition each version uses, with the version's original
+# ordering (position). Row ids (transaction_set_segment_id, segment_element_id) are exposed by
+# the API, so each version keeps the id of its first row; they are contiguous per set / per
+# segment in the source DBs (checked at build time), so row id = first id + ordinal.
+# Copied spec columns are declared without a type so values come back exactly as stored in
+# the source (segment_maximum_use mixes 12 and '>1').
+
+SCHEMA = (
+    """
+    CREATE TABLE spec_versions (
+        version TEXT PRIMARY KEY,
+        source_size INTEGER NOT NULL,
+        source_sha256 TEXT NOT NULL,
+        built_at TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE element_defs (
+        element_def_id INTEGER PRIMARY KEY,
+        element_id,
+        element_name,
+        element_type,
+        element_definition,
+        element_max_length,
+        element_min_length,
+        element_code_count
+    )
+    """,
+    """
+    CREATE TABLE code_defs (
+        code_def_id INTEGER PRIMARY KEY,
+        element_code_value,
+        element_code_content,
+        element_code_paragraph_number,
+        element_code_note_content,
+        element_code_note_paragraph_number
+    )
+    """,
+    """
+    CREATE TABLE code_lists (
+        code_list_id INTEGER NOT NULL,
+        ordinal INTEGER NOT NULL,
+        code_def_id INTEGER NOT NULL,
+        PRIMARY KEY (code_list_id, ordinal)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE element_versions (
+        version TEXT NOT NULL,
+        element_id TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        element_def_id INTEGER,
+        code_list_id INTEGER,
+        PRIMARY KEY (version, element_id)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE segment_element_defs (
+        segment_element_def_id INTEGER PRIMARY KEY,
+        element_id,
+        segment_element_requirement,
+        segment_element_sequence,
+        segment_element_repetition_count
+    )
+    """,
+    """
+    CREATE TABLE segment_element_def_notes (
+        segment_element_def_id INTEGER NOT NULL,
+        note_ordinal INTEGER NOT NULL,
+        segment_element_note_content,
+        segment_element_note_paragraph_number,
+        segment_element_note_type,
+        PRIMARY KEY (segment_element_def_id, note_ordinal)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE segment_defs (
+        segment_def_id INTEGER PRIMARY KEY,
+        segment_name,
+        segment_purpose
+    )
+    """,
+    """
+    CREATE TABLE segment_def_elements (
+        segment_def_id INTEGER NOT NULL,
+        ordinal INTEGER NOT NULL,
+        segment_element_def_id INTEGER NOT NULL,
+        PRIMARY KEY (segment_def_id, ordinal)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE segment_versions (
+        version TEXT NOT NULL,
+        segment_id NOT NULL,
+        position INTEGER NOT NULL,
+        segment_def_id INTEGER NOT NULL,
+        first_segment_element_id INTEGER,
+        PRIMARY KEY (version, segment_id)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE transaction_set_defs (
+        transaction_set_def_id INTEGER PRIMARY KEY,
+        transaction_set_id NOT NULL,
+        transaction_set_name,
+        transaction_set_functional_group_id,
+        transaction_set_purpose
+    )
+    """,
+    """
+    CREATE TABLE structure_row_defs (
+        row_def_id INTEGER PRIMARY KEY,
+        segment_id,
+        segment_loop_id,
+        segment_sequence,
+        segment_area,
+        segment_requirement,
+        segment_maximum_use,
+        segment_loop_level,
+        segment_loop_repeat
+    )
+    """,
+    """
+    CREATE TABLE structure_row_notes (
+        row_def_id INTEGER NOT NULL,
+        note_ordinal INTEGER NOT NULL,
+        transaction_set_segment_note_type,
+        transaction_set_segment_note_paragraph_number,
+        transaction_set_segment_note_content,
+        PRIMARY KEY (row_def_id, note_ordinal)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE structure_row_conditions (
+        row_def_id INTEGER NOT NULL,
+        condition_ordinal INTEGER NOT NULL,
+        transaction_set_segment_rc_elements,
+        transaction_set_segment_rc_type,
+        PRIMARY KEY (row_def_id, condition_ordinal)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE structures (
+        structure_id INTEGER NOT NULL,
+        ordinal INTEGER NOT NULL,
+        row_def_id INTEGER NOT NULL,
+        PRIMARY KEY (structure_id, ordinal)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE transaction_set_versions (
+        version TEXT NOT NULL,
+        transaction_set_id NOT NULL,
+        position INTEGER NOT NULL,
+        transaction_set_def_id INTEGER NOT NULL,
+        structure_id INTEGER NOT NULL,
+        first_segment_row_id INTEGER,
+        PRIMARY KEY (version, transaction_set_id)
+    ) WITHOUT ROWID
+    """,
+)
+
+# -------------------------
+# Build
+# -------------------------
+
+class _Interner:
+    """(kind, content tuple) -> definition id; insert() writes the definition the first time it is seen."""
+
+    def __init__(self):
+        self.ids = {}
+        self.counters = {}
+        self.hits = 0
+        self.misses = 0
+
+    def intern(self, kind, content, insert):
+        key = (kind, content)
+        def_id = self.ids.get(key)
+        if def_id is not None:
+            self.hits += 1
+            return def_id
+
+        self.misses += 1
+        def_id = self.ids[key] = insert(content)
+        return def_id
+
+    def next_id(self, kind):
+        self.counters[kind] = self.counters.get(kind, 0) + 1
+        return self.counters[kind]
+
+def _fetch(cursor, sql, params=()):
+    cursor.execute(sql, params)
+    return [tuple(row) for row in cursor.fetchall()]
+
+def _check_contiguous(ids, what):
+    if ids and ids != list(range(ids[0], ids[0] + len(ids))):
+        raise ValueError(f"{what}: row ids are not contiguous, can't be consolidated")
+
+def _read_version(version):
+    """Every table of one spec DB as tuples, grouped by the key the store links them on."""
+    source = connect_edi_readonly(version)
+    try:
+        src = source.cursor()
+        tables = {}
+
+        tables["codes"] = {}
+        for element_id, *code in _fetch(src, """
+            SELECT
+                CAST(element_id AS TEXT),
+                element_code_value,
+                element_code_content,
+                element_code_paragraph_number,
+                element_code_note_content,
+                element_code_note_paragraph_number
+            FROM element_codes
+            ORDER BY element_code_id
+        """):
+            tables["codes"].setdefault(element_id, []).append(tuple(code))
+
+        tables["elements"] = _fetch(src, """
+            SELECT
+                element_id,
+                element_name,
+                element_type,
+                element_definition,
+                element_max_length,
+                element_min_length,
+                element_code_count
+            FROM elements
+            ORDER BY rowid
+        """)
+
+        tables["segments"] = _fetch(src, "SELECT segment_id, segment_name, segment_purpose FROM segments ORDER BY rowid")
+
+        tables["segment_elements"] = {}
+        for segment_element_id, segment_id, *element in _fetch(src, """
+            SELECT
+                segment_element_id,
+                segment_id,
+                element_id,
+                segment_element_requirement,
+                segment_element_sequence,
+                segment_element_repetition_count
+            FROM segment_elements
+            ORDER BY segment_element_id
+        """):
+            tables["segment_elements"].setdefault(segment_id, []).append((segment_element_id, *element))
+
+        tables["segment_element_notes"] = {}
+        for segment_element_id, *note in _fetch(src, """
+            SELECT
+                segment_element_id,
+                segment_element_note_content,
+                segment_element_note_paragraph_number,
+                segment_element_note_type
+            FROM segment_element_notes
+            ORDER BY segment_element_id, rowid
+        """):
+            tables["segment_element_notes"].setdefault(segment_element_id, []).append(tuple(note))
+
+        tables["transaction_sets"] = _fetch(src, """
+            SELECT
+                transaction_set_id,
+                transaction_set_name,
+                transaction_set_functional_group_id,
+                transaction_set_purpose
+            FROM transaction_sets
+            ORDER BY rowid
+        """)
+
+        tables["transaction_set_segments"] = {}
+        for transaction_set_segment_id, transaction_set_id, *row in _fetch(src, """
+            SELECT
+                transaction_set_segment_id,
+                transaction_set_id,
+                segment_id,
+                segment_loop_id,
+                segment_sequence,
+                segment_area,
+                segment_requirement,
+                segment_maximum_use,
+                segment_loop_level,
+                segment_loop_repeat
+            FROM transaction_set_segments
+            ORDER BY transaction_set_segment_id
+        """):
+            tables["transaction_set_segments"].setdefault(transaction_set_id, []).append((transaction_set_segment_id, *row))
+
+        tables["segment_notes"] = {}
+        for transaction_set_segment_id, *note in _fetch(src, """
+            SELECT
+                transaction_set_segment_id,
+                transaction_set_segment_note_type,
+                transaction_set_segment_note_paragraph_number,
+                transaction_set_segment_note_content
+            FROM transaction_set_segment_notes
+            ORDER BY transaction_set_segment_id, rowid
+        """):
+            tables["segment_notes"].setdefault(transaction_set_segment_id, []).append(tuple(note))
+
+        tables["conditions"] = {}
+        for transaction_set_segment_id, *condition in _fetch(src, """
+            SELECT
+                transaction_set_segment_id,
+                transaction_set_segment_rc_elements,
+                transaction_set_segment_rc_type
+            FROM transaction_set_segment_relational_conditions
+            ORDER BY transaction_set_segment_id, rowid
+        """):
+            tables["conditions"].setdefault(transaction_set_segment_id, []).append(tuple(condition))
+
+        return tables
+    finally:
+        source.close()
+
+def _load_version(cursor, interner, version):
+    tables = _read_version(version)
+
+    checksum = source_checksum(version)
+    cursor.execute(
+        "INSERT INTO spec_versions VALUES (?, ?, ?, ?)",
+        (version, checksum["size"], checksum["sha256"], time.strftime("%Y-%m-%dT%H:%M:%S")),
+    )
+
+    def _insert_row(sql):
+        def _insert(content):
+            cursor.execute(sql, content)
+            return cursor.lastrowid
+        return _insert
+
+    def _insert_with_children(row_sql, child_sql, row_columns):
+        # content = (*row values, children); children are tuples written with their ordinal
+        def _insert(content):
+            cursor.execute(row_sql, content[:row_columns])
+            def_id = cursor.lastrowid
+            cursor.executemany(child_sql, [(def_id, ordinal, *child) for ordinal, child in enumerate(content[row_columns])])
+            return def_id
+        return _insert
+
+    def _insert_list(kind, sql):
+        def _insert(content):
+            list_id = interner.next_id(kind)
+            cursor.executemany(sql, [(list_id, ordinal, def_id) for ordinal, def_id in enumerate(content)])
+            return list_id
+        return _insert
+
+    insert_element = _insert_row("INSERT INTO element_defs VALUES (NULL, ?, ?, ?, ?, ?, ?, ?)")
+    insert_code = _insert_row("INSERT INTO code_defs VALUES (NULL, ?, ?, ?, ?, ?)")
+    insert_code_list = _insert_list("code_lists", "INSERT INTO code_lists VALUES (?, ?, ?)")
+    insert_segment_element = _insert_with_children(
+        "INSERT INTO segment_element_defs VALUES (NULL, ?, ?, ?, ?)",
+        "INSERT INTO segment_element_def_notes VALUES (?, ?, ?, ?, ?)",
+        4,
+    )
+    insert_segment = _insert_with_children(
+        "INSERT INTO segment_defs VALUES (NULL, ?, ?)",
+        "INSERT INTO segment_def_elements VALUES (?, ?, ?)",
+        2,
+    )
+    insert_transaction_set = _insert_row("INSERT INTO transaction_set_defs VALUES (NULL, ?, ?, ?, ?)")
+    insert_structure = _insert_list("structures", "INSERT INTO structures VALUES (?, ?, ?)")
+
+    def insert_structure_row(content):
+        cursor.execute("INSERT INTO structure_row_defs VALUES (NULL, ?, ?, ?, ?, ?, ?, ?, ?)", content[:8])
+        row_def_id = cursor.lastrowid
+        cursor.executemany(
+            "INSERT INTO structure_row_notes VALUES (?, ?, ?, ?, ?)",
+            [(row_def_id, ordinal, *note) for ordinal, note in enumerate(content[8])],
+        )
+        cursor.executemany(
+            "INSERT INTO structure_row_conditions VALUES (?, ?, ?, ?)",
+            [(row_def_id, ordinal, *condition) for ordinal, condition in enumerate(content[9])],
+        )
+        return row_def_id
+
+    def _code_list(codes):
+        code_def_ids = tuple(interner.intern("code_defs", code, insert_code) for code in codes)
+        return interner.intern("code_lists", code_def_ids, insert_code_list)
+
+    # elements and their code lists (plus code lists of elements missing from the elements table)
+    codes = tables["codes"]
+    element_rows = [(str(row[0]), row) for row in tables["elements"]]
+    element_rows += [(element_id, None) for element_id in codes if element_id not in {element_id for element_id, _ in element_rows}]
+
+    for position, (element_id, element) in enumerate(element_rows):
+        cursor.execute(
+            "INSERT INTO element_versions VALUES (?, ?, ?, ?, ?)",
+            (
+                version,
+                element_id,
+                position,
+                interner.intern("element_defs", element, insert_element) if element is not None else None,
+                _code_list(codes[element_id]) if element_id in codes else None,
+            ),
+        )
+
+    # segments (plus element rows of segments missing from the segments table)
+    segment_elements = tables["segment_elements"]
+    element_notes = tables["segment_element_notes"]
+    segments = list(tables["segments"])
+    segments += [(segment_id, None, None) for segment_id in segment_elements if segment_id not in {row[0] for row in segments}]
+
+    for position, (segment_id, name, purpose) in enumerate(segments):
+        rows = segment_elements.get(segment_id, [])
+        _check_contiguous([row[0] for row in rows], f"{version} segment {segment_id}")
+
+        element_def_ids = tuple(
+            interner.intern("segment_element_defs", (*row[1:], tuple(element_notes.get(row[0], ()))), insert_segment_element)
+            for row in rows
+        )
+        segment_def_id = interner.intern("segment_defs", (name, purpose, tuple((def_id,) for def_id in element_def_ids)), insert_segment)
+
+        cursor.execute(
+            "INSERT INTO segment_versions VALUES (?, ?, ?, ?, ?)",
+            (version, segment_id, position, segment_def_id, rows[0][0] if rows else None),
+        )
+
+    # transaction sets: header definition + structure of rows (each with its notes and conditions)
+    set_rows = tables["transaction_set_segments"]
+    segment_notes = tables["segment_notes"]
+    conditions = tables["conditions"]
+
+    for position, transaction_set in enumerate(tables["transaction_sets"]):
+        transaction_set_id = transaction_set[0]
+        rows = set_rows.get(transaction_set_id, [])
+        _check_contiguous([row[0] for row in rows], f"{version} transaction set {transaction_set_id}")
+
+        row_def_ids = tuple(
+            interner.intern(
+                "structure_row_defs",
+                (*row[1:], tuple(segment_notes.get(row[0], ())), tuple(conditions.get(row[0], ()))),
+                insert_structure_row,
+            )
+            for row in rows
+        )
+
+        cursor.execute(
+            "INSERT INTO transaction_set_versions VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                version,
+                transaction_set_id,
+                position,
+                interner.intern("transaction_set_defs", transaction_set, insert_transaction_set),
+                interner.intern("structures", row_def_ids, insert_structure),
+                rows[0][0] if rows else None,
+            ),
+        )
+
+def build_spec_store(versions, path=None, log=print):
+    """
+    Build the consolidated store from the given versions' spec DBs into path (default
+    SPEC_STORE_PATH). Written to a temp file and swapped in, so readers never see a partial
+    store. Returns {'versions', 'definitions_reused', 'definitions_stored', 'size'}.
+    """
+    path = path or get_spec_store_path()
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.unlink(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF;")
+        conn.execute("PRAGMA synchronous = OFF;")
+        cursor = conn.cursor()
+
+        for statement in SCHEMA:
+            cursor.execute(statement)
+
+        interner = _Interner()
+        for version in versions:
+            started = time.perf_counter()
+            _load_version(cursor, interner, version)
+            log(f"{version}: loaded in {time.perf_counter() - started:.2f}s")
+
+        conn.commit()
+        cursor.execute("ANALYZE;")
+        conn.commit()
+        cursor.execute("VACUUM;")
+    except BaseException:
+        conn.close()
+        os.unlink(tmp_path)
+        raise
+
+    conn.close()
+    os.replace(tmp_path, path)
+
+    return {
+        "versions": list(versions),
+        "definitions_reused": interner.hits,
+        "definitions_stored": interner.misses,
+        "size": os.path.getsize(path),
+    }
+
+# -------------------------
+# Read
+# -------------------------
+# Same row shapes as the per-version queries in app.db.transaction_sets / element_codes.
+
+def spec_store_enabled():
+    return os.getenv("SPEC_BACKEND", "").lower() == "store"
+
+# version -> source sha256 already reported as not matching the store
+_stale_versions = {}
+
+def store_has_version(version):
+    """
+    Serve version from the store? Only when SPEC_BACKEND=store, the store was built with it and
+    the edi_db file is still the one it was built from (spec_checksum against source_sha256).
+    A stale version falls back to the snapshot / spec DB until the store is rebuilt.
+    """
+    if not spec_store_enabled() or not os.path.exists(get_spec_store_path()):
+        return False
+
+    row = get_spec_store_conn().execute("SELECT source_sha256 FROM spec_versions WHERE version = ?", (version,)).fetchone()
+    if row is None:
+        return False
+
+    try:
+        sha256 = spec_checksum(version)["sha256"]
+    except OSError:
+        return False
+
+    if row[0] != sha256:
+        if _stale_versions.get(version) != sha256:
+            _stale_versions[version] = sha256
+            logger.warning("Spec store is out of date for %s (edi_db file changed); rebuild it with scripts/build_spec_store.py", version)
+        return False
+
+    return True
+
+def _rows(sql, params):
+    cursor = get_spec_store_conn().execute(sql, params)
+    return [dict(row) for row in cursor.fetchall()]
+
+def get_store_transaction_sets(version, transaction_set_id=None):
+    sql = """
+        SELECT
+            d.transaction_set_id,
+            d.transaction_set_name,
+            d.transaction_set_functional_group_id,
+            d.transaction_set_purpose
+        FROM transaction_set_versions as v
+        JOIN transaction_set_defs as d ON d.transaction_set_def_id = v.transaction_set_def_id
+        WHERE v.version = ?
+    """
+    if transaction_set_id is None:
+        return _rows(sql + " ORDER BY v.position", (version,))
+    return _rows(sql + " AND v.transaction_set_id = ?", (version, transaction_set_id))
+
+def get_store_segment_rows(version, transaction_set_id):
+    """transaction_set_segments rows of one set, in table order."""
+    return _rows("""
+        SELECT
+            v.first_segment_row_id + s.ordinal AS transaction_set_segment_id,
+            v.transaction_set_id,
+            r.segment_id,
+            r.segment_loop_id,
+            r.segment_sequence,
+            r.segment_area,
+            r.segment_requirement,
+            r.segment_maximum_use,
+            r.segment_loop_level,
+            r.segment_loop_repeat
+        FROM transaction_set_versions as v
+        JOIN structures as s ON s.structure_id = v.structure_id
+        JOIN structure_row_defs as r ON r.row_def_id = s.row_def_id
+        WHERE v.version = ? AND v.transaction_set_id = ?
+        ORDER BY s.ordinal
+    """, (version, transaction_set_id))
+
+def get_store_segment_notes(version, transaction_set_id):
+    return _rows("""
+        SELECT
+            v.first_segment_row_id + s.ordinal AS transaction_set_segment_id,
+            n.transaction_set_segment_note_type,
+            n.transaction_set_segment_note_paragraph_number,
+            n.transaction_set_segment_note_content
+        FROM transaction_set_versions as v
+        JOIN structures as s ON s.structure_id = v.structure_id
+        JOIN structure_row_notes as n ON n.row_def_id = s.row_def_id
+        WHERE v.version = ? AND v.transaction_set_id = ?
+        ORDER BY s.ordinal, n.note_ordinal
+    """, (version, transaction_set_id))
+
+def get_store_relational_conditions(version, transaction_set_id):
+    """Relational condition rows of one set, element lists unsplit ('05,04')."""
+    return _rows("""
+        SELECT
+            v.first_segment_row_id + s.ordinal AS transaction_set_segment_id,
+            c.transaction_set_segment_rc_elements,
+            c.transaction_set_segment_rc_type
+        FROM transaction_set_versions as v
+        JOIN structures as s ON s.structure_id = v.structure_id
+        JOIN structure_row_conditions as c ON c.row_def_id = s.row_def_id
+        WHERE v.version = ? AND v.transaction_set_id = ?
+        ORDER BY s.ordinal, c.condition_ordinal
+    """, (version, transaction_set_id))
+
+_SET_SEGMENT_IDS = """
+    SELECT DISTINCT r.segment_id
+    FROM transaction_set_versions as v
+    JOIN structures as s ON s.structure_id = v.structure_id
+    JOIN structure_row_defs as r ON r.row_def_id = s.row_def_id
+    WHERE v.version = ? AND v.transaction_set_id = ?
+"""
+
+def get_store_segment_elements(version, transaction_set_id=None, segment_id=None):
+    """segment_elements + elements rows for every segment used by a set (or one segment), by segment_element_id."""
+    if segment_id is not None:
+        where, params = "sv.segment_id = ?", (version, version, segment_id)
+    else:
+        where, params = f"sv.segment_id IN ({_SET_SEGMENT_IDS})", (version, version, version, transaction_set_id)
+
+    return _rows(f"""
+        SELECT
+            sv.first_segment_element_id + se.ordinal AS segment_element_id,
+            sv.segment_id,
+            e.element_id,
+            e.segment_element_requirement,
+            e.segment_element_sequence,
+            e.segment_element_repetition_count,
+            d.element_name,
+            d.element_type,
+            d.element_definition,
+            d.element_max_length,
+            d.element_min_length,
+            d.element_code_count
+        FROM segment_versions as sv
+        JOIN segment_def_elements as se ON se.segment_def_id = sv.segment_def_id
+        JOIN segment_element_defs as e ON e.segment_element_def_id = se.segment_element_def_id
+        LEFT JOIN element_versions as ev ON ev.version = ? AND ev.element_id = CAST(e.element_id AS TEXT)
+        LEFT JOIN element_defs as d ON d.element_def_id = ev.element_def_id
+        WHERE sv.version = ? AND {where}
+        ORDER BY segment_element_id
+    """, params)
+
+def get_store_segment_element_notes(version, transaction_set_id):
+    return _rows(f"""
+        SELECT
+            sv.first_segment_element_id + se.ordinal AS segment_element_id,
+            n.segment_element_note_content,
+            n.segment_element_note_paragraph_number,
+            n.segment_element_note_type
+        FROM segment_versions as sv
+        JOIN segment_def_elements as se ON se.segment_def_id = sv.segment_def_id
+        JOIN segment_element_def_notes as n ON n.segment_element_def_id = se.segment_element_def_id
+        WHERE sv.version = ? AND sv.segment_id IN ({_SET_SEGMENT_IDS})
+        ORDER BY segment_element_id, n.note_ordinal
+    """, (version, version, transaction_set_id))
+
+def get_store_element_codes(version, element_id=None, transaction_set_id=None):
+    """
+    (element_id, code value, description) rows in code-list order: for one element, for every
+    element used by a set, or (neither given) for the whole version.
+    """
+    sql = """
+        SELECT
+            ev.element_id,
+            c.element_code_value,
+            c.element_code_content
+        FROM element_versions as ev
+        JOIN code_lists as cl ON cl.code_list_id = ev.code_list_id
+        JOIN code_defs as c ON c.code_def_id = cl.code_def_id
+        WHERE ev.version = ?
+    """
+    if element_id is not None:
+        return _rows(sql + " AND ev.element_id = ? ORDER BY cl.ordinal", (version, str(element_id)))
+    if transaction_set_id is not None:
+        return _rows(sql + f"""
+            AND ev.element_id IN (
+                SELECT CAST(e.element_id AS TEXT)
+                FROM segment_versions as sv
+                JOIN segment_def_elements as se ON se.segment_def_id = sv.segment_def_id
+                JOIN segment_element_defs as e ON e.segment_element_def_id = se.segment_element_def_id
+                WHERE sv.version = ? AND sv.segment_id IN ({_SET_SEGMENT_IDS})
+            )
+            ORDER BY ev.position, cl.ordinal
+        """, (version, version, version, transaction_set_id))
+    return _rows(sql + " ORDER BY ev.position, cl.ordinal", (version,))
+
+def store_sizes():
+    """{'store': bytes, 'sources': bytes of the per-version DBs it replaces}."""
+    versions = [row["version"] for row in _rows("SELECT version FROM spec_versions", ())]
+    return {
+        "store": os.path.getsize(get_spec_store_path()),
+        "sources": sum(os.path.getsize(os.path.join(get_edi_db_path(), f"x12-{version}.db")) for version in versions),
+    }
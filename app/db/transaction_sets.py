@@ -1,4 +1,15 @@
-from app.db.conn import connect_edi
+from app.db.conn import get_edi_conn
+from app.db.spec_snapshot import load_snapshot
+from app.db.spec_store import (
+    get_store_element_codes,
+    get_store_relational_conditions,
+    get_store_segment_element_notes,
+    get_store_segment_elements,
+    get_store_segment_notes,
+    get_store_segment_rows,
+    get_store_transaction_sets,
+    store_has_version,
+)
 
 AREA_MAP = {
     1: 'header',
@@ -6,9 +17,31 @@ AREA_MAP = {
     3: 'summary'
 }
 
+# columns of the row lists handed to the loop-path compiler, validator and spec diff
+LOOP_ROW_COLUMNS = ('transaction_set_segment_id', 'segment_id', 'segment_loop_id')
+RULE_SEGMENT_COLUMNS = ('transaction_set_segment_id', 'segment_id', 'segment_loop_id', 'segment_requirement', 'segment_maximum_use')
+RULE_ELEMENT_COLUMNS = (
+    'segment_id', 'element_id', 'segment_element_requirement', 'segment_element_sequence',
+    'element_type', 'element_max_length', 'element_min_length', 'element_code_count',
+)
+SPEC_SEGMENT_COLUMNS = (
+    'transaction_set_segment_id', 'segment_id', 'segment_loop_id', 'segment_sequence', 'segment_area',
+    'segment_requirement', 'segment_maximum_use', 'segment_loop_repeat',
+)
+SPEC_ELEMENT_COLUMNS = (
+    'segment_id', 'element_id', 'segment_element_requirement', 'segment_element_sequence',
+    'segment_element_repetition_count', 'element_name', 'element_type', 'element_max_length', 'element_min_length',
+)
+
 def get_all_transaction_sets(version):
+    if store_has_version(version):
+        return get_store_transaction_sets(version)
+
+    snapshot = load_snapshot(version)
+    if snapshot is not None:
+        return [dict(row) for row in snapshot['transaction_sets']]
 
-    with connect_edi(version) as conn:
+    with get_edi_conn(version) as conn:
         cursor = conn.cursor()
 
         cursor.execute("""
@@ -26,7 +59,14 @@ def get_all_transaction_sets(version):
         return rows
 
 def get_transaction_set(version, transaction_set_id):
-    with connect_edi(version) as conn:
+    if store_has_version(version):
+        return _store_transaction_set(version, transaction_set_id)
+
+    snapshot = load_snapshot(version)
+    if snapshot is not None:
+        return _snapshot_transaction_set(snapshot, transaction_set_id)
+
+    with get_edi_conn(version) as conn:
         cursor = conn.cursor()
 
         cursor.execute("""
@@ -71,6 +111,16 @@ def get_transaction_set_segments(cursor, transaction_set_id):
 
     rows = [dict(row) for row in cursor.fetchall()]
 
+    # notes, conditions, elements and element notes for the whole set: one query per table
+    # instead of one per segment/element
+    notes_by_segment = _group_rows(get_transaction_set_notes_bulk(cursor, transaction_set_id), 'transaction_set_segment_id')
+    conditions_by_segment = _group_rows(get_transaction_set_relational_conditions_bulk(cursor, transaction_set_id), 'transaction_set_segment_id')
+    elements_by_segment = _group_rows(get_segment_elements_bulk(cursor, transaction_set_id), 'segment_id')
+
+    return _assemble_segments(rows, notes_by_segment, conditions_by_segment, elements_by_segment)
+
+def _assemble_segments(rows, notes_by_segment, conditions_by_segment, elements_by_segment):
+    """Nest segment rows into loops (marker rows open/close a loop) and attach notes, conditions and elements."""
     for row in rows:
         row['segment_area_name'] = AREA_MAP.get(row.get('segment_area'))
 
@@ -99,9 +149,13 @@ def get_transaction_set_segments(cursor, transaction_set_id):
             #skip adding marker rows
             continue
 
-        row['segment_notes'] = get_transaction_set_segment_notes(cursor, transaction_set_segment_id)
-        row['segment_relational_conditions'] = get_transaction_set_relational_conditions(cursor, transaction_set_segment_id)
-        row['segment_elements'] = get_segment_elements(cursor, segment_id)
+        row['segment_notes'] = notes_by_segment.get(transaction_set_segment_id, [])
+        row['segment_relational_conditions'] = conditions_by_segment.get(transaction_set_segment_id, [])
+        # a segment used more than once in the set gets its own copy, as with per-row queries
+        row['segment_elements'] = [
+            dict(element, segment_element_notes=list(element['segment_element_notes']))
+            for element in elements_by_segment.get(segment_id, [])
+        ]
         
         if loop_stack:
             #inside loop: attach to top loop
@@ -118,49 +172,57 @@ def get_transaction_set_segments(cursor, transaction_set_id):
 
     return final_rows if final_rows else None
 
-def get_transaction_set_segment_notes(cursor, transaction_set_segment_id):
+def _project(rows, columns):
+    return [{column: row[column] for column in columns} for row in rows]
+
+def _group_rows(rows, key):
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row[key], []).append(row)
+    return grouped
 
+def get_transaction_set_notes_bulk(cursor, transaction_set_id):
+    """Notes of every segment in the set: transaction_set_segment_id, note type, paragraph number and content."""
     cursor.execute("""
         SELECT 
-            transaction_set_segment_id,
-            transaction_set_segment_note_type,
-            transaction_set_segment_note_paragraph_number,
-            transaction_set_segment_note_content
-        FROM transaction_set_segment_notes
-        WHERE transaction_set_segment_id = ? 
-        ORDER BY transaction_set_segment_id
+            n.transaction_set_segment_id,
+            n.transaction_set_segment_note_type,
+            n.transaction_set_segment_note_paragraph_number,
+            n.transaction_set_segment_note_content
+        FROM transaction_set_segment_notes as n
+        JOIN transaction_set_segments as tss ON tss.transaction_set_segment_id = n.transaction_set_segment_id
+        WHERE tss.transaction_set_id = ?
+        ORDER BY n.transaction_set_segment_id, n.rowid
     """, (
-        transaction_set_segment_id,
+        transaction_set_id,
     ))
 
-    rows = [dict(row) for row in cursor.fetchall()]
-
-    return rows
-
-def get_transaction_set_relational_conditions(cursor, transaction_set_segment_id):
+    return [dict(row) for row in cursor.fetchall()]
 
+def get_transaction_set_relational_conditions_bulk(cursor, transaction_set_id):
+    """Relational conditions of every segment in the set; transaction_set_segment_rc_elements is split into a list of element refs."""
     cursor.execute("""
         SELECT 
-            transaction_set_segment_id,
-            transaction_set_segment_rc_elements,
-            transaction_set_segment_rc_type
-        FROM transaction_set_segment_relational_conditions
-        WHERE transaction_set_segment_id = ? 
-        ORDER BY transaction_set_segment_id
+            rc.transaction_set_segment_id,
+            rc.transaction_set_segment_rc_elements,
+            rc.transaction_set_segment_rc_type
+        FROM transaction_set_segment_relational_conditions as rc
+        JOIN transaction_set_segments as tss ON tss.transaction_set_segment_id = rc.transaction_set_segment_id
+        WHERE tss.transaction_set_id = ?
+        ORDER BY rc.transaction_set_segment_id, rc.rowid
     """, (
-        transaction_set_segment_id,
+        transaction_set_id,
     ))
 
     rows = [dict(row) for row in cursor.fetchall()]
-    
-    if rows:
-        for row in rows:
-            row['transaction_set_segment_rc_elements'] = [element.strip() for element in row['transaction_set_segment_rc_elements'].split(',')]
 
-    return rows
+    for row in rows:
+        row['transaction_set_segment_rc_elements'] = [element.strip() for element in row['transaction_set_segment_rc_elements'].split(',')]
 
+    return rows
 
-def get_segment_elements(cursor, segment_id):
+def get_segment_elements_bulk(cursor, transaction_set_id):
+    """Elements (with segment_element_notes) of every distinct segment used in the set."""
     cursor.execute("""
         SELECT 
             se.segment_element_id,
@@ -177,35 +239,252 @@ def get_segment_elements(cursor, segment_id):
             e.element_code_count
         FROM segment_elements as se
         LEFT JOIN elements as e ON se.element_id = e.element_id
-        WHERE segment_id = ? 
-        ORDER BY segment_element_id
+        WHERE se.segment_id IN (
+            SELECT DISTINCT segment_id FROM transaction_set_segments WHERE transaction_set_id = ?
+        )
+        ORDER BY se.segment_element_id
     """, (
-        segment_id,
+        transaction_set_id,
     ))
 
     rows = [dict(row) for row in cursor.fetchall()]
 
-    if rows:
-        for row in rows:
-            segment_element_id = row.get('segment_element_id')
-            row['segment_element_notes'] = get_segment_element_notes(cursor, segment_element_id)
-    
-    return rows
-
-def get_segment_element_notes(cursor, segment_element_id):
     cursor.execute("""
         SELECT 
-            segment_element_id,
-            segment_element_note_content,
-            segment_element_note_paragraph_number,
-            segment_element_note_type
-        FROM segment_element_notes
-        WHERE segment_element_id = ? 
-        ORDER BY segment_element_id
+            n.segment_element_id,
+            n.segment_element_note_content,
+            n.segment_element_note_paragraph_number,
+            n.segment_element_note_type
+        FROM segment_element_notes as n
+        JOIN segment_elements as se ON se.segment_element_id = n.segment_element_id
+        WHERE se.segment_id IN (
+            SELECT DISTINCT segment_id FROM transaction_set_segments WHERE transaction_set_id = ?
+        )
+        ORDER BY n.segment_element_id, n.rowid
     """, (
-        segment_element_id,
+        transaction_set_id,
     ))
 
-    rows = [dict(row) for row in cursor.fetchall()]  
+    notes_by_element = _group_rows([dict(row) for row in cursor.fetchall()], 'segment_element_id')
+
+    for row in rows:
+        row['segment_element_notes'] = notes_by_element.get(row['segment_element_id'], [])
 
     return rows
+
+def _store_transaction_set(version, transaction_set_id):
+    """get_transaction_set from the consolidated spec store."""
+    rows = get_store_transaction_sets(version, transaction_set_id)
+    if not rows:
+        return None
+    row = rows[0]
+
+    conditions = get_store_relational_conditions(version, transaction_set_id)
+    for condition in conditions:
+        condition['transaction_set_segment_rc_elements'] = [element.strip() for element in condition['transaction_set_segment_rc_elements'].split(',')]
+
+    element_notes = _group_rows(get_store_segment_element_notes(version, transaction_set_id), 'segment_element_id')
+    elements = get_store_segment_elements(version, transaction_set_id)
+    for element in elements:
+        element['segment_element_notes'] = element_notes.get(element['segment_element_id'], [])
+
+    row['segments'] = _assemble_segments(
+        get_store_segment_rows(version, transaction_set_id),
+        _group_rows(get_store_segment_notes(version, transaction_set_id), 'transaction_set_segment_id'),
+        _group_rows(conditions, 'transaction_set_segment_id'),
+        _group_rows(elements, 'segment_id'),
+    )
+
+    return row
+
+def _snapshot_transaction_set(snapshot, transaction_set_id):
+    """get_transaction_set from a loaded spec snapshot; rows are copied so callers can't change the snapshot."""
+    row = next((dict(ts) for ts in snapshot['transaction_sets'] if ts['transaction_set_id'] == transaction_set_id), None)
+    if row is None:
+        return None
+
+    rows = [dict(segment) for segment in snapshot['segments'].get(transaction_set_id, [])]
+    notes_by_segment = {}
+    conditions_by_segment = {}
+    elements_by_segment = {}
+
+    for segment in rows:
+        transaction_set_segment_id = segment['transaction_set_segment_id']
+        notes_by_segment[transaction_set_segment_id] = [dict(note) for note in snapshot['notes'].get(transaction_set_segment_id, [])]
+        conditions_by_segment[transaction_set_segment_id] = [
+            dict(condition, transaction_set_segment_rc_elements=[element.strip() for element in condition['transaction_set_segment_rc_elements'].split(',')])
+            for condition in snapshot['conditions'].get(transaction_set_segment_id, [])
+        ]
+
+        segment_id = segment['segment_id']
+        if segment_id is not None and segment_id not in elements_by_segment:
+            elements_by_segment[segment_id] = [
+                dict(element, segment_element_notes=[dict(note) for note in snapshot['element_notes'].get(element['segment_element_id'], [])])
+                for element in snapshot['elements'].get(segment_id, [])
+            ]
+
+    row['segments'] = _assemble_segments(rows, notes_by_segment, conditions_by_segment, elements_by_segment)
+
+    return row
+
+def get_transaction_set_loop_rows(version, transaction_set_id):
+    """Bare segment/loop-marker rows of one transaction set, in table order (loop-path compiler input)."""
+    segment_rows, _, _, _ = _transaction_set_rows(version, transaction_set_id)
+
+    return _project(segment_rows, LOOP_ROW_COLUMNS)
+
+def get_transaction_set_rule_rows(version, transaction_set_id):
+    """
+    Everything the validator compiles for one transaction set, in four queries:
+    (segment rows in table order, segment_elements + elements rows for every segment used,
+    element_codes rows for every coded element used, relational condition rows).
+    """
+    segment_rows, element_rows, code_rows, condition_rows = _transaction_set_rows(version, transaction_set_id, elements=True, rules=True)
+
+    return _project(segment_rows, RULE_SEGMENT_COLUMNS), _project(element_rows, RULE_ELEMENT_COLUMNS), code_rows, condition_rows
+
+def get_transaction_set_spec_rows(version, transaction_set_id):
+    """
+    Spec rows for comparing a transaction set across versions, two queries: (segment/loop-marker
+    rows in table order, segment_elements + elements rows for every segment used). Code lists
+    come from app.db.element_codes.
+    """
+    segment_rows, element_rows, _, _ = _transaction_set_rows(version, transaction_set_id, elements=True)
+
+    return _project(segment_rows, SPEC_SEGMENT_COLUMNS), _project(element_rows, SPEC_ELEMENT_COLUMNS)
+
+def _transaction_set_rows(version, transaction_set_id, elements=False, rules=False):
+    """
+    (segment rows, element rows, code rows, condition rows) of one transaction set from whichever
+    backend serves version: spec store, snapshot or spec DB. Element rows come with elements=True,
+    code and condition rows with rules=True; parts not asked for are None. Rows carry at least
+    SPEC_SEGMENT_COLUMNS / SPEC_ELEMENT_COLUMNS + RULE_ELEMENT_COLUMNS and may be the backend's
+    own dicts, so callers project them.
+    """
+    if store_has_version(version):
+        return _store_set_rows(version, transaction_set_id, elements, rules)
+
+    snapshot = load_snapshot(version)
+    if snapshot is not None:
+        return _snapshot_set_rows(snapshot, transaction_set_id, elements, rules)
+
+    return _db_set_rows(version, transaction_set_id, elements, rules)
+
+def _store_set_rows(version, transaction_set_id, elements, rules):
+    segment_rows = get_store_segment_rows(version, transaction_set_id)
+    element_rows = get_store_segment_elements(version, transaction_set_id) if elements else None
+    code_rows = condition_rows = None
+
+    if rules:
+        code_rows = _project(get_store_element_codes(version, transaction_set_id=transaction_set_id), ('element_id', 'element_code_value'))
+        condition_rows = get_store_relational_conditions(version, transaction_set_id)
+
+    return segment_rows, element_rows, code_rows, condition_rows
+
+def _snapshot_set_rows(snapshot, transaction_set_id, elements, rules):
+    segment_rows = snapshot['segments'].get(transaction_set_id, [])
+    element_rows = code_rows = condition_rows = None
+
+    if elements or rules:
+        segment_ids = {row['segment_id'] for row in segment_rows if row['segment_id'] is not None}
+        element_rows = sorted(
+            (element for segment_id in segment_ids for element in snapshot['elements'].get(segment_id, [])),
+            key=lambda element: element['segment_element_id'],
+        )
+
+    if rules:
+        element_ids = {element['element_id'] for element in element_rows if element['element_id'] is not None}
+        code_rows = [
+            {'element_id': element_id, 'element_code_value': value}
+            for element_id in element_ids
+            for value, _ in snapshot['codes'].get(element_id, [])
+        ]
+        condition_rows = [
+            dict(condition)
+            for row in segment_rows
+            for condition in snapshot['conditions'].get(row['transaction_set_segment_id'], [])
+        ]
+
+    return segment_rows, element_rows, code_rows, condition_rows
+
+def _db_set_rows(version, transaction_set_id, elements, rules):
+    element_rows = code_rows = condition_rows = None
+
+    with get_edi_conn(version) as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT
+                transaction_set_segment_id,
+                segment_id,
+                segment_loop_id,
+                segment_sequence,
+                segment_area,
+                segment_requirement,
+                segment_maximum_use,
+                segment_loop_repeat
+            FROM transaction_set_segments
+            WHERE transaction_set_id = ?
+            ORDER BY transaction_set_segment_id
+        """, (
+            transaction_set_id,
+        ))
+        segment_rows = [dict(row) for row in cursor.fetchall()]
+
+        if elements:
+            cursor.execute("""
+                SELECT
+                    se.segment_id,
+                    se.element_id,
+                    se.segment_element_requirement,
+                    se.segment_element_sequence,
+                    se.segment_element_repetition_count,
+                    e.element_name,
+                    e.element_type,
+                    e.element_max_length,
+                    e.element_min_length,
+                    e.element_code_count
+                FROM segment_elements as se
+                LEFT JOIN elements as e ON se.element_id = e.element_id
+                WHERE se.segment_id IN (
+                    SELECT DISTINCT segment_id FROM transaction_set_segments WHERE transaction_set_id = ?
+                )
+                ORDER BY se.segment_element_id
+            """, (
+                transaction_set_id,
+            ))
+            element_rows = [dict(row) for row in cursor.fetchall()]
+
+        if rules:
+            # element_codes.element_id is stored as INTEGER for most rows; IN applies the column's
+            # affinity to the subquery values, so this still matches and can use idx_element_codes_element
+            cursor.execute("""
+                SELECT
+                    CAST(element_id AS TEXT) AS element_id,
+                    element_code_value
+                FROM element_codes
+                WHERE element_id IN (
+                    SELECT DISTINCT se.element_id
+                    FROM segment_elements as se
+                    JOIN transaction_set_segments as tss ON tss.segment_id = se.segment_id
+                    WHERE tss.transaction_set_id = ?
+                )
+            """, (
+                transaction_set_id,
+            ))
+            code_rows = [dict(row) for row in cursor.fetchall()]
+
+            cursor.execute("""
+                SELECT
+                    rc.transaction_set_segment_id,
+                    rc.transaction_set_segment_rc_elements,
+                    rc.transaction_set_segment_rc_type
+                FROM transaction_set_segment_relational_conditions as rc
+                JOIN transaction_set_segments as tss ON tss.transaction_set_segment_id = rc.transaction_set_segment_id
+                WHERE tss.transaction_set_id = ?
+            """, (
+                transaction_set_id,
+            ))
+            condition_rows = [dict(row) for row in cursor.fetchall()]
+
+    return segment_rows, element_rows, code_rows, condition_rows
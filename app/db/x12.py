@@ -1,12 +1,91 @@
+import os
+import time
 from app.db.conn import connect
 
-def create_edi_file(file_dict):
-    """
-    file_dict expects:
-      partner_id, interchange_id, processed_at, filename, file_hash, raw_bytes (bytes),
-      parse_status, parse_error, processing_state, source
-    """
-    fields = (
+INSERT_EDI_FILE_SQL = """
+    INSERT INTO edi_files
+        (partner_id, interchange_id, processed_at, filename, file_hash, raw_bytes,
+            parse_status, parse_error, processing_state, source)
+    VALUES
+        (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# raw_bytes is reserved at its final size, then filled from a file through the blob API
+INSERT_EDI_FILE_ZEROBLOB_SQL = """
+    INSERT INTO edi_files
+        (partner_id, interchange_id, processed_at, filename, file_hash, raw_bytes,
+            parse_status, parse_error, processing_state, source)
+    VALUES
+        (?, ?, ?, ?, ?, zeroblob(?), ?, ?, ?, ?)
+"""
+
+# chunk size for streaming raw_bytes in from a file
+RAW_BYTES_CHUNK_SIZE = 1024 * 1024
+
+INSERT_EDI_INTERCHANGE_SQL = """
+    INSERT INTO edi_interchanges
+        (file_id, partner_id, interchange_id,
+        isa_control_number, isa_sender_qualifier, isa_sender_id, isa_receiver_qualifier, isa_receiver_id,
+        isa_date, isa_time, usage_indicator, version,
+        element_sep, component_sep, segment_term, repetition_sep, raw_isa)
+    VALUES
+        (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_FUNCTIONAL_GROUP_SQL = """
+    INSERT INTO edi_functional_groups
+        (edi_interchange_id, functional_id_code, gs_sender_id, gs_receiver_id,
+        group_control_number, x12_release, raw_gs_segment)
+    VALUES
+        (?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_TRANSACTION_SQL = """
+    INSERT INTO edi_transactions
+        (group_id, transaction_set_id, control_number, implementation_version,
+        segment_count_reported, raw_st_segment, raw_se_segment, ack_status)
+    VALUES
+        (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_SEGMENT_SQL = """
+    INSERT INTO edi_segments
+        (transaction_id, position, segment_id, loop_path, raw_segment)
+    VALUES
+        (?, ?, ?, ?, ?)
+"""
+
+INSERT_ELEMENT_SQL = """
+    INSERT INTO edi_elements
+        (segment_row_id, element_pos, is_composite, value_text, present, repetition_index)
+    VALUES
+        (?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_COMPONENT_SQL = """
+    INSERT INTO edi_components
+        (element_row_id, component_pos, value_text)
+    VALUES
+        (?, ?, ?)
+"""
+
+# Bulk variants carry the primary key explicitly so child rows can be linked without lastrowid
+BULK_INSERT_SEGMENT_SQL = """
+    INSERT INTO edi_segments
+        (segment_row_id, transaction_id, position, segment_id, loop_path, raw_segment)
+    VALUES
+        (?, ?, ?, ?, ?, ?)
+"""
+
+BULK_INSERT_ELEMENT_SQL = """
+    INSERT INTO edi_elements
+        (element_row_id, segment_row_id, element_pos, is_composite, value_text, present, repetition_index)
+    VALUES
+        (?, ?, ?, ?, ?, ?, ?)
+"""
+
+def _edi_file_fields(file_dict):
+    return (
         file_dict.get("partner_id"),
         file_dict.get("interchange_id"),
         file_dict.get("processed_at"),
@@ -19,27 +98,8 @@ def create_edi_file(file_dict):
         file_dict.get("source"),
     )
 
-    with connect() as conn:
-        cursor = conn.cursor()
-
-
-        cursor.execute("""
-            INSERT INTO edi_files
-                (partner_id, interchange_id, processed_at, filename, file_hash, raw_bytes,
-                    parse_status, parse_error, processing_state, source)
-            VALUES
-                (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, fields)
-
-        file_id = cursor.lastrowid
-        file_dict["file_id"] = file_id
-
-        conn.commit()
-
-    return file_dict
-
-def create_edi_interchange(interchange_dict):
-    fields = (
+def _edi_interchange_fields(interchange_dict):
+    return (
         interchange_dict.get("file_id"),
         interchange_dict.get("partner_id"),
         interchange_dict.get("interchange_id"),
@@ -61,28 +121,8 @@ def create_edi_interchange(interchange_dict):
         interchange_dict.get("raw_isa"),
     )
 
-    with connect() as conn:
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            INSERT INTO edi_interchanges
-                (file_id, partner_id, interchange_id,
-                isa_control_number, isa_sender_qualifier, isa_sender_id, isa_receiver_qualifier, isa_receiver_id,
-                isa_date, isa_time, usage_indicator, version,
-                element_sep, component_sep, segment_term, repetition_sep, raw_isa)
-            VALUES
-                (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, fields)
-
-        edi_interchange_id = cursor.lastrowid
-        interchange_dict["edi_interchange_id"] = edi_interchange_id
-
-        conn.commit()
-
-    return interchange_dict
-
-def create_functional_group(group_dict):
-    fields = (
+def _functional_group_fields(group_dict):
+    return (
         group_dict.get("edi_interchange_id"),
         group_dict.get("functional_id_code"),
         group_dict.get("gs_sender_id"),
@@ -92,26 +132,8 @@ def create_functional_group(group_dict):
         group_dict.get("raw_gs_segment"),
     )
 
-    with connect() as conn:
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            INSERT INTO edi_functional_groups
-                (edi_interchange_id, functional_id_code, gs_sender_id, gs_receiver_id,
-                group_control_number, x12_release, raw_gs_segment)
-            VALUES
-                (?, ?, ?, ?, ?, ?, ?)
-        """, fields)
-
-        group_id = cursor.lastrowid
-        group_dict["group_id"] = group_id
-
-        conn.commit()
-
-    return group_dict
-
-def create_transaction(tx_dict):
-    fields = (
+def _transaction_fields(tx_dict):
+    return (
         tx_dict.get("group_id"),
         tx_dict.get("transaction_set_id"),
         tx_dict.get("control_number"),
@@ -122,19 +144,46 @@ def create_transaction(tx_dict):
         tx_dict.get("ack_status"),
     )
 
+def create_edi_file(file_dict):
+    """
+    file_dict expects:
+      partner_id, interchange_id, processed_at, filename, file_hash, raw_bytes (bytes),
+      parse_status, parse_error, processing_state, source
+    """
     with connect() as conn:
         cursor = conn.cursor()
 
-        cursor.execute("""
-            INSERT INTO edi_transactions
-                (group_id, transaction_set_id, control_number, implementation_version,
-                segment_count_reported, raw_st_segment, raw_se_segment, ack_status)
-            VALUES
-                (?, ?, ?, ?, ?, ?, ?, ?)
-        """, fields)
+        insert_edi_file(cursor, file_dict)
 
-        transaction_id = cursor.lastrowid
-        tx_dict["transaction_id"] = transaction_id
+        conn.commit()
+
+    return file_dict
+
+def create_edi_interchange(interchange_dict):
+    with connect() as conn:
+        cursor = conn.cursor()
+
+        insert_edi_interchange(cursor, interchange_dict)
+
+        conn.commit()
+
+    return interchange_dict
+
+def create_functional_group(group_dict):
+    with connect() as conn:
+        cursor = conn.cursor()
+
+        insert_functional_group(cursor, group_dict)
+
+        conn.commit()
+
+    return group_dict
+
+def create_transaction(tx_dict):
+    with connect() as conn:
+        cursor = conn.cursor()
+
+        insert_transaction(cursor, tx_dict)
 
         conn.commit()
 
@@ -152,14 +201,7 @@ def create_segment(segment_dict):
     with connect() as conn:
         cursor = conn.cursor()
 
-        cursor.execute(
-            """
-            INSERT INTO edi_segments
-                (transaction_id, position, segment_id, loop_path, raw_segment)
-            VALUES
-                (?, ?, ?, ?, ?)
-            """, fields
-        )
+        cursor.execute(INSERT_SEGMENT_SQL, fields)
 
         segment_id = cursor.lastrowid
         segment_dict["segment_row_id"] = segment_id
@@ -181,15 +223,7 @@ def create_element(element_dict):
     with connect() as conn:
         cursor = conn.cursor()
 
-        cursor.execute(
-            """
-            INSERT INTO edi_elements
-                (segment_row_id, element_pos, is_composite, value_text, present, repetition_index)
-            VALUES
-                (?, ?, ?, ?, ?, ?)
-            """,
-            fields,
-        )
+        cursor.execute(INSERT_ELEMENT_SQL, fields)
 
         element_id = cursor.lastrowid
         element_dict["element_row_id"] = element_id
@@ -208,16 +242,206 @@ def create_component(component_dict):
     with connect() as conn:
         cursor = conn.cursor()
 
-        cursor.execute(
-            """
-            INSERT INTO edi_components
-                (element_row_id, component_pos, value_text)
-            VALUES
-                (?, ?, ?)
-            """,
-            fields,
-        )
+        cursor.execute(INSERT_COMPONENT_SQL, fields)
 
         conn.commit()
 
     return component_dict
+
+def find_edi_file_by_hash(file_hash, conn=None):
+    """file_id of the first stored file with this SHA-256 (idx_edi_files_hash), or None."""
+    if conn is None:
+        with connect() as conn:
+            return find_edi_file_by_hash(file_hash, conn)
+
+    row = conn.execute(
+        "SELECT file_id FROM edi_files WHERE file_hash = ? ORDER BY file_id LIMIT 1",
+        (file_hash,),
+    ).fetchone()
+
+    return row["file_id"] if row else None
+
+def load_edi_file_hashes(conn=None):
+    """Every stored file_hash -> its first file_id, for backfills that probe in memory."""
+    if conn is None:
+        with connect() as conn:
+            return load_edi_file_hashes(conn)
+
+    hashes = {}
+    for row in conn.execute("SELECT file_hash, file_id FROM edi_files WHERE file_hash IS NOT NULL ORDER BY file_id DESC"):
+        hashes[row["file_hash"]] = row["file_id"]
+
+    return hashes
+
+# -------------------------
+# Batched writes
+# -------------------------
+# These take a cursor so a whole file can be written inside one connection and one transaction.
+# The caller owns BEGIN/COMMIT.
+
+def insert_edi_file(cursor, file_dict):
+    """
+    With raw_path (a file) in file_dict instead of raw_bytes, the file is copied into raw_bytes
+    chunk by chunk, so a large upload is never held in memory whole.
+    """
+    raw_path = file_dict.get("raw_path")
+    if raw_path is None:
+        cursor.execute(INSERT_EDI_FILE_SQL, _edi_file_fields(file_dict))
+        file_dict["file_id"] = cursor.lastrowid
+        return file_dict
+
+    fields = list(_edi_file_fields(file_dict))
+    fields[5] = os.path.getsize(raw_path)
+    cursor.execute(INSERT_EDI_FILE_ZEROBLOB_SQL, fields)
+    file_dict["file_id"] = cursor.lastrowid
+
+    with open(raw_path, "rb") as f, cursor.connection.blobopen("edi_files", "raw_bytes", file_dict["file_id"]) as blob:
+        while chunk := f.read(RAW_BYTES_CHUNK_SIZE):
+            blob.write(chunk)
+
+    return file_dict
+
+def insert_edi_interchange(cursor, interchange_dict):
+    cursor.execute(INSERT_EDI_INTERCHANGE_SQL, _edi_interchange_fields(interchange_dict))
+    interchange_dict["edi_interchange_id"] = cursor.lastrowid
+
+    return interchange_dict
+
+def insert_functional_group(cursor, group_dict):
+    cursor.execute(INSERT_FUNCTIONAL_GROUP_SQL, _functional_group_fields(group_dict))
+    group_dict["group_id"] = cursor.lastrowid
+
+    return group_dict
+
+def insert_transaction(cursor, tx_dict):
+    cursor.execute(INSERT_TRANSACTION_SQL, _transaction_fields(tx_dict))
+    tx_dict["transaction_id"] = cursor.lastrowid
+
+    return tx_dict
+
+def _last_row_id(cursor, table, id_column):
+    # AUTOINCREMENT never hands out an id below sqlite_sequence, even after deletes, so respect both
+    seq_row = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+    max_row = cursor.execute(f"SELECT MAX({id_column}) FROM {table}").fetchone()
+
+    seq = seq_row[0] if seq_row else 0
+    max_id = max_row[0] if max_row and max_row[0] is not None else 0
+
+    return max(seq or 0, max_id)
+
+def bulk_insert_segments(cursor, transactions, timings=None, separators=None):
+    """
+    Write every segment/element/component of the given transactions with three executemany calls.
+    Each transaction dict must already have its transaction_id and carries its 'segments' list.
+
+    Row ids are assigned up front from the current table high-water mark, so the caller must
+    hold the write lock (BEGIN IMMEDIATE) for the whole transaction.
+
+    Dict segments get their segment_row_id/element_row_id written back. Compact segments
+    (core.x12.model) are turned straight into row tuples from their raw text, which needs
+    separators: one interchange dict per transaction, in the same order, since every
+    interchange may use its own delimiters. No dicts are built for them.
+
+    Returns (segment_count, element_count, component_count).
+    If timings (dict) is passed, per-stage milliseconds are added to it.
+    """
+    started = time.perf_counter()
+
+    segment_row_id = _last_row_id(cursor, "edi_segments", "segment_row_id")
+    element_row_id = _last_row_id(cursor, "edi_elements", "element_row_id")
+
+    segment_rows = []
+    element_rows = []
+    component_rows = []
+
+    for transaction, transaction_separators in zip(transactions, separators or [None] * len(transactions), strict=True):
+        transaction_id = transaction.get("transaction_id")
+
+        for segment in transaction.get("segments", []):
+            segment_row_id += 1
+
+            if not isinstance(segment, dict):
+                raw_segment = segment.raw_segment
+                segment_rows.append((
+                    segment_row_id,
+                    transaction_id,
+                    segment.position,
+                    segment.segment_id,
+                    segment.loop_path,
+                    raw_segment,
+                ))
+
+                for element_pos, repetition_index, value_text, components in segment.element_values(transaction_separators):
+                    element_row_id += 1
+                    element_rows.append((
+                        element_row_id,
+                        segment_row_id,
+                        element_pos,
+                        0 if components is None else 1,
+                        value_text,
+                        1,
+                        repetition_index,
+                    ))
+
+                    if components is not None:
+                        for component_pos, cval in enumerate(components, start=1):
+                            component_rows.append((element_row_id, component_pos, cval))
+                continue
+
+            segment["transaction_id"] = transaction_id
+            segment["segment_row_id"] = segment_row_id
+
+            segment_rows.append((
+                segment_row_id,
+                transaction_id,
+                segment.get("position"),
+                segment.get("segment_id"),
+                segment.get("loop_path"),
+                segment.get("raw_segment"),
+            ))
+
+            for element in segment.get("elements", []):
+                element_row_id += 1
+                element["segment_row_id"] = segment_row_id
+                element["element_row_id"] = element_row_id
+
+                element_rows.append((
+                    element_row_id,
+                    segment_row_id,
+                    element.get("element_pos"),
+                    element.get("is_composite"),
+                    element.get("value_text"),
+                    element.get("present"),
+                    element.get("repetition_index"),
+                ))
+
+                for component in element.get("components", []):
+                    component["element_row_id"] = element_row_id
+
+                    component_rows.append((
+                        element_row_id,
+                        component.get("component_pos"),
+                        component.get("value_text"),
+                    ))
+
+    stage_started = time.perf_counter()
+    _add_timing(timings, "build_rows_ms", started, stage_started)
+
+    cursor.executemany(BULK_INSERT_SEGMENT_SQL, segment_rows)
+    segments_done = time.perf_counter()
+    _add_timing(timings, "insert_segments_ms", stage_started, segments_done)
+
+    cursor.executemany(BULK_INSERT_ELEMENT_SQL, element_rows)
+    elements_done = time.perf_counter()
+    _add_timing(timings, "insert_elements_ms", segments_done, elements_done)
+
+    cursor.executemany(INSERT_COMPONENT_SQL, component_rows)
+    _add_timing(timings, "insert_components_ms", elements_done, time.perf_counter())
+
+    return len(segment_rows), len(element_rows), len(component_rows)
+
+def _add_timing(timings, key, started, finished):
+    if timings is None:
+        return
+
+    timings[key] = round(timings.get(key, 0.0) + (finished - started) * 1000, 3)
@@ -9,7 +9,12 @@ from app.routers.x12 import router as x12_router
 from app.routers.transactions import router as transactions_router
 from app.routers.mappings import router as mappings_router
 from app.routers.transaction_sets import router as transaction_sets_router
+from app.routers.code_lists import router as code_lists_router
 from app.db.schema import create_tables
+from app.services.compression import NegotiatedGZipMiddleware, get_gzip_level, get_gzip_min_size
+from app.services.spec_cache import code_list_cache, compiled_spec_cache, spec_cache, spec_diff_cache, spec_response_cache
+from app.services.ingest_jobs import job_workers
+from app.services.x12_pipeline import parse_pool
 
 load_dotenv()
 
@@ -30,6 +35,8 @@ def require_api_key(x_api_key=Header(default=None)):
 
 # ---- Open API ----
 app = FastAPI(title=os.getenv('APP_NAME', 'DraftEDI'))
+# responses that already carry a Content-Encoding (spec endpoints, /x12/parse) pass through as is
+app.add_middleware(NegotiatedGZipMiddleware, minimum_size=get_gzip_min_size(), compresslevel=get_gzip_level())
 
 @app.get("/")
 def root():
@@ -38,6 +45,12 @@ def root():
 @app.on_event("startup")
 def _startup():
     create_tables()
+    job_workers.start()
+
+@app.on_event("shutdown")
+def _shutdown():
+    job_workers.stop()
+    parse_pool.shutdown()
 
 @app.get("/health")
 def health():
@@ -78,6 +91,12 @@ def metrics():
         "uptime_seconds": int(time.time() - START_TIME),
         "env": env("ENV", "unknown"),
         "version": env("APP_VERSION", "unknown"),
+        "spec_cache": spec_cache.stats(),
+        "code_list_cache": code_list_cache.stats(),
+        "compiled_spec_cache": compiled_spec_cache.stats(),
+        "spec_diff_cache": spec_diff_cache.stats(),
+        "spec_response_cache": spec_response_cache.stats(),
+        "parse_pool": parse_pool.stats(),
     }
 
 
@@ -87,6 +106,7 @@ protected.include_router(x12_router)
 protected.include_router(transactions_router)
 protected.include_router(mappings_router)
 protected.include_router(transaction_sets_router)
+protected.include_router(code_lists_router)
 
 @protected.get("/ping")
 def ping():
@@ -0,0 +1,43 @@
+from typing import List
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from app.services.code_lists import get_code_list, lookup_codes
+
+router = APIRouter(prefix="/code-lists", tags=["code-lists"])
+
+class CodeLookup(BaseModel):
+    element: str  # element id ("98") or segment reference ("N101")
+    code: str
+
+class CodeLookupRequest(BaseModel):
+    lookups: List[CodeLookup]
+
+@router.post("/{version}/lookup")
+def lookup_code_values(version: str, payload: CodeLookupRequest):
+    """Validate and describe many element codes in one call"""
+    try:
+        results = lookup_codes(version, [(lookup.element, lookup.code) for lookup in payload.lookups])
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+
+    return {"version": version, "results": results}
+
+@router.get("/{version}/{element}")
+def get_element_code_list(version: str, element: str):
+    """All codes of one element (by element id or segment reference such as N101)"""
+    try:
+        code_list = get_code_list(version, element)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+
+    if code_list is None:
+        raise HTTPException(status_code=404, detail=f"Element {element} not found in version {version}")
+
+    return {
+        "version": version,
+        "element": element,
+        "element_id": code_list.element_id,
+        "codes": [{"code": code, "description": description} for code, description in code_list.descriptions.items()],
+    }
@@ -2,10 +2,8 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional
 
-from app.services.build_mapping_template import (
-    build_mapping_template,
-    build_mandatory_only_template
-)
+from app.services.build_mapping_template import validate_template_data
+from app.services.spec_cache import get_cached_template
 from app.db.mappings import (
     create_transaction_set_mapping,
     get_transaction_set_mapping,
@@ -37,6 +35,10 @@ class UpdateMappingRequest(BaseModel):
     is_active: Optional[int] = None
 
 
+class ValidateMappingRequest(BaseModel):
+    data: Optional[dict] = None  # defaults to the mapping's sample input
+
+
 @router.post("/generate")
 def generate_mapping_template(
     version: str,
@@ -49,10 +51,7 @@ def generate_mapping_template(
     Useful for previewing what the template will look like before creating a mapping.
     """
     try:
-        if mandatory_only:
-            template = build_mandatory_only_template(version, transaction_set_id)
-        else:
-            template = build_mapping_template(version, transaction_set_id)
+        template = get_cached_template(version, transaction_set_id, mandatory_only)
         
         return {
             "success": True,
@@ -70,16 +69,11 @@ def create_mapping(request: CreateMappingRequest):
     """
     try:
         # Generate the template from X12 spec
-        if request.mandatory_only:
-            template = build_mandatory_only_template(
-                request.version,
-                request.transaction_set_id
-            )
-        else:
-            template = build_mapping_template(
-                request.version,
-                request.transaction_set_id
-            )
+        template = get_cached_template(
+            request.version,
+            request.transaction_set_id,
+            request.mandatory_only
+        )
         
         transaction_set_map_dict = {
             "interchange_set_id": request.interchange_set_id,
@@ -125,6 +119,26 @@ def get_interchange_set_mappings(interchange_set_id: int):
         "mappings": mappings
     }
 
+@router.post("/{mapping_id}/validate")
+def validate_mapping(mapping_id: int, request: Optional[ValidateMappingRequest] = None):
+    """
+    Check the mapping's template filled from input data (the request's data, else the mapping's
+    sample input): mandatory segments/elements, data types, lengths and code values.
+    """
+    mapping = get_transaction_set_mapping(mapping_id)
+
+    if not mapping:
+        raise HTTPException(status_code=404, detail="Mapping not found")
+
+    data = request.data if request is not None and request.data is not None else mapping.get("sample_input")
+    is_valid, errors = validate_template_data(mapping["template"], data)
+
+    return {
+        "mapping_id": mapping_id,
+        "valid": is_valid,
+        "errors": errors
+    }
+
 @router.put("/{mapping_id}")
 def update_mapping(mapping_id: int, request: UpdateMappingRequest):
     """
@@ -1,45 +1,102 @@
-from fastapi import APIRouter, HTTPException
-from app.db.transaction_sets import get_transaction_set, get_all_transaction_sets
-from app.services.build_mapping_template import (
-    build_mapping_template,
-    build_mandatory_only_template
+import gzip
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from app.db.conn import edi_db_exists
+from app.db.transaction_sets import get_all_transaction_sets
+from app.services.spec_cache import get_cached_transaction_set, get_cached_template, invalidate_spec_cache
+from app.services.spec_diff import get_cached_spec_diff
+from app.services.spec_responses import (
+    accepts_gzip,
+    get_cached_response_body,
+    gzip_etag,
+    is_not_modified,
+    spec_etag,
+    spec_last_modified,
 )
 
 router = APIRouter(prefix="/transaction-sets", tags=["transaction-sets"])
 
+def _spec_response(request: Request, version: str, params: tuple, build) -> Response:
+    """
+    Cached, conditional JSON response for a spec endpoint: 304 when the client's copy is
+    current (nothing is built), else the cached gzip body, decompressed if the client can't take it.
+    """
+    if not edi_db_exists(version):
+        raise ValueError(f"No spec DB for version {version}")
+
+    etag = spec_etag(version, *params)
+    headers = {
+        "Last-Modified": spec_last_modified(version),
+        "Cache-Control": "private, no-cache",
+        "Vary": "Accept-Encoding",
+    }
+
+    use_gzip = accepts_gzip(request.headers.get("accept-encoding"))
+    headers["ETag"] = gzip_etag(etag) if use_gzip else etag
+
+    if is_not_modified(etag, headers["Last-Modified"], request.headers.get("if-none-match"), request.headers.get("if-modified-since")):
+        return Response(status_code=304, headers=headers)
+
+    body = get_cached_response_body(version, params, build)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+    else:
+        body = gzip.decompress(body)
+
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @router.get("/{version}")
-def list_transaction_sets(version: str):
+def list_transaction_sets(version: str, request: Request):
     """Get all transaction sets for a given X12 version"""
     try:
-        return get_all_transaction_sets(version)
+        return _spec_response(request, version, ("transaction_sets",), lambda: get_all_transaction_sets(version))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e)) from e
 
 @router.get("/{version}/{transaction_set_id}")
-def get_transaction_set_detail(version: str, transaction_set_id: str):
+def get_transaction_set_detail(version: str, transaction_set_id: str, request: Request):
     """Get detailed information about a specific transaction set"""
-    try:
-        tx_set = get_transaction_set(version, transaction_set_id)
+    def _build():
+        tx_set = get_cached_transaction_set(version, transaction_set_id)
         if not tx_set:
             raise HTTPException(status_code=404, detail="Transaction set not found")
         return tx_set
+
+    try:
+        return _spec_response(request, version, ("transaction_set", transaction_set_id), _build)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e)) from e
 
 @router.get("/{version}/{transaction_set_id}/template")
-def get_mapping_template(version: str, transaction_set_id: str, mandatory_only: bool = False):
+def get_mapping_template(version: str, transaction_set_id: str, request: Request, mandatory_only: bool = False):
     """Generate a mapping template for a transaction set"""
-    try:
-        if mandatory_only:
-            template = build_mandatory_only_template(version, transaction_set_id)
-        else:
-            template = build_mapping_template(version, transaction_set_id)
-        
+    def _build():
         return {
             "version": version,
             "transaction_set_id": transaction_set_id,
             "mandatory_only": mandatory_only,
-            "template": template
+            "template": get_cached_template(version, transaction_set_id, mandatory_only)
         }
+
+    try:
+        return _spec_response(request, version, ("template", transaction_set_id, mandatory_only), _build)
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e)) from e
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+@router.get("/{version}/{transaction_set_id}/diff/{other_version}")
+def get_transaction_set_diff(version: str, transaction_set_id: str, other_version: str, summary_only: bool = False):
+    """Added/removed/changed loops, segments, elements and codes of a transaction set from version to other_version"""
+    try:
+        diff = get_cached_spec_diff(version, other_version, transaction_set_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+
+    if summary_only:
+        return {key: diff[key] for key in ("transaction_set_id", "from_version", "to_version", "summary")}
+
+    return diff
+
+@router.post("/cache/invalidate")
+def invalidate_cache(version: str | None = None):
+    """Drop cached specs/templates (for one version, or all) after an edi_db file is replaced"""
+    return {"invalidated": invalidate_spec_cache(version)}
@@ -1,39 +1,237 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Request
+import asyncio
+import json
+import threading
+import time
+
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+
+from app.db.ingest_jobs import get_ingest_job
+from app.services.batch_ingest import detect_archive_format, ingest_archive
+from app.services.compression import BodyDecoder, UnsupportedContentEncoding, is_gzipped
+from app.services.ingest_jobs import submit_ingest_job, submit_spooled_ingest_job
+from app.services.ingest_x12 import DUPLICATE_POLICIES, DuplicateFileError
+from app.services.spec_responses import accepts_gzip
+from app.services.spool import SpoolWriter, get_receive_timeout
+from app.services.x12_pipeline import ParsePoolBusy, parse_pool, run_spooled_parse_pipeline
+from core.x12.stream import DEFAULT_CHUNK_SIZE
 
 router = APIRouter(prefix="/x12", tags=["x12"])
 
+async def _upload_chunks(request: Request, file: UploadFile | None, content_type: str | None = "text/plain"):
+    """
+    The upload as byte chunks: the multipart 'file' or the raw body (of content_type, if given)
+    as it arrives, the latter decompressed on the fly when sent with Content-Encoding gzip or deflate.
+    """
+    if file is not None:
+        while chunk := await file.read(DEFAULT_CHUNK_SIZE):
+            yield chunk
+        return
+
+    if content_type and content_type not in (request.headers.get("content-type") or "").lower():
+        raise HTTPException(status_code=415, detail=f"Send as {content_type} or multipart file upload.")
+
+    try:
+        decoder = BodyDecoder(request.headers.get("content-encoding"))
+    except UnsupportedContentEncoding as e:
+        raise HTTPException(status_code=415, detail=str(e)) from e
+
+    async for chunk in request.stream():
+        for piece in decoder.decode(chunk):
+            yield piece
+    decoder.close()
+
+async def _receive_upload(writer: SpoolWriter, chunks, fsync=True):
+    """
+    Write the upload into the spool and publish it. 400 on an empty body or a bad ISA header
+    (as soon as its bytes are in), 408 when the client sends nothing for X12_RECEIVE_TIMEOUT seconds.
+    """
+    timeout = get_receive_timeout()
+    try:
+        while True:
+            try:
+                async with asyncio.timeout(timeout):
+                    chunk = await anext(chunks)
+            except StopAsyncIteration:
+                break
+            writer.write(chunk)
+    except TimeoutError as e:
+        raise HTTPException(status_code=408, detail=f"No upload data received for {timeout:g} seconds") from e
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Parse failed: {e}") from e
+
+    if not writer.size:
+        raise HTTPException(status_code=400, detail="Empty request body. Send X12 as text/plain or upload a file.")
+
+    try:
+        if fsync:
+            await asyncio.to_thread(writer.commit)
+        else:
+            writer.commit(fsync=False)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Parse failed: {e}") from e
+
+def _check_duplicate_policy(duplicate_policy):
+    if duplicate_policy is not None and duplicate_policy not in DUPLICATE_POLICIES:
+        raise HTTPException(status_code=400, detail=f"Unknown duplicate policy {duplicate_policy!r}, expected one of {', '.join(DUPLICATE_POLICIES)}")
+
 @router.post("/parse")
-async def parse_x12(request: Request, file: UploadFile | None = File(default=None)):
+async def parse_x12(request: Request, file: UploadFile | None = File(default=None), duplicate_policy: str | None = None,
+                    validate: bool = False):
     """
     Accepts either:
       - text/plain body containing raw X12
       - multipart/form-data with a 'file'
+
+    duplicate_policy (reject | link | force, default X12_DUPLICATE_POLICY or link) decides what
+    happens when the same bytes were already stored: 409, the existing file_id, or a full re-ingest.
+
+    validate=true checks every transaction against the spec DB; each transaction in the response
+    then carries 'validation': {'valid', 'errors'}.
+
+    The body is spooled to disk as it arrives; a bad ISA header is refused before the rest of
+    the upload is read. It is parsed once complete (see run_spooled_parse_pipeline), and only
+    then takes a parse pool slot. A text/plain body may be gzip or deflate compressed
+    (Content-Encoding); the response is gzipped when Accept-Encoding allows it.
     """
-    data: bytes
-    
-    if file is not None:
-        data = await file.read()
-    else:
-        # Accept raw body
-        content_type = (request.headers.get("content-type") or "").lower()
-        if "text/plain" not in content_type:
-            raise HTTPException(status_code=415, detail="Send as text/plain or multipart file upload.")
-        
-        data = await request.body()
-        if not data:
-            raise HTTPException(status_code=400, detail="Empty request body. Send X12 as text/plain or upload a file.")
-                
-    # ---- Call your existing parser here ----
+    started = time.perf_counter()
+    _check_duplicate_policy(duplicate_policy)
+    compress = accepts_gzip(request.headers.get("accept-encoding"))
+
+    writer = SpoolWriter()
     try:
-        from core.x12.parse import parse_edi_file
-        parsed = parse_edi_file(data)
+        await _receive_upload(writer, _upload_chunks(request, file), fsync=False)
+        receive_ms = round((time.perf_counter() - started) * 1000, 2)
 
-        from app.services.ingest_x12 import ingest_edi_file
-        edi_file_dict = ingest_edi_file(parsed)
-       
+        async with parse_pool.slot() as queue_ms:
+            body, timings = await parse_pool.execute(
+                run_spooled_parse_pipeline, writer.path, writer.file_hash, duplicate_policy, validate, compress
+            )
+    except ParsePoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"}) from e
+    except DuplicateFileError as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "file_id": e.file_id, "file_hash": e.file_hash}) from e
+    except HTTPException:
+        raise
     except Exception as e:
         # Don’t leak internals; return a useful error
         raise HTTPException(status_code=400, detail=f"Parse failed: {e}") from e
+    finally:
+        writer.discard()
+
+    timings["queue_ms"] = queue_ms
+    timings["receive_ms"] = receive_ms
+    timings["total_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    headers = {"Server-Timing": server_timing(timings), "Vary": "Accept-Encoding"}
+    if is_gzipped(body):
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.post("/jobs", status_code=202)
+async def submit_x12_job(request: Request, file: UploadFile | None = File(default=None), duplicate_policy: str | None = None,
+                         validate: bool = False):
+    """
+    Queue an upload (text/plain body or multipart 'file', same options as /parse) for background
+    parse + ingest. Answers 202 with the job id as soon as the file is spooled to disk; poll
+    /x12/jobs/{job_id} for status, outcome and stage timings.
+    """
+    _check_duplicate_policy(duplicate_policy)
+
+    if file is not None:
+        # already spooled by the multipart parser; copied to the job spool without loading it
+        job_id = await asyncio.to_thread(submit_ingest_job, file.file, file.filename, duplicate_policy, validate)
+    else:
+        writer = SpoolWriter()
+        try:
+            await _receive_upload(writer, _upload_chunks(request, None))
+        except BaseException:
+            writer.discard()
+            raise
+        job_id = await asyncio.to_thread(submit_spooled_ingest_job, writer.path, writer.size, None, duplicate_policy, validate)
+
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job_id, "status": "queued", "status_url": f"/api/x12/jobs/{job_id}"},
+        headers={"Location": f"/api/x12/jobs/{job_id}"},
+    )
+
+@router.post("/parse-batch")
+async def parse_x12_batch(request: Request, file: UploadFile | None = File(default=None), duplicate_policy: str | None = None):
+    """
+    Ingest a zip or tar (.tar.gz etc.) of EDI files, sent as the raw body or multipart 'file'.
+    Members are parsed in the parse pool and written through one batched writer; the response
+    is NDJSON, one line per file as it is committed ({index, name, status, file_id, file_hash,
+    transactions, error, timings}), then a {"summary": ...} line. duplicate_policy as for /parse,
+    applied per file.
+    """
+    _check_duplicate_policy(duplicate_policy)
+
+    writer = SpoolWriter(check_isa=False, suffix=".archive")
+    try:
+        await _receive_upload(writer, _upload_chunks(request, file, content_type=None), fsync=False)
+        await asyncio.to_thread(detect_archive_format, writer.path)
+    except ValueError as e:
+        writer.discard()
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except BaseException:
+        writer.discard()
+        raise
+
+    return StreamingResponse(
+        _ndjson_in_thread(ingest_archive, writer.path, duplicate_policy, done=writer.discard),
+        media_type="application/x-ndjson",
+        # gzip would hold lines back in the compressor; identity makes the middleware pass it through
+        headers={"Content-Encoding": "identity"},
+        background=BackgroundTask(writer.discard),
+    )
+
+async def _ndjson_in_thread(generate, *args, done=None):
+    """
+    NDJSON lines of generate(*args), a sync generator run in a thread of its own (it keeps one
+    SQLite connection for its whole run); stops it when the client goes away. An error midway
+    ends the stream with an {"error": ...} line, the status having been sent already.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def produce():
+        entries = generate(*args)
+        try:
+            for entry in entries:
+                loop.call_soon_threadsafe(queue.put_nowait, entry)
+                if stop.is_set():
+                    break
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, {"error": f"{type(e).__name__}: {e}"})
+        finally:
+            try:
+                entries.close()
+                if done is not None:
+                    done()
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, None)
+
+    threading.Thread(target=produce, name="x12-batch", daemon=True).start()
+    try:
+        while (entry := await queue.get()) is not None:
+            yield json.dumps(entry, separators=(",", ":")).encode("utf-8") + b"\n"
+    finally:
+        stop.set()
+
+@router.get("/jobs/{job_id}")
+def get_x12_job(job_id: int):
+    """Status of a queued upload: queued | running | succeeded | failed, with its outcome and stage timings"""
+    job = get_ingest_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    job.pop("spool_path")
+    job.pop("lease_until")
+    return job
 
-    # Build an MVP response
-    return edi_file_dict
+def server_timing(timings):
+    """Server-Timing header value for {stage_ms: ms} (e.g. 'parse;dur=12.5, ingest;dur=40.1')."""
+    return ", ".join(f"{stage.removesuffix('_ms')};dur={ms}" for stage, ms in timings.items())
@@ -0,0 +1,248 @@
+import os
+import tarfile
+import time
+import zipfile
+import zlib
+from concurrent.futures import FIRST_COMPLETED, BrokenExecutor, wait
+
+from app.db.conn import connect
+from app.services.bulk_ingest import parse_for_writer
+from app.services.ingest_x12 import DUPLICATE_POLICIES, DuplicateFileError, check_duplicate, get_duplicate_policy, ingest_edi_file
+from app.services.x12_pipeline import parse_pool
+
+# -------------------------
+# Archive batch ingest
+# -------------------------
+# POST /api/x12/parse-batch takes a zip or tar (optionally compressed) of EDI files. Members are
+# read out of the spooled archive one at a time, checked for duplicates and handed to the parse
+# pool, each holding one of its slots like a /parse upload, so at most X12_PARSE_CONCURRENCY are
+# in flight; this thread is the only writer. Whatever finished parsing since the last write goes
+# in one transaction (a savepoint per file, so one bad file doesn't sink the others), which
+# saves a commit per file on drops of thousands of small files. Each file's manifest entry is
+# yielded right after the commit that made it durable.
+
+def get_batch_max_member_bytes():
+    """Largest archive member accepted: X12_BATCH_MAX_MEMBER_BYTES if set, otherwise 100 MB."""
+    return int(os.getenv("X12_BATCH_MAX_MEMBER_BYTES", str(100 * 1024 * 1024)))
+
+def detect_archive_format(path):
+    """zip or tar (tarfile handles gzip/bz2/xz); ValueError for anything else."""
+    if zipfile.is_zipfile(path):
+        return "zip"
+    if tarfile.is_tarfile(path):
+        return "tar"
+    raise ValueError("Not a zip or tar archive")
+
+def iter_archive_members(path, max_member_bytes=None):
+    """
+    (name, raw_bytes, error) for every regular file in the archive, in archive order; raw_bytes
+    is None and error set for a member that is too large or can't be read. Tars are read as a
+    stream, so members are never all in memory at once.
+    """
+    max_member_bytes = max_member_bytes or get_batch_max_member_bytes()
+
+    if detect_archive_format(path) == "zip":
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                if info.file_size > max_member_bytes:
+                    yield info.filename, None, f"Member is {info.file_size} bytes, over the {max_member_bytes} byte limit"
+                    continue
+                try:
+                    with archive.open(info) as member:
+                        # file_size is only what the directory claims
+                        raw_bytes = member.read(max_member_bytes + 1)
+                except (zipfile.BadZipFile, zlib.error, RuntimeError, NotImplementedError, OSError, EOFError) as e:
+                    yield info.filename, None, f"Can't read member: {e}"
+                    continue
+                if len(raw_bytes) > max_member_bytes:
+                    yield info.filename, None, f"Member is over the {max_member_bytes} byte limit"
+                else:
+                    yield info.filename, raw_bytes, None
+        return
+
+    with tarfile.open(path, mode="r|*") as archive:
+        members = iter(archive)
+        while True:
+            name = None
+            try:
+                info = next(members, None)
+                if info is None:
+                    return
+                name = info.name
+                if not info.isfile():
+                    continue
+                if info.size > max_member_bytes:
+                    yield name, None, f"Member is {info.size} bytes, over the {max_member_bytes} byte limit"
+                    continue
+                raw_bytes = archive.extractfile(info).read()
+            except (tarfile.TarError, OSError, EOFError) as e:
+                # a stream can't skip past a broken member, so nothing after it can be read
+                yield name or "(unreadable member)", None, f"Can't read member: {e}"
+                return
+            yield name, raw_bytes, None
+
+def _parse_member(raw_bytes, name, file_hash):
+    """Runs in the parse pool: parse one member for the writer; returns (parsed, parse_ms)."""
+    started = time.perf_counter()
+    parsed = parse_for_writer(raw_bytes, name, "api batch", file_hash)
+    return parsed, _ms(started, time.perf_counter())
+
+def _ms(started, finished):
+    return round((finished - started) * 1000, 2)
+
+def ingest_archive(path, duplicate_policy=None, in_flight=None):
+    """
+    Ingest every member of the archive at path; yields one manifest entry per member as soon as
+    it is settled (written, found to be a duplicate, or failed), in completion order, then a
+    final {'summary': ...}. Entries: index (archive order), name, status (ingested | duplicate
+    | failed), file_id, file_hash, transactions, error and timings (ms). Duplicates follow
+    duplicate_policy as in /parse: link reports the stored file_id, reject fails the member,
+    force ingests it again.
+    """
+    duplicate_policy = duplicate_policy or get_duplicate_policy()
+    if duplicate_policy not in DUPLICATE_POLICIES:
+        raise ValueError(f"Unknown duplicate policy {duplicate_policy!r}, expected one of {', '.join(DUPLICATE_POLICIES)}")
+
+    max_in_flight = in_flight or parse_pool.concurrency
+    members = enumerate(iter_archive_members(path))
+    pending = {}
+    # file_hash -> file_id of members written by this batch, for copies inside the archive
+    written = {}
+    stats = {"files": 0, "ingested": 0, "duplicates": 0, "failed": 0, "batches": 0}
+    started = time.perf_counter()
+
+    with connect() as conn:
+        try:
+            while True:
+                settled = []
+                for index, (name, raw_bytes, error) in members:
+                    entry = {"index": index, "name": name, "status": None, "file_id": None, "file_hash": None,
+                             "transactions": None, "error": error, "timings": {}}
+                    read_at = time.perf_counter()
+
+                    if raw_bytes is not None:
+                        try:
+                            entry["file_hash"], entry["file_id"] = check_duplicate(raw_bytes, duplicate_policy, conn=conn)
+                        except DuplicateFileError as e:
+                            entry["file_id"], entry["error"] = e.file_id, str(e)
+                        entry["timings"]["dedup_ms"] = _ms(read_at, time.perf_counter())
+
+                    if entry["error"] is not None:
+                        entry["status"] = "failed"
+                        settled.append(entry)
+                    elif entry["file_id"] is not None:
+                        entry["status"] = "duplicate"
+                        settled.append(entry)
+                    else:
+                        future = parse_pool.submit_in_slot(_parse_member, raw_bytes, name, entry["file_hash"])
+                        pending[future] = (entry, read_at)
+                        if len(pending) >= max_in_flight:
+                            break
+
+                for entry in settled:
+                    _count(stats, entry)
+                    yield entry
+
+                if not pending:
+                    break
+
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                batch, failed = [], []
+                for future in finished:
+                    entry, read_at = pending.pop(future)
+                    try:
+                        parsed, entry["timings"]["parse_ms"] = future.result()
+                        batch.append((entry, read_at, parsed))
+                    except BrokenExecutor as e:
+                        # the pool process died (e.g. killed for memory); later members get a fresh pool
+                        parse_pool.shutdown(wait=False)
+                        entry["status"], entry["error"] = "failed", f"Worker process died: {e}"
+                        failed.append(entry)
+                    except Exception as e:
+                        entry["status"], entry["error"] = "failed", f"Parse failed: {e}"
+                        failed.append(entry)
+
+                if batch:
+                    stats["batches"] += 1
+                for entry in failed + _write_batch(conn, batch, duplicate_policy, written):
+                    _count(stats, entry)
+                    yield entry
+        finally:
+            # the client went away (or something broke): don't leave parses queued in the pool
+            for future in pending:
+                future.cancel()
+            if conn.in_transaction:
+                conn.rollback()
+
+    yield {"summary": {**stats, "elapsed_ms": _ms(started, time.perf_counter())}}
+
+def _write_batch(conn, batch, duplicate_policy, written):
+    """
+    Write parsed members in one transaction, a savepoint each; returns their manifest entries,
+    complete once the commit is done.
+    """
+    if not batch:
+        return []
+
+    entries = []
+    write_started = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for entry, read_at, parsed in batch:
+            file_started = time.perf_counter()
+            entries.append(entry)
+
+            existing_file_id = written.get(entry["file_hash"]) if duplicate_policy != "force" else None
+            if existing_file_id is not None:
+                entry["file_id"] = existing_file_id
+                if duplicate_policy == "reject":
+                    entry["status"], entry["error"] = "failed", str(DuplicateFileError(entry["file_hash"], existing_file_id))
+                else:
+                    entry["status"] = "duplicate"
+                continue
+
+            conn.execute("SAVEPOINT batch_member")
+            try:
+                result = ingest_edi_file(parsed, conn=conn, commit=False, duplicate_policy=duplicate_policy)
+                conn.execute("RELEASE batch_member")
+            except Exception as e:
+                conn.execute("ROLLBACK TO batch_member")
+                conn.execute("RELEASE batch_member")
+                if isinstance(e, DuplicateFileError):
+                    entry["file_id"], entry["error"] = e.file_id, str(e)
+                else:
+                    entry["error"] = f"Ingest failed: {e}"
+                entry["status"] = "failed"
+                continue
+
+            if result.get("duplicate"):
+                # stored by another writer after this member's check_duplicate
+                entry["status"], entry["file_id"] = "duplicate", result["file_id"]
+                continue
+
+            edi_file_dict = parsed["edi_file_dict"]
+            written[edi_file_dict["file_hash"]] = edi_file_dict["file_id"]
+            entry["status"], entry["file_id"] = "ingested", edi_file_dict["file_id"]
+            entry["transactions"] = parsed["ingest_timings"]["transactions"]
+            entry["timings"]["write_ms"] = _ms(file_started, time.perf_counter())
+
+        commit_started = time.perf_counter()
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+    committed = time.perf_counter()
+    for entry, read_at, _ in batch:
+        entry["timings"]["commit_ms"] = _ms(commit_started, committed)
+        entry["timings"]["batch_write_ms"] = _ms(write_started, committed)
+        entry["timings"]["total_ms"] = _ms(read_at, committed)
+        entry["batch_size"] = len(batch)
+
+    return entries
+
+def _count(stats, entry):
+    stats["files"] += 1
+    stats[{"ingested": "ingested", "duplicate": "duplicates", "failed": "failed"}[entry["status"]]] += 1
@@ -1,4 +1,5 @@
 from app.db.transaction_sets import get_transaction_set
+from core.x12.validate import ElementRule, check_element_value
 
 def build_mapping_template(version: str, transaction_set_id: str) -> dict:
 
@@ -124,9 +125,14 @@ def build_mandatory_only_template(version, transaction_set_id):
     full_template = build_mapping_template(version, transaction_set_id)
     
     # Filter to mandatory only
-    full_template["segments"] = _filter_mandatory_segments(full_template["segments"])
-    
-    return full_template
+    return filter_mandatory_template(full_template)
+
+def filter_mandatory_template(full_template):
+    # New template dict; full_template is left untouched (it may be a cached, read-only one)
+    template = dict(full_template)
+    template["segments"] = _filter_mandatory_segments(full_template["segments"])
+
+    return template
 
 def _filter_mandatory_segments(segments_list):
     result = []
@@ -159,14 +165,78 @@ def _filter_mandatory_segments(segments_list):
     return result
 
 def validate_template_data(template, data):
+    """
+    Check a filled-in template. Each element's value is read from data at its 'path' (dotted
+    keys) when set, otherwise from its 'value'.
+
+    A segment that has any value (and every top-level mandatory segment) must fill its
+    mandatory elements; values are checked for data type, min/max length and code values with
+    the same rules as inbound transactions (core.x12.validate).
+    """
+    # validate_x12 sits on top of spec_cache, which imports this module
+    from app.services.validate_x12 import get_validation_plan
+
     errors = []
-    
-    # This is a placeholder for future validation logic
-    # Would check:
-    # - All mandatory segments have data
-    # - All mandatory elements have values
-    # - Data types match
-    # - Lengths are within min/max bounds
-    # - Relational conditions are satisfied
-    
-    return len(errors) == 0, errors
\ No newline at end of file
+
+    plan = get_validation_plan(template.get("version"), template.get("transaction_set"))
+    codes = plan.codes if plan is not None else {}
+
+    _validate_template_segments(template.get("segments", []), data or {}, codes, errors, top_level=True)
+
+    return len(errors) == 0, errors
+
+def _template_value(element, data):
+    path = element.get("path")
+    if not path:
+        return element.get("value")
+
+    value = data
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+def _validate_template_segments(segments_list, data, codes, errors, top_level=False):
+    for item in segments_list:
+        if item.get("type") == "loop":
+            _validate_template_segments(item.get("segments", []), data, codes, errors)
+            continue
+
+        segment_id = item.get("segment_id")
+        elements = item.get("elements", [])
+        values = [_template_value(element, data) for element in elements]
+
+        has_data = any(value not in (None, "") for value in values)
+        if not has_data and not (top_level and item.get("requirement") == "M"):
+            continue
+
+        for element, value in zip(elements, values):
+            element_pos = int(element.get("pos") or 0)
+
+            if value in (None, ""):
+                if element.get("requirement") == "M":
+                    errors.append({
+                        "code": "missing_element",
+                        "message": f"Mandatory element {segment_id}{element_pos:02d} is missing",
+                        "segment_id": segment_id,
+                        "element_pos": element_pos,
+                    })
+                continue
+
+            rule = ElementRule(
+                element_pos,
+                element.get("element_id"),
+                element.get("requirement") == "M",
+                element.get("type"),
+                element.get("min_length"),
+                element.get("max_length"),
+                codes.get(element.get("element_id")) if element.get("type") == "ID" else None,
+            )
+            for code, message in check_element_value(rule, str(value)):
+                errors.append({
+                    "code": code,
+                    "message": f"{segment_id}{element_pos:02d}: {message}",
+                    "segment_id": segment_id,
+                    "element_pos": element_pos,
+                })
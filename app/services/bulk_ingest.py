@@ -0,0 +1,230 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+from app.db.conn import connect
+from app.db.x12 import load_edi_file_hashes
+from app.services.loop_paths import get_loop_machine
+from app.services.ingest_x12 import DUPLICATE_POLICIES, DuplicateFileError, check_duplicate, get_duplicate_policy, ingest_edi_file
+from core.x12.model import LazySegment
+from core.x12.parallel import DEFAULT_BATCH_BYTES, get_parallel_parse_bytes, get_parse_workers, parse_edi_file_parallel
+from core.x12.parse import parse_edi_file
+
+# -------------------------
+# Offline bulk ingest
+# -------------------------
+# Files are parsed in a process pool and written by the parent only: SQLite allows one writer,
+# so a single connection doing one BEGIN IMMEDIATE ... COMMIT per file avoids lock contention.
+# Every committed file is appended to the checkpoint, so a rerun picks up where it stopped.
+# Stored file hashes are loaded once and handed to each worker, so duplicates are dropped
+# before parsing without a database probe per file. Files of X12_PARALLEL_PARSE_BYTES and up
+# (month-end drops of hundreds of MB) are not given to a single worker: they go first, one at a
+# time, with their transactions split across the same pool (core.x12.parallel).
+
+# file_hash -> file_id, set in each worker by _init_worker
+_known_hashes = None
+
+def _init_worker(known_hashes):
+    global _known_hashes
+    _known_hashes = known_hashes
+
+def iter_edi_paths(directory, pattern="*"):
+    """Every file under directory matching pattern, in a stable (sorted) order."""
+    root = Path(directory)
+    return sorted(path for path in root.rglob(pattern) if path.is_file())
+
+def load_checkpoint(checkpoint_path):
+    """Set of relative paths already committed (one per line)."""
+    if not checkpoint_path or not os.path.exists(checkpoint_path):
+        return set()
+
+    with open(checkpoint_path, encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+def _parse_file(path, relative_path, source, duplicate_policy):
+    """
+    Runs in a worker process: read and parse one file, with element values split up front.
+    A known duplicate comes back as {'duplicate_of': file_id} without being parsed.
+    """
+    with open(path, "rb") as f:
+        raw_bytes = f.read()
+
+    file_hash, existing_file_id = check_duplicate(raw_bytes, duplicate_policy, _known_hashes)
+    if existing_file_id is not None:
+        return {'duplicate_of': existing_file_id, 'file_hash': file_hash}
+
+    return parse_for_writer(raw_bytes, relative_path, source, file_hash)
+
+def _parse_large_file(path, relative_path, source, duplicate_policy, known_hashes, executor, workers):
+    """_parse_file for a file worth splitting: read and checked here, transactions parsed across executor."""
+    with open(path, "rb") as f:
+        raw_bytes = f.read()
+
+    file_hash, existing_file_id = check_duplicate(raw_bytes, duplicate_policy, known_hashes)
+    if existing_file_id is not None:
+        return {'duplicate_of': existing_file_id, 'file_hash': file_hash}
+
+    # a few batches per worker, so a file just over the threshold still keeps every worker busy
+    batch_bytes = min(DEFAULT_BATCH_BYTES, len(raw_bytes) // (workers * 4) + 1)
+    parsed = parse_edi_file_parallel(raw_bytes, source, executor=executor, batch_bytes=batch_bytes,
+                                     loop_resolver=get_loop_machine, file_hash=file_hash)
+    parsed['edi_file_dict']['filename'] = relative_path
+    return parsed
+
+def parse_for_writer(raw_bytes, filename, source, file_hash=None):
+    """
+    Parse a file in a worker for a single writer elsewhere: element values are split here, so
+    the writer only runs SQL.
+    """
+    parsed = parse_edi_file(raw_bytes, source, lazy=True, file_hash=file_hash, loop_resolver=get_loop_machine)
+    parsed['edi_file_dict']['filename'] = filename
+
+    for interchange in parsed['interchanges']:
+        for group in interchange.get('groups', []):
+            for transaction in group.get('transactions', []):
+                for segment in transaction.get('segments', []):
+                    if isinstance(segment, LazySegment):
+                        segment.split_values()
+
+    return parsed
+
+def bulk_ingest_directory(directory, workers=None, checkpoint_path=None, pattern="*",
+                          source="bulk ingest", duplicate_policy=None, report_every=5.0, log=print,
+                          parallel_bytes=None):
+    """
+    Parse every file under directory with a process pool and ingest them through one writer.
+
+    At most 2 x workers files are parsed ahead of the writer, so memory stays bounded on large
+    directories. Files of parallel_bytes or more (default get_parallel_parse_bytes(), 0 turns it
+    off) are parsed first, one at a time, with their transactions spread over the whole pool.
+    Files listed in checkpoint_path are skipped; each file is appended to it right after its
+    commit. A file that fails to parse or ingest is logged and counted, not retried.
+
+    duplicate_policy works as in app.services.ingest_x12.check_duplicate: link skips (and
+    checkpoints) files already stored or seen earlier in the run, reject counts them as failed,
+    force ingests everything.
+
+    Returns a summary dict (files, failed, skipped, duplicates, segments, elapsed_s, files_per_s,
+    segments_per_s).
+    """
+    root = Path(directory)
+    done = load_checkpoint(checkpoint_path)
+
+    parallel_bytes = get_parallel_parse_bytes() if parallel_bytes is None else parallel_bytes
+
+    pending = []
+    large = []
+    skipped = 0
+    for path in iter_edi_paths(root, pattern):
+        relative_path = path.relative_to(root).as_posix()
+        if relative_path in done:
+            skipped += 1
+        elif parallel_bytes and path.stat().st_size >= parallel_bytes:
+            large.append((path, relative_path))
+        else:
+            pending.append((path, relative_path))
+    total = len(pending) + len(large)
+
+    workers = workers or get_parse_workers()
+    max_in_flight = workers * 2
+
+    duplicate_policy = duplicate_policy or get_duplicate_policy()
+    if duplicate_policy not in DUPLICATE_POLICIES:
+        raise ValueError(f"Unknown duplicate policy {duplicate_policy!r}, expected one of {', '.join(DUPLICATE_POLICIES)}")
+    known_hashes = load_edi_file_hashes() if duplicate_policy != "force" else {}
+
+    stats = {'files': 0, 'failed': 0, 'skipped': skipped, 'duplicates': 0, 'segments': 0}
+    started = time.perf_counter()
+    last_report = started
+
+    checkpoint = open(checkpoint_path, "a", encoding="utf-8") if checkpoint_path else None
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(known_hashes,)) as executor, \
+                connect() as conn:
+            queue = iter(pending)
+            in_flight = {}
+
+            def _submit():
+                for path, relative_path in queue:
+                    future = executor.submit(_parse_file, str(path), relative_path, source, duplicate_policy)
+                    in_flight[future] = relative_path
+                    if len(in_flight) >= max_in_flight:
+                        return
+
+            def _write(relative_path, parse):
+                try:
+                    parsed = parse()
+
+                    existing_file_id = parsed.get('duplicate_of')
+                    if existing_file_id is None and duplicate_policy != "force":
+                        # a copy written earlier in this run is not in the workers' snapshot
+                        file_hash = parsed['edi_file_dict']['file_hash']
+                        existing_file_id = known_hashes.get(file_hash)
+                        if existing_file_id is not None and duplicate_policy == "reject":
+                            raise DuplicateFileError(file_hash, existing_file_id)
+
+                    if existing_file_id is None:
+                        result = ingest_edi_file(parsed, conn=conn, duplicate_policy=duplicate_policy)
+                        # stored by another writer since known_hashes was loaded
+                        existing_file_id = result.get('file_id') if result.get('duplicate') else None
+                except DuplicateFileError as e:
+                    stats['failed'] += 1
+                    log(f"DUPLICATE {relative_path}: {e}")
+                    return
+                except Exception as e:
+                    conn.rollback()
+                    stats['failed'] += 1
+                    log(f"FAILED {relative_path}: {e}")
+                    return
+
+                if existing_file_id is not None:
+                    stats['duplicates'] += 1
+                else:
+                    edi_file_dict = parsed['edi_file_dict']
+                    known_hashes[edi_file_dict['file_hash']] = edi_file_dict['file_id']
+                    stats['files'] += 1
+                    stats['segments'] += parsed['ingest_timings']['segments']
+
+                if checkpoint:
+                    checkpoint.write(relative_path + "\n")
+                    checkpoint.flush()
+
+            def _report():
+                nonlocal last_report
+                now = time.perf_counter()
+                if report_every and now - last_report >= report_every:
+                    log(_progress(stats, total, now - started))
+                    last_report = now
+
+            for path, relative_path in large:
+                _write(relative_path, lambda: _parse_large_file(path, relative_path, source, duplicate_policy, known_hashes, executor, workers))
+                _report()
+
+            _submit()
+            while in_flight:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+
+                for future in finished:
+                    _write(in_flight.pop(future), future.result)
+
+                _submit()
+                _report()
+    finally:
+        if checkpoint:
+            checkpoint.close()
+
+    elapsed = time.perf_counter() - started
+    stats['elapsed_s'] = round(elapsed, 3)
+    stats['files_per_s'] = round(stats['files'] / elapsed, 1) if elapsed else 0.0
+    stats['segments_per_s'] = round(stats['segments'] / elapsed, 1) if elapsed else 0.0
+
+    return stats
+
+def _progress(stats, total, elapsed):
+    processed = stats['files'] + stats['failed'] + stats['duplicates']
+    return (
+        f"{processed}/{total} files, {stats['failed']} failed, {stats['duplicates']} duplicates, "
+        f"{stats['files'] / elapsed:.1f} files/s, {stats['segments'] / elapsed:.0f} segments/s"
+    )
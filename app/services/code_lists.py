@@ -0,0 +1,72 @@
+from app.db.conn import edi_db_exists
+from app.services.spec_cache import get_cached_code_list, get_cached_element_id
+from core.x12.codes import parse_element_ref
+
+# -------------------------
+# Element code lists
+# -------------------------
+# Code validation and code -> description lookup for qualifiers such as N101, REF01 or DTM01.
+# Elements can be given by id ('98', 'I05') or by segment reference ('N101'); each code list is
+# loaded on first use and kept in the bounded code_list_cache.
+
+def resolve_element(version, element_ref):
+    """Element id for an element id or segment reference ('N101' -> '98'); None if unknown."""
+    parsed = parse_element_ref(element_ref)
+    if parsed is None:
+        return None
+
+    segment_id, element = parsed
+    if segment_id is None:
+        return element
+
+    return get_cached_element_id(version, segment_id, element)
+
+def get_code_list(version, element_ref):
+    """CodeList of the element, or None if the element can't be resolved in this version."""
+    if not edi_db_exists(version):
+        raise ValueError(f"Unknown X12 version {version}")
+
+    element_id = resolve_element(version, element_ref)
+    if element_id is None:
+        return None
+
+    return get_cached_code_list(version, element_id)
+
+def is_valid_code(version, element_ref, code):
+    """True/False for a coded element, None if the element is unknown or has no code list."""
+    code_list = get_code_list(version, element_ref)
+    if not code_list:
+        return None
+
+    return code in code_list
+
+def describe_code(version, element_ref, code):
+    code_list = get_code_list(version, element_ref)
+    return code_list.describe(code) if code_list else None
+
+def lookup_codes(version, lookups):
+    """
+    Resolve many (element_ref, code) pairs at once; each distinct element is resolved once.
+    Returns one dict per lookup, in order: element, element_id, code, valid, description
+    (valid is None when the element is unknown or not coded).
+    """
+    if not edi_db_exists(version):
+        raise ValueError(f"Unknown X12 version {version}")
+
+    code_lists = {}
+    results = []
+
+    for element_ref, code in lookups:
+        if element_ref not in code_lists:
+            code_lists[element_ref] = get_code_list(version, element_ref)
+        code_list = code_lists[element_ref]
+
+        results.append({
+            "element": element_ref,
+            "element_id": code_list.element_id if code_list is not None else None,
+            "code": code,
+            "valid": code in code_list if code_list else None,
+            "description": code_list.describe(code) if code_list else None,
+        })
+
+    return results
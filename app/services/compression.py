@@ -0,0 +1,116 @@
+import gzip
+import os
+import zlib
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware
+
+from app.services.spec_responses import accepts_gzip
+from core.x12.stream import DEFAULT_CHUNK_SIZE
+
+# -------------------------
+# Compressed uploads and responses
+# -------------------------
+# Upload bodies may be sent with Content-Encoding gzip or deflate; BodyDecoder inflates them
+# chunk by chunk on the way into the spool, so the parser still sees the text as it arrives and
+# the stored bytes and file hash are those of the X12 itself (duplicates are found whatever the
+# transport encoding). Responses are gzipped when the client accepts it and the body is at
+# least GZIP_MIN_SIZE bytes: by NegotiatedGZipMiddleware for the regular endpoints, in the parse
+# pool for /parse, whose bodies are too large to compress on the event loop.
+
+UPLOAD_ENCODINGS = ("identity", "gzip", "x-gzip", "deflate")
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+def get_gzip_min_size():
+    """Smallest response body that gets compressed: GZIP_MIN_SIZE if set, otherwise 1024 bytes."""
+    return int(os.getenv("GZIP_MIN_SIZE", "1024"))
+
+def get_gzip_level():
+    """Response gzip level: GZIP_LEVEL if set, otherwise 6."""
+    return int(os.getenv("GZIP_LEVEL", "6"))
+
+class UnsupportedContentEncoding(ValueError):
+    pass
+
+class NegotiatedGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware that honours q=0 (accepts_gzip) and leaves requests that don't accept gzip
+    alone: Starlette's identity path would only append a second Vary to responses that
+    negotiate their own encoding.
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not accepts_gzip(Headers(scope=scope).get("accept-encoding")):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+def gzip_body(body, level=None):
+    """gzip body if it is at least GZIP_MIN_SIZE bytes, else return it as is."""
+    if len(body) < get_gzip_min_size():
+        return body
+    return gzip.compress(body, compresslevel=get_gzip_level() if level is None else level, mtime=0)
+
+def is_gzipped(body):
+    return body[:2] == GZIP_MAGIC
+
+class BodyDecoder:
+    """
+    Incremental decoder for a request's Content-Encoding. decode() yields the decoded pieces of
+    each chunk, at most DEFAULT_CHUNK_SIZE bytes apiece, so a small compressed chunk can't blow
+    up into one huge buffer. Raises UnsupportedContentEncoding for anything but identity, gzip
+    and deflate, ValueError for a corrupt or (on close()) truncated body.
+    """
+
+    def __init__(self, content_encoding=None):
+        codings = [c.strip().lower() for c in (content_encoding or "").split(",") if c.strip()]
+        codings = [c for c in codings if c != "identity"]
+        if len(codings) > 1 or any(c not in UPLOAD_ENCODINGS for c in codings):
+            raise UnsupportedContentEncoding(
+                f"Unsupported Content-Encoding {content_encoding!r}, expected one of {', '.join(UPLOAD_ENCODINGS)}"
+            )
+
+        self.encoding = codings[0] if codings else "identity"
+        self._inflater = None
+        self._wbits = zlib.MAX_WBITS | 16 if self.encoding in ("gzip", "x-gzip") else None
+
+    def decode(self, chunk):
+        if self.encoding == "identity":
+            if chunk:
+                yield chunk
+            return
+
+        try:
+            while chunk:
+                if self._inflater is None:
+                    if self._wbits is None:
+                        # deflate should be zlib-wrapped (RFC 9110), but raw deflate is common too
+                        self._wbits = zlib.MAX_WBITS if _is_zlib_header(chunk) else -zlib.MAX_WBITS
+                    self._inflater = zlib.decompressobj(self._wbits)
+
+                inflater = self._inflater
+                data = chunk
+                while True:
+                    out = inflater.decompress(data, DEFAULT_CHUNK_SIZE)
+                    if out:
+                        yield out
+                    data = inflater.unconsumed_tail
+                    if not data and len(out) < DEFAULT_CHUNK_SIZE:
+                        break
+
+                chunk = inflater.unused_data
+                if chunk:
+                    if self.encoding == "deflate":
+                        raise ValueError("Invalid deflate body: data after the end of the stream")
+                    # concatenated gzip members
+                    self._inflater = None
+        except zlib.error as e:
+            raise ValueError(f"Invalid {self.encoding} body: {e}") from e
+
+    def close(self):
+        if self._inflater is not None and not self._inflater.eof:
+            raise ValueError(f"Truncated {self.encoding} body")
+
+def _is_zlib_header(data):
+    return len(data) >= 2 and data[0] & 0x0F == 8 and (data[0] << 8 | data[1]) % 31 == 0
@@ -0,0 +1,124 @@
+import os
+import socket
+import threading
+import time
+from concurrent.futures import BrokenExecutor, TimeoutError as FutureTimeoutError
+
+from app.db.ingest_jobs import claim_ingest_job, create_ingest_job, finish_ingest_job, renew_ingest_job_lease
+from app.services.spool import spool_upload
+from app.services.x12_pipeline import parse_pool, run_ingest_job
+
+# -------------------------
+# Durable ingest job queue
+# -------------------------
+# POST /api/x12/jobs writes the upload to the spool directory, queues a row in ingest_jobs and
+# answers 202 right away. Job workers (threads in each app process) claim rows, run the upload
+# pipeline in the parse pool and record the outcome and stage timings on the row. A claim is a
+# lease that the worker renews while the job runs; if the process dies, the lease runs out and
+# any worker picks the job up again (X12_JOB_MAX_ATTEMPTS times at most). Queued jobs survive
+# restarts. Spool files are deleted once their job succeeds and kept when it fails.
+
+def get_job_workers():
+    """Job worker threads per process: X12_JOB_WORKERS if set, otherwise 1 (0 disables them)."""
+    return int(os.getenv("X12_JOB_WORKERS", "1"))
+
+def get_job_lease_seconds():
+    return float(os.getenv("X12_JOB_LEASE_SECONDS", "60"))
+
+def get_job_max_attempts():
+    return int(os.getenv("X12_JOB_MAX_ATTEMPTS", "3"))
+
+def get_job_poll_seconds():
+    """How often idle workers look for jobs queued by other processes."""
+    return float(os.getenv("X12_JOB_POLL_SECONDS", "1.0"))
+
+def submit_ingest_job(source, filename=None, duplicate_policy=None, validate=False):
+    """Spool an upload and queue it; returns the job_id. Local workers are woken right away."""
+    path, size = spool_upload(source)
+    return submit_spooled_ingest_job(path, size, filename, duplicate_policy, validate)
+
+def submit_spooled_ingest_job(path, size, filename=None, duplicate_policy=None, validate=False):
+    """Queue an upload already in the spool (e.g. from a SpoolWriter); the file is removed if queueing fails."""
+    try:
+        job_id = create_ingest_job(path, filename, size, duplicate_policy, validate)
+    except BaseException:
+        os.unlink(path)
+        raise
+
+    job_workers.wake()
+    return job_id
+
+class IngestJobWorkers:
+    """Job worker threads of this process; start() on app startup, stop() on shutdown."""
+
+    def __init__(self):
+        self._threads = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def start(self, count=None):
+        count = get_job_workers() if count is None else count
+        self._stop.clear()
+        for n in range(count):
+            worker = f"{socket.gethostname()}:{os.getpid()}:{n}"
+            thread = threading.Thread(target=self._run, args=(worker,), name=f"ingest-job-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=10):
+        """Stop claiming jobs; a job still running keeps its lease until it runs out, then is retried."""
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self, worker):
+        lease_seconds = get_job_lease_seconds()
+        max_attempts = get_job_max_attempts()
+
+        while not self._stop.is_set():
+            try:
+                job = claim_ingest_job(worker, lease_seconds, max_attempts)
+            except Exception:
+                job = None
+
+            if job is None:
+                self._wake.wait(get_job_poll_seconds())
+                self._wake.clear()
+                continue
+
+            self.process(job, worker, lease_seconds, max_attempts)
+
+    def process(self, job, worker, lease_seconds, max_attempts):
+        """Run one claimed job to completion and record its outcome."""
+        started = time.perf_counter()
+        try:
+            future = parse_pool.submit(run_ingest_job, job["spool_path"], job["duplicate_policy"], job["validate"], job["filename"])
+            while True:
+                try:
+                    result, timings = future.result(timeout=lease_seconds / 3)
+                    break
+                except FutureTimeoutError:
+                    renew_ingest_job_lease(job["job_id"], worker, lease_seconds)
+        except BrokenExecutor as e:
+            # the pool process died (e.g. killed for memory); retry unless attempts are used up
+            parse_pool.shutdown(wait=False)
+            status = "queued" if job["attempts"] < max_attempts else "failed"
+            finish_ingest_job(job["job_id"], worker, status, error=f"Worker process died: {e}")
+            return
+        except Exception as e:
+            finish_ingest_job(job["job_id"], worker, "failed", error=f"{type(e).__name__}: {e}")
+            return
+
+        timings["run_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        if finish_ingest_job(job["job_id"], worker, "succeeded", result, timings):
+            try:
+                os.unlink(job["spool_path"])
+            except FileNotFoundError:
+                pass
+
+job_workers = IngestJobWorkers()
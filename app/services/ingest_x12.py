@@ -1,62 +1,174 @@
-from app.db.x12 import create_edi_file, create_edi_interchange, create_functional_group, create_transaction, create_segment, create_element, create_component
+import hashlib
+import os
+import time
+
+from app.db.conn import connect
+from app.db.x12 import insert_edi_file, insert_edi_interchange, insert_functional_group, insert_transaction, bulk_insert_segments, find_edi_file_by_hash
 from app.db.partners import lookup_trading_partner_and_interchange
 
-def ingest_edi_file(edi_file):
+# What to do when an upload's SHA-256 matches a stored file:
+#   reject - raise DuplicateFileError
+#   link   - skip parse/ingest and hand back the stored file_id
+#   force  - parse and store it again
+DUPLICATE_POLICIES = ("reject", "link", "force")
+
+class DuplicateFileError(ValueError):
+    def __init__(self, file_hash, file_id):
+        super().__init__(f"Duplicate file: already stored as file_id {file_id}")
+        self.file_hash = file_hash
+        self.file_id = file_id
+
+    def __reduce__(self):
+        # raised in bulk ingest workers, so it has to survive pickling
+        return (DuplicateFileError, (self.file_hash, self.file_id))
+
+def get_duplicate_policy():
+    """Default policy: X12_DUPLICATE_POLICY if set, otherwise link."""
+    return os.getenv("X12_DUPLICATE_POLICY", "link")
+
+def check_duplicate(raw_bytes, policy=None, known_hashes=None, conn=None, file_hash=None):
+    """
+    Hash raw_bytes and look for a stored copy before anything is parsed. Pass file_hash instead
+    of raw_bytes when the SHA-256 is already known (e.g. computed while the upload streamed in).
+
+    Returns (file_hash, existing_file_id); existing_file_id is None when the file is new or the
+    policy is force. Raises DuplicateFileError under the reject policy. Pass known_hashes (a
+    file_hash -> file_id dict, see app.db.x12.load_edi_file_hashes) to probe in memory instead
+    of the database.
+    """
+    policy = policy or get_duplicate_policy()
+    if policy not in DUPLICATE_POLICIES:
+        raise ValueError(f"Unknown duplicate policy {policy!r}, expected one of {', '.join(DUPLICATE_POLICIES)}")
+
+    file_hash = file_hash or hashlib.sha256(raw_bytes).hexdigest()
+    if policy == "force":
+        return file_hash, None
 
-    def ingest_segment(segment):
-        segment = create_segment(segment)
-        segment['segment_row_id'] = segment.get('segment_row_id', None)
+    if known_hashes is not None:
+        file_id = known_hashes.get(file_hash)
+    else:
+        file_id = find_edi_file_by_hash(file_hash, conn)
 
-        for element in segment.get('elements', []):
-            element['segment_row_id'] = segment.get('segment_row_id', None)
-            element = create_element(element)
+    if file_id is not None and policy == "reject":
+        raise DuplicateFileError(file_hash, file_id)
 
-            for component in element.get('components', []):
-                component['element_row_id'] = element.get('element_row_id', None)
-                create_component(component)
+    return file_hash, file_id
 
-        return segment
+def ingest_edi_file(edi_file, conn=None, commit=True, duplicate_policy=None):
+    """
+    Persist a parsed file (see core.x12.parse.parse_edi_file) in one connection and one transaction.
+
+    Every interchange, group and transaction in the tree is written, so a file batching thousands
+    of transactions costs one call. Segments, elements and components for the whole file go in
+    with executemany. A per-stage timing breakdown (milliseconds) is stored on
+    edi_file['ingest_timings'].
+
+    Pass conn to reuse one connection across many files (bulk ingest); the file is still
+    committed on its own. With commit=False the caller owns the transaction: it has to be
+    open already (BEGIN IMMEDIATE) and is left open, so several files can share one commit.
+
+    check_duplicate runs before the write lock is taken, so two copies arriving together can
+    both pass it. With a duplicate_policy other than force the file_hash is looked up again
+    under the lock: reject raises DuplicateFileError, link writes nothing and returns
+    {'duplicate': True, 'file_id', 'file_hash'}.
+    """
+    if conn is None:
+        with connect() as conn:
+            return _ingest_edi_file(conn, edi_file, commit, duplicate_policy)
+
+    return _ingest_edi_file(conn, edi_file, commit, duplicate_policy)
+
+def _ingest_edi_file(conn, edi_file, commit=True, duplicate_policy=None):
+    timings = {}
+    started = time.perf_counter()
 
     edi_file_dict = edi_file.get('edi_file_dict', None)
-    interchange_dict = edi_file.get('interchange_dict', None)
-    group_dict = edi_file.get('group_dict', None)
-    transaction_dict = edi_file.get('transaction_dict', None)
-    segments_list = edi_file.get('segments', None)
-
-    # attempt to map to your configured partner/interchange
-    partner_id, interchange_id = lookup_trading_partner_and_interchange(
-        isa_sender_id=interchange_dict.get('isa_sender_id', None),
-        isa_receiver_id=interchange_dict.get('isa_receiver_id', None),
-        sender_qual=interchange_dict.get('sender_qual', None),
-        receiver_qual=interchange_dict.get('receiver_qual', None),
-        gs_sender_id=group_dict.get('gs_sender_id', None),
-        gs_receiver_id=group_dict.get('gs_receiver_id', None),
-    )
-
-    # Re-assign database generated values, file_id, partner_id, interchange_id
-    edi_file['edi_file_dict']['partner_id'] = partner_id
-    edi_file['edi_file_dict']['interchange_id'] = interchange_id
-    # Create the file record
-    edi_file['edi_file_dict'] = create_edi_file(edi_file_dict)
-
-    edi_file['interchange_dict']['file_id'] = edi_file['edi_file_dict']['file_id']
-    edi_file['interchange_dict']['partner_id'] = partner_id
-    edi_file['interchange_dict']['interchange_id'] = interchange_id
-    # Create the interchange record
-    edi_file['interchange_dict'] = create_edi_interchange(interchange_dict)
-
-    # Re assign database generate value edi_interchange_id
-    edi_file['group_dict']['edi_interchange_id'] = edi_file['interchange_dict']['edi_interchange_id']
-    # Create the group record
-    edi_file['group_dict'] = create_functional_group(group_dict)
-    edi_file['transaction_dict']['group_id'] = edi_file['group_dict']['group_id']
-
-    # Create the transaction record
-    edi_file['transaction_dict'] = create_transaction(transaction_dict)
-    edi_file['transaction_dict']['group_id'] = edi_file['group_dict']['group_id']
-
-    for segment_dict in segments_list:
-        segment_dict['transaction_id'] = edi_file['transaction_dict']['transaction_id']
-        segment_dict = ingest_segment(segment_dict)
+    interchanges = edi_file.get('interchanges', None) or []
+
+    # attempt to map each interchange to your configured partner/interchange
+    partner_ids = []
+    for interchange_dict in interchanges:
+        groups = interchange_dict.get('groups') or [{}]
+
+        partner_ids.append(lookup_trading_partner_and_interchange(
+            isa_sender_id=interchange_dict.get('isa_sender_id', None),
+            isa_receiver_id=interchange_dict.get('isa_receiver_id', None),
+            sender_qual=interchange_dict.get('sender_qual', None),
+            receiver_qual=interchange_dict.get('receiver_qual', None),
+            gs_sender_id=groups[0].get('gs_sender_id', None),
+            gs_receiver_id=groups[0].get('gs_receiver_id', None),
+            conn=conn,
+        ))
+    lookup_done = time.perf_counter()
+    timings['partner_lookup_ms'] = _ms(started, lookup_done)
+
+    transactions = []
+    separators = []
+    group_count = 0
+
+    cursor = conn.cursor()
+    # take the write lock up front; bulk_insert_segments pre-assigns row ids
+    if commit:
+        cursor.execute("BEGIN IMMEDIATE")
+
+    try:
+        if duplicate_policy not in (None, "force"):
+            file_hash, existing_file_id = check_duplicate(None, duplicate_policy, conn=conn, file_hash=edi_file_dict['file_hash'])
+            if existing_file_id is not None:
+                if commit:
+                    conn.rollback()
+                return {"duplicate": True, "file_id": existing_file_id, "file_hash": file_hash}
+
+        # The file record carries the first interchange's partner
+        partner_id, interchange_id = partner_ids[0] if partner_ids else (None, None)
+        edi_file_dict['partner_id'] = partner_id
+        edi_file_dict['interchange_id'] = interchange_id
+        insert_edi_file(cursor, edi_file_dict)
+
+        for interchange_dict, (partner_id, interchange_id) in zip(interchanges, partner_ids):
+            # Re-assign database generated values, file_id, partner_id, interchange_id
+            interchange_dict['file_id'] = edi_file_dict['file_id']
+            interchange_dict['partner_id'] = partner_id
+            interchange_dict['interchange_id'] = interchange_id
+            insert_edi_interchange(cursor, interchange_dict)
+
+            for group_dict in interchange_dict.get('groups', []):
+                group_dict['edi_interchange_id'] = interchange_dict['edi_interchange_id']
+                insert_functional_group(cursor, group_dict)
+                group_count += 1
+
+                for transaction_dict in group_dict.get('transactions', []):
+                    transaction_dict['group_id'] = group_dict['group_id']
+                    insert_transaction(cursor, transaction_dict)
+                    transactions.append(transaction_dict)
+                    separators.append(interchange_dict)
+
+        envelopes_done = time.perf_counter()
+        timings['insert_envelopes_ms'] = _ms(lookup_done, envelopes_done)
+
+        segment_count, element_count, component_count = bulk_insert_segments(cursor, transactions, timings, separators)
+
+        if commit:
+            commit_started = time.perf_counter()
+            conn.commit()
+            timings['commit_ms'] = _ms(commit_started, time.perf_counter())
+    except BaseException:
+        # don't leave the caller's connection holding the write lock
+        if commit:
+            conn.rollback()
+        raise
+
+    timings['total_ms'] = _ms(started, time.perf_counter())
+    timings['interchanges'] = len(interchanges)
+    timings['groups'] = group_count
+    timings['transactions'] = len(transactions)
+    timings['segments'] = segment_count
+    timings['elements'] = element_count
+    timings['components'] = component_count
+
+    edi_file['ingest_timings'] = timings
 
     return edi_file
+
+def _ms(started, finished):
+    return round((finished - started) * 1000, 3)
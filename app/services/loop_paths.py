@@ -0,0 +1,28 @@
+from app.db.conn import edi_db_exists
+from app.db.transaction_sets import get_transaction_set_loop_rows
+from app.services.spec_cache import compiled_spec_cache
+from core.x12.loops import compile_loop_machine
+
+def get_loop_machine(version, transaction_set_id):
+    """
+    Compiled loop-path machine for (version, transaction_set_id), built on first use and kept in
+    the bounded compiled_spec_cache. Pass as loop_resolver to core.x12.parse.parse_edi_file.
+
+    Returns None when there is no spec DB for the version or the set is not in it, so unknown
+    transactions simply keep loop_path None. Versions without a spec DB are never cached: both
+    values come from the upload (GS08, ST01).
+    """
+    if not edi_db_exists(version):
+        return None
+
+    return compiled_spec_cache.get(
+        ("loop_machine", version, transaction_set_id),
+        lambda: _compile_loop_machine(version, transaction_set_id),
+    )
+
+def _compile_loop_machine(version, transaction_set_id):
+    rows = get_transaction_set_loop_rows(version, transaction_set_id)
+    if not rows:
+        return None
+
+    return compile_loop_machine(rows)
@@ -0,0 +1,189 @@
+import os
+import threading
+from collections import OrderedDict
+
+from app.db.conn import close_edi_connections
+from app.db.element_codes import get_element_codes, get_segment_element_id
+from app.db.spec_snapshot import forget_snapshots
+from app.db.transaction_sets import get_transaction_set
+from app.services.build_mapping_template import build_mapping_template, filter_mandatory_template
+from core.x12.codes import CodeList
+
+# -------------------------
+# Compiled spec cache
+# -------------------------
+# The edi_db spec files are static reference data, so a transaction set (and the templates built
+# from it) only has to be read and assembled once per process. Cached objects are frozen
+# (FrozenDict / tuples) because the same instance is handed to every caller; use thaw() to get a
+# private, mutable copy.
+
+def get_spec_cache_size():
+    """Max cached entries: SPEC_CACHE_SIZE if set, otherwise 256."""
+    return int(os.getenv("SPEC_CACHE_SIZE", "256"))
+
+def get_compiled_spec_cache_size():
+    """Max cached loop machines and validation plans: COMPILED_SPEC_CACHE_SIZE if set, otherwise 256."""
+    return int(os.getenv("COMPILED_SPEC_CACHE_SIZE", "256"))
+
+def get_spec_diff_cache_size():
+    """Max cached cross-version diffs: SPEC_DIFF_CACHE_SIZE if set, otherwise 512."""
+    return int(os.getenv("SPEC_DIFF_CACHE_SIZE", "512"))
+
+def get_spec_response_cache_size():
+    """Max cached gzip response bodies: SPEC_RESPONSE_CACHE_SIZE if set, otherwise 256."""
+    return int(os.getenv("SPEC_RESPONSE_CACHE_SIZE", "256"))
+
+def get_code_list_cache_size():
+    """Max cached code lists / element references: CODE_LIST_CACHE_SIZE if set, otherwise 2048."""
+    return int(os.getenv("CODE_LIST_CACHE_SIZE", "2048"))
+
+class FrozenDict(dict):
+    """A dict that refuses in-place changes. Still a dict, so json.dumps and FastAPI accept it."""
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("cached spec objects are read-only; use thaw() for a mutable copy")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def copy(self):
+        return dict(self)
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+def freeze(obj):
+    """Deep read-only copy: dicts become FrozenDict, lists become tuples."""
+    if isinstance(obj, dict):
+        return FrozenDict({key: freeze(value) for key, value in obj.items()})
+    if isinstance(obj, (list, tuple)):
+        return tuple(freeze(value) for value in obj)
+    return obj
+
+def thaw(obj):
+    """Deep mutable copy of a frozen object: plain dicts and lists."""
+    if isinstance(obj, dict):
+        return {key: thaw(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [thaw(value) for value in obj]
+    return obj
+
+class SpecCache:
+    """Thread-safe, size-bounded LRU of frozen spec objects with hit/miss/eviction counters."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, build):
+        """Cached value for key; on a miss build() is called (outside the lock) and frozen."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        # concurrent misses on the same key may both build; the result is identical
+        value = freeze(build())
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+        return value
+
+    def invalidate(self, version=None):
+        """Drop every entry (or only those of one version). Returns how many were dropped."""
+        with self._lock:
+            if version is None:
+                keys = list(self._entries)
+            else:
+                keys = [key for key in self._entries if key[1] == version]
+
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+
+        return len(keys)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+spec_cache = SpecCache(get_spec_cache_size())
+code_list_cache = SpecCache(get_code_list_cache_size())
+compiled_spec_cache = SpecCache(get_compiled_spec_cache_size())
+spec_diff_cache = SpecCache(get_spec_diff_cache_size())
+spec_response_cache = SpecCache(get_spec_response_cache_size())
+
+def get_cached_transaction_set(version, transaction_set_id):
+    """get_transaction_set through the cache (frozen)."""
+    return spec_cache.get(
+        ("transaction_set", version, transaction_set_id, False),
+        lambda: get_transaction_set(version, transaction_set_id),
+    )
+
+def get_cached_template(version, transaction_set_id, mandatory_only=False):
+    """Mapping template through the cache (frozen); the mandatory-only one is cut from the cached full template."""
+    if mandatory_only:
+        return spec_cache.get(
+            ("template", version, transaction_set_id, True),
+            lambda: filter_mandatory_template(get_cached_template(version, transaction_set_id)),
+        )
+
+    return spec_cache.get(
+        ("template", version, transaction_set_id, False),
+        lambda: build_mapping_template(version, transaction_set_id),
+    )
+
+def get_cached_code_list(version, element_id):
+    """CodeList (frozenset + read-only descriptions) of one element through the code-list cache."""
+    return code_list_cache.get(
+        ("code_list", version, element_id),
+        lambda: CodeList(element_id, get_element_codes(version, element_id)),
+    )
+
+def get_cached_element_id(version, segment_id, element_pos):
+    """get_segment_element_id through the code-list cache (None results are cached too)."""
+    return code_list_cache.get(
+        ("element_ref", version, segment_id, element_pos),
+        lambda: get_segment_element_id(version, segment_id, element_pos),
+    )
+
+def invalidate_spec_cache(version=None):
+    """
+    Call after an edi_db file is replaced. Drops cached specs/templates/code lists/response
+    bodies/loop machines/validation plans for version (all versions if None), every cached diff
+    (they span two versions), plus the loaded spec snapshots and cached spec DB connections,
+    which are rebuilt (or re-checked against the DB) on next use.
+    """
+    dropped = (
+        spec_cache.invalidate(version)
+        + code_list_cache.invalidate(version)
+        + compiled_spec_cache.invalidate(version)
+        + spec_response_cache.invalidate(version)
+        + spec_diff_cache.invalidate()
+    )
+    forget_snapshots(version)
+    close_edi_connections()
+
+    return dropped
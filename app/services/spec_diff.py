@@ -0,0 +1,108 @@
+from app.db.conn import edi_db_exists
+from app.db.element_codes import get_all_element_codes
+from app.db.transaction_sets import AREA_MAP, get_transaction_set_spec_rows
+from app.services.spec_cache import get_cached_code_list, spec_diff_cache
+from core.x12.codes import CodeList
+from core.x12.spec_diff import build_spec_view, diff_spec_views
+
+class _CachedCodeLists:
+    """code_lists for build_spec_view, served from the code-list cache."""
+    __slots__ = ("version",)
+
+    def __init__(self, version):
+        self.version = version
+
+    def get(self, element_id):
+        return get_cached_code_list(self.version, element_id).descriptions
+
+def get_spec_view(version, transaction_set_id, code_lists=None):
+    """Comparable view (see core.x12.spec_diff) of a transaction set, None if the version/set doesn't exist."""
+    if not edi_db_exists(version):
+        return None
+
+    segment_rows, element_rows = get_transaction_set_spec_rows(version, transaction_set_id)
+    if not segment_rows:
+        return None
+
+    return build_spec_view(segment_rows, element_rows, code_lists if code_lists is not None else _CachedCodeLists(version))
+
+def _spec_diff(from_version, to_version, transaction_set_id, old, new, code_diffs=None):
+    for version, view in ((from_version, old), (to_version, new)):
+        if view is None:
+            raise ValueError(f"Transaction set {transaction_set_id} not found in version {version}")
+
+    diff = diff_spec_views(old, new, code_diffs)
+
+    for section in ("loops", "segments"):
+        for items in diff[section].values():
+            for item in items:
+                item["area_name"] = AREA_MAP.get(item["area"])
+
+    return dict(
+        transaction_set_id=transaction_set_id,
+        from_version=from_version,
+        to_version=to_version,
+        **diff,
+    )
+
+def diff_transaction_set(from_version, to_version, transaction_set_id):
+    """Added/removed/changed loops, segments, elements and codes of a transaction set between two versions."""
+    return _spec_diff(
+        from_version,
+        to_version,
+        transaction_set_id,
+        get_spec_view(from_version, transaction_set_id),
+        get_spec_view(to_version, transaction_set_id),
+    )
+
+def get_cached_spec_diff(from_version, to_version, transaction_set_id):
+    """diff_transaction_set through spec_diff_cache (frozen)."""
+    return spec_diff_cache.get(
+        ("diff", from_version, to_version, transaction_set_id),
+        lambda: diff_transaction_set(from_version, to_version, transaction_set_id),
+    )
+
+class SpecDiffBatch:
+    """
+    Many diffs in one go (every set across every version pair). Each version's code lists are
+    loaded once, each view is built once per version, and per-element code diffs are shared by
+    all sets of a version pair. Only the two versions of the current pair are kept in memory, so
+    run the work pair by pair.
+    """
+
+    def __init__(self):
+        self._code_lists = {}  # version -> {element_id: {code: description}}
+        self._views = {}       # (version, transaction_set_id) -> view
+        self._code_diffs = {}  # (from_version, to_version) -> {element_id: code diff}
+
+    def _retain(self, from_version, to_version):
+        keep = (from_version, to_version)
+        for version in [version for version in self._code_lists if version not in keep]:
+            del self._code_lists[version]
+        for key in [key for key in self._views if key[0] not in keep]:
+            del self._views[key]
+        for pair in [pair for pair in self._code_diffs if pair != keep]:
+            del self._code_diffs[pair]
+
+    def _view(self, version, transaction_set_id):
+        key = (version, transaction_set_id)
+        if key not in self._views:
+            if version not in self._code_lists:
+                self._code_lists[version] = {
+                    element_id: CodeList(element_id, rows).descriptions
+                    for element_id, rows in get_all_element_codes(version).items()
+                } if edi_db_exists(version) else {}
+            self._views[key] = get_spec_view(version, transaction_set_id, self._code_lists[version])
+        return self._views[key]
+
+    def diff(self, from_version, to_version, transaction_set_id):
+        self._retain(from_version, to_version)
+
+        return _spec_diff(
+            from_version,
+            to_version,
+            transaction_set_id,
+            self._view(from_version, transaction_set_id),
+            self._view(to_version, transaction_set_id),
+            self._code_diffs.setdefault((from_version, to_version), {}),
+        )
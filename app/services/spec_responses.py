@@ -0,0 +1,70 @@
+import gzip
+import hashlib
+import json
+from email.utils import formatdate, parsedate_to_datetime
+
+from app.db.spec_snapshot import spec_checksum
+from app.services.spec_cache import spec_response_cache
+
+# -------------------------
+# HTTP caching for spec endpoints
+# -------------------------
+# Spec responses only change when the version's spec DB file does, so each one gets a strong
+# ETag from the DB's SHA-256 plus the request parameters. It is known before anything is built,
+# so conditional requests are answered without touching the spec or template. Bodies are
+# serialized once and cached gzip-compressed (deterministic: no timestamp in the gzip header);
+# clients that don't accept gzip get them decompressed. The gzip representation has its own
+# ETag ("...-gzip") since strong ETags must differ between encodings.
+
+def spec_etag(version, *params):
+    """Strong ETag (quoted, identity representation) for a spec response of version."""
+    key = "\0".join([spec_checksum(version)["sha256"], version, *(str(param) for param in params)])
+    return '"' + hashlib.sha256(key.encode()).hexdigest()[:32] + '"'
+
+def gzip_etag(etag):
+    return etag[:-1] + '-gzip"'
+
+def spec_last_modified(version):
+    """Last-Modified HTTP date of version's spec DB."""
+    return formatdate(spec_checksum(version)["mtime_ns"] / 1e9, usegmt=True)
+
+def is_not_modified(etag, last_modified, if_none_match=None, if_modified_since=None):
+    """
+    Should a conditional GET get 304? If-None-Match wins over If-Modified-Since (RFC 9110);
+    either representation's ETag matches, weak (W/) or not.
+    """
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag in tags or gzip_etag(etag) in tags
+
+    if if_modified_since is not None:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+
+    return False
+
+def accepts_gzip(accept_encoding):
+    """Does an Accept-Encoding header allow gzip (and not with q=0)?"""
+    for coding in (accept_encoding or "").split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "").lower() not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+def encode_json(content):
+    """Same compact JSON FastAPI's JSONResponse writes."""
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+def get_cached_response_body(version, params, build):
+    """
+    gzip-compressed JSON of build() through spec_response_cache. The key includes the spec DB
+    checksum, so a replaced file never serves a body under its new ETag.
+    """
+    return spec_response_cache.get(
+        ("response", version, spec_checksum(version)["sha256"], *params),
+        lambda: gzip.compress(encode_json(build()), compresslevel=6, mtime=0),
+    )
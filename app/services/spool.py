@@ -0,0 +1,114 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import uuid
+
+from app.db.conn import get_db_path
+from core.x12.parse import check_isa_header
+
+# -------------------------
+# Upload spool
+# -------------------------
+# Uploads are written to disk as they arrive instead of being collected in memory. A file is
+# first written as <name>.part and renamed to <name>.x12 once complete (after fsync), so a file
+# under its final name is always a whole upload. A client that stops sending for
+# X12_RECEIVE_TIMEOUT seconds is cut off.
+
+def get_receive_timeout():
+    """Longest wait for the next chunk of an upload: X12_RECEIVE_TIMEOUT if set, otherwise 30 seconds."""
+    return float(os.getenv("X12_RECEIVE_TIMEOUT", "30"))
+
+def get_spool_path():
+    """Spool directory: X12_SPOOL_PATH if set, otherwise spool/ next to the database."""
+    return os.getenv("X12_SPOOL_PATH") or os.path.join(os.path.dirname(os.path.abspath(get_db_path())), "spool")
+
+class SpoolWriter:
+    """
+    Write one upload chunk by chunk: SHA-256 and size are kept incrementally and the ISA header
+    is checked as soon as its bytes are in (write() raises ValueError on a bad one, before the
+    rest of the upload is read). commit() publishes the file, discard() removes it. Pass
+    check_isa=False for uploads that aren't X12 themselves (archives).
+    """
+
+    def __init__(self, spool_dir=None, check_isa=True, suffix=".x12"):
+        spool_dir = spool_dir or get_spool_path()
+        os.makedirs(spool_dir, exist_ok=True)
+
+        name = uuid.uuid4().hex
+        self.part_path = os.path.join(spool_dir, f"{name}.part")
+        self.path = os.path.join(spool_dir, f"{name}{suffix}")
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self._header = b""
+        self._header_ok = not check_isa
+        self._file = open(self.part_path, "wb")
+
+    def write(self, chunk):
+        if not chunk:
+            return
+
+        if not self._header_ok:
+            self._header += chunk[:106]
+            self._header_ok = check_isa_header(self._header) is not None
+
+        self.sha256.update(chunk)
+        self.size += len(chunk)
+        self._file.write(chunk)
+
+    @property
+    def file_hash(self):
+        return self.sha256.hexdigest()
+
+    def commit(self, fsync=True):
+        """
+        Publish the upload under self.path (durably unless fsync=False, for files that don't
+        outlive the request); ValueError if it is empty or shorter than an ISA.
+        """
+        if not self.size:
+            raise ValueError("Empty request body. Send X12 as text/plain or upload a file.")
+        if not self._header_ok:
+            raise ValueError("File does not contain a full ISA segment")
+
+        self._file.flush()
+        if fsync:
+            os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self.part_path, self.path)
+        return self.path
+
+    def discard(self):
+        """Remove the upload, published or not."""
+        if not self._file.closed:
+            self._file.close()
+        for path in (self.part_path, self.path):
+            if os.path.exists(path):
+                os.unlink(path)
+
+def spool_upload(source):
+    """
+    Write a whole upload (bytes or a binary file object) into the spool directory, durably (fsync
+    before the rename), and return (path, size).
+    """
+    spool_dir = get_spool_path()
+    os.makedirs(spool_dir, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=spool_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                f.write(source)
+            else:
+                shutil.copyfileobj(source, f, 1024 * 1024)
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+
+        path = os.path.join(spool_dir, f"{uuid.uuid4().hex}.x12")
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    return path, size
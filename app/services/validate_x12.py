@@ -0,0 +1,72 @@
+from app.db.conn import edi_db_exists
+from app.db.transaction_sets import get_transaction_set_rule_rows
+from app.services.spec_cache import compiled_spec_cache
+from core.x12.loops import release_version
+from core.x12.validate import compile_validation_plan, validate_segments
+
+def get_validation_plan(version, transaction_set_id):
+    """
+    Compiled validation plan for (version, transaction_set_id), built on first use and kept in the
+    bounded compiled_spec_cache. None when the version or transaction set is not in the spec
+    DBs; versions without a spec DB are never cached.
+    """
+    if not edi_db_exists(version):
+        return None
+
+    return compiled_spec_cache.get(
+        ("validation_plan", version, transaction_set_id),
+        lambda: _compile_validation_plan(version, transaction_set_id),
+    )
+
+def _compile_validation_plan(version, transaction_set_id):
+    segment_rows, element_rows, code_rows, condition_rows = get_transaction_set_rule_rows(version, transaction_set_id)
+    if not segment_rows:
+        return None
+
+    return compile_validation_plan(segment_rows, element_rows, code_rows, condition_rows)
+
+def validate_transaction(version, transaction_set_id, segments, separators=None):
+    """
+    Check one parsed transaction against the spec: mandatory segments/loops/elements, segment
+    order and max use, element data type, min/max length, code values and relational
+    conditions (P/R/E/C/L).
+
+    Returns (is_valid, errors) like validate_template_data.
+    """
+    plan = get_validation_plan(version, transaction_set_id)
+    if plan is None:
+        raise ValueError(f"Transaction set {transaction_set_id} not found in version {version}")
+
+    errors = validate_segments(plan, segments, separators)
+
+    return len(errors) == 0, errors
+
+def validate_edi_file(edi_file):
+    """
+    Validate every transaction of a parse_edi_file result. Each transaction dict gets
+    'validation': {'valid', 'errors'}; the version comes from GS08. Returns True if all passed.
+    """
+    all_valid = True
+
+    for interchange in edi_file.get('interchanges', []):
+        for group in interchange.get('groups', []):
+            version = release_version(group.get('x12_release'))
+
+            for transaction in group.get('transactions', []):
+                try:
+                    is_valid, errors = validate_transaction(
+                        version, transaction.get('transaction_set_id'), transaction.get('segments', []), interchange
+                    )
+                except ValueError as e:
+                    is_valid, errors = False, [{
+                        'code': 'unknown_transaction_set',
+                        'message': str(e),
+                        'position': None,
+                        'segment_id': None,
+                        'element_pos': None,
+                    }]
+
+                transaction['validation'] = {'valid': is_valid, 'errors': errors}
+                all_valid = all_valid and is_valid
+
+    return all_valid
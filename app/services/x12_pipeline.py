@@ -0,0 +1,368 @@
+import asyncio
+import collections
+import contextlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from fastapi.encoders import jsonable_encoder
+
+from app.services.compression import gzip_body
+from app.services.ingest_x12 import check_duplicate, get_duplicate_policy, ingest_edi_file
+from app.services.loop_paths import get_loop_machine
+from core.x12.model import to_dict_records
+from core.x12.parse import StreamingParser, parse_edi_file
+from core.x12.stream import read_chunks
+
+# -------------------------
+# Upload pipeline
+# -------------------------
+# Duplicate check, parse, optional validation, ingest and JSON encoding of an upload all run
+# in a bounded pool, off the event loop: they are CPU-bound or SQLite I/O, and the response of a
+# large file is far bigger than the file itself, so even encoding it would stall every other
+# request of the worker. A process pool (default) also keeps the GIL out of the way; spawn, not
+# fork, since the server process is threaded. At most X12_PARSE_CONCURRENCY uploads run at once
+# and at most X12_PARSE_MAX_PENDING wait for a slot; beyond that ParsePoolBusy is raised.
+#
+# /parse writes the body into the spool (app.services.spool) as it arrives and only takes a
+# slot once the upload is complete, so a slow or stalled client never holds one. The worker
+# then runs on the spool file (run_spooled_parse_pipeline): duplicates are found from the hash
+# taken while receiving, before any parsing, and the file is parsed and stored chunk by chunk.
+
+def get_parse_executor_kind():
+    """process (default) or thread: X12_PARSE_EXECUTOR."""
+    return os.getenv("X12_PARSE_EXECUTOR", "process").lower()
+
+def get_parse_concurrency():
+    """Uploads processed at once: X12_PARSE_CONCURRENCY if set, otherwise 2."""
+    return max(1, int(os.getenv("X12_PARSE_CONCURRENCY", "2")))
+
+def get_parse_max_pending():
+    """Uploads allowed to wait for a slot: X12_PARSE_MAX_PENDING if set, otherwise 16."""
+    return int(os.getenv("X12_PARSE_MAX_PENDING", "16"))
+
+def _ms(started, finished):
+    return round((finished - started) * 1000, 2)
+
+def encode_json(content):
+    """jsonable_encoder + the compact dump FastAPI's JSONResponse writes."""
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+def _ingest_upload(data, duplicate_policy, validate, timings, filename=None, source="manual upload"):
+    """
+    Duplicate check -> parse -> validate -> ingest; returns the ingested parse result (or the
+    duplicate dict). Stage times (ms) go into timings.
+    """
+    started = time.perf_counter()
+
+    file_hash, existing_file_id = check_duplicate(data, duplicate_policy)
+    checked = time.perf_counter()
+    timings["dedup_ms"] = _ms(started, checked)
+
+    if existing_file_id is not None:
+        return {"duplicate": True, "file_id": existing_file_id, "file_hash": file_hash}
+
+    # zero-decode: tokenize on the raw bytes, ingest builds rows straight from segment text
+    parsed = parse_edi_file(data, source, zero_decode=True, file_hash=file_hash, loop_resolver=get_loop_machine)
+    if filename:
+        parsed['edi_file_dict']['filename'] = filename
+    parsed_at = time.perf_counter()
+    timings["parse_ms"] = _ms(checked, parsed_at)
+
+    return _validate_and_ingest(parsed, duplicate_policy, validate, timings)
+
+def _validate_and_ingest(parsed, duplicate_policy, validate, timings):
+    started = time.perf_counter()
+    if validate:
+        from app.services.validate_x12 import validate_edi_file
+        validate_edi_file(parsed)
+        validated_at = time.perf_counter()
+        timings["validate_ms"] = _ms(started, validated_at)
+        started = validated_at
+
+    # checked again under the write lock, for a copy stored while this one was parsed
+    result = ingest_edi_file(parsed, duplicate_policy=duplicate_policy or get_duplicate_policy())
+    timings["ingest_ms"] = _ms(started, time.perf_counter())
+    return result
+
+def _encode_result(result, timings, started, compress=False):
+    encode_started = time.perf_counter()
+    if not result.get("duplicate"):
+        to_dict_records(result)
+    body = encode_json(result)
+    finished = time.perf_counter()
+    timings["encode_ms"] = _ms(encode_started, finished)
+
+    if compress:
+        body = gzip_body(body)
+        compressed = time.perf_counter()
+        timings["compress_ms"] = _ms(finished, compressed)
+        finished = compressed
+    timings["pipeline_ms"] = _ms(started, finished)
+    return body
+
+def run_spooled_parse_pipeline(path, file_hash, duplicate_policy=None, validate=False, compress=False):
+    """
+    Duplicate check -> parse -> validate -> ingest for an upload in the spool (see SpoolWriter),
+    given the SHA-256 taken while it was received. Returns (JSON body bytes, {stage: ms}); with
+    compress, the body is gzipped once it is big enough (see app.services.compression.gzip_body).
+
+    The duplicate check comes first, so a duplicate is never parsed: a linked one comes back as
+    {'duplicate': True, 'file_id', 'file_hash'}. The file is then parsed in chunks and
+    edi_files.raw_bytes is copied from it through the blob API, so the upload isn't held in
+    memory next to its parse tree; it is only read back for the response. Raises
+    DuplicateFileError (reject policy), ValueError (bad policy) or whatever the parser/ingest raise.
+    """
+    timings = {}
+    started = time.perf_counter()
+
+    file_hash, existing_file_id = check_duplicate(None, duplicate_policy, file_hash=file_hash)
+    checked = time.perf_counter()
+    timings["dedup_ms"] = _ms(started, checked)
+
+    if existing_file_id is not None:
+        result = {"duplicate": True, "file_id": existing_file_id, "file_hash": file_hash}
+        return _encode_result(result, timings, started, compress), timings
+
+    parser = StreamingParser(loop_resolver=get_loop_machine)
+    with open(path, "rb") as f:
+        for chunk in read_chunks(f):
+            parser.feed(chunk)
+    parsed = parser.close(file_hash)
+    parsed["edi_file_dict"]["raw_path"] = path
+    parsed_at = time.perf_counter()
+    timings["parse_ms"] = _ms(checked, parsed_at)
+
+    result = _validate_and_ingest(parsed, duplicate_policy, validate, timings)
+    if result.get("duplicate"):
+        return _encode_result(result, timings, started, compress), timings
+
+    # the response carries the upload itself
+    read_started = time.perf_counter()
+    edi_file_dict = result["edi_file_dict"]
+    del edi_file_dict["raw_path"]
+    with open(path, "rb") as f:
+        edi_file_dict["raw_bytes"] = f.read()
+    timings["read_spool_ms"] = _ms(read_started, time.perf_counter())
+
+    return _encode_result(result, timings, started, compress), timings
+
+def run_ingest_job(spool_path, duplicate_policy=None, validate=False, filename=None):
+    """
+    The upload pipeline for a queued job (app.services.ingest_jobs): read the spooled file and
+    ingest it. Returns (summary, {stage: ms}); the summary has file_id, file_hash, duplicate, the
+    ingest counts and, with validate, how many transactions failed validation.
+    """
+    timings = {}
+    started = time.perf_counter()
+
+    with open(spool_path, "rb") as f:
+        data = f.read()
+    read_at = time.perf_counter()
+    timings["read_spool_ms"] = _ms(started, read_at)
+
+    result = _ingest_upload(data, duplicate_policy, validate, timings, filename, source="api job")
+
+    if result.get("duplicate"):
+        summary = result
+    else:
+        counts = result["ingest_timings"]
+        summary = {
+            "duplicate": False,
+            "file_id": result["edi_file_dict"]["file_id"],
+            "file_hash": result["edi_file_dict"]["file_hash"],
+            **{key: counts[key] for key in ("interchanges", "groups", "transactions", "segments", "elements", "components")},
+        }
+        if validate:
+            summary["invalid_transactions"] = sum(
+                1
+                for interchange in result["interchanges"]
+                for group in interchange.get("groups", [])
+                for transaction in group.get("transactions", [])
+                if not transaction.get("validation", {}).get("valid", True)
+            )
+        timings["ingest"] = {key: value for key, value in counts.items() if key.endswith("_ms")}
+
+    timings["pipeline_ms"] = _ms(started, time.perf_counter())
+    return summary, timings
+
+class ParsePoolBusy(Exception):
+    pass
+
+class ParsePool:
+    """
+    Bounded executor + admission control for the upload pipelines, with counters for /metrics.
+
+    Slots are shared between the event loop (slot() + execute(), for /parse) and sync callers
+    (submit_in_slot(), for archive batches), so running/pending cover everything queued in the
+    executor. A released slot is handed to the longest waiter.
+    """
+
+    def __init__(self, kind=None, concurrency=None, max_pending=None):
+        self.kind = kind or get_parse_executor_kind()
+        self.concurrency = concurrency or get_parse_concurrency()
+        self.max_pending = get_parse_max_pending() if max_pending is None else max_pending
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._lock = threading.Lock()
+        # threading.Event for sync waiters, (loop, future) for async ones
+        self._waiters = collections.deque()
+        self.running = 0
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                if self.kind == "thread":
+                    self._executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix="x12-parse")
+                elif self.kind == "process":
+                    self._executor = ProcessPoolExecutor(self.concurrency, mp_context=multiprocessing.get_context("spawn"))
+                else:
+                    raise ValueError(f"Unknown X12_PARSE_EXECUTOR {self.kind!r}, expected process or thread")
+            return self._executor
+
+    def _take_free_slot(self):
+        # caller holds self._lock
+        if self.running < self.concurrency and not self._waiters:
+            self.running += 1
+            return True
+        return False
+
+    def _release(self):
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                self.pending -= 1
+                if isinstance(waiter, threading.Event):
+                    waiter.set()
+                    return
+                loop, future = waiter
+                try:
+                    loop.call_soon_threadsafe(self._grant, future)
+                    return
+                except RuntimeError:
+                    # that waiter's loop is closed
+                    continue
+            self.running -= 1
+
+    def _grant(self, future):
+        # on the waiter's loop; if it gave up in the meantime, pass the slot on
+        if future.cancelled():
+            self._release()
+        else:
+            future.set_result(None)
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        """
+        Admission control + one of the concurrency slots, for running work with execute();
+        yields the time spent waiting (ms). Raises ParsePoolBusy when the queue is full.
+        """
+        queued = time.perf_counter()
+        with self._lock:
+            if self.running >= self.concurrency and self.pending >= self.max_pending:
+                self.rejected += 1
+                raise ParsePoolBusy(f"{self.running} uploads in progress and {self.pending} waiting; retry later")
+            future = None
+            if not self._take_free_slot():
+                loop = asyncio.get_running_loop()
+                future = loop.create_future()
+                self._waiters.append((loop, future))
+                self.pending += 1
+
+        if future is not None:
+            try:
+                await future
+            except asyncio.CancelledError:
+                with self._lock:
+                    waiting = (loop, future) in self._waiters
+                    if waiting:
+                        self._waiters.remove((loop, future))
+                        self.pending -= 1
+                if not waiting and future.done() and not future.cancelled():
+                    # granted just before the cancellation landed
+                    self._release()
+                raise
+
+        try:
+            yield _ms(queued, time.perf_counter())
+            self.completed += 1
+        except BrokenExecutor:
+            # a worker died (e.g. killed for memory); start a fresh pool for the next upload
+            self.failed += 1
+            self.shutdown(wait=False)
+            raise
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            self._release()
+
+    def execute(self, fn, *args):
+        """Run fn(*args) in the pool from the event loop; returns an awaitable future. Hold a slot()."""
+        return asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+
+    def submit_in_slot(self, fn, *args):
+        """
+        Run fn(*args) in the pool from sync code, holding a concurrency slot until it finishes;
+        blocks while none is free. Returns the Future.
+        """
+        with self._lock:
+            event = None
+            if not self._take_free_slot():
+                event = threading.Event()
+                self._waiters.append(event)
+                self.pending += 1
+        if event is not None:
+            event.wait()
+
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._settle)
+        return future
+
+    def _settle(self, future):
+        with self._lock:
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+        self._release()
+
+    def submit(self, fn, *args):
+        """
+        Run fn(*args) in the pool from sync code, outside admission control; returns the Future.
+        For job workers, whose thread count already bounds them.
+        """
+        return self._get_executor().submit(fn, *args)
+
+    def shutdown(self, wait=True):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=True)
+                self._executor = None
+
+    def stats(self):
+        return {
+            "executor": self.kind,
+            "concurrency": self.concurrency,
+            "max_pending": self.max_pending,
+            "running": self.running,
+            "pending": self.pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+parse_pool = ParsePool()
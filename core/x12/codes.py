@@ -0,0 +1,49 @@
+import re
+from types import MappingProxyType
+
+# "98", "1250", "I05" (ISA/GS element ids) vs segment references like "N101", "REF01", "DTM01"
+ELEMENT_ID_RE = re.compile(r"\d+|I\d\d")
+ELEMENT_REF_RE = re.compile(r"([A-Z][A-Z0-9]{1,2})(\d\d)")
+
+def parse_element_ref(ref):
+    """
+    'N101' -> ('N1', 1), '98' -> (None, '98'). Returns None when ref is neither a segment
+    reference nor an element id.
+    """
+    ref = ref.strip().upper()
+    if ELEMENT_ID_RE.fullmatch(ref):
+        # the spec DBs store numeric ids without leading zeros
+        return None, str(int(ref)) if ref.isdigit() else ref
+
+    match = ELEMENT_REF_RE.fullmatch(ref)
+    if match is None:
+        return None
+    return match.group(1), int(match.group(2))
+
+class CodeList:
+    """
+    Allowed values of one coded element: a frozenset for membership checks and a read-only
+    code -> description mapping.
+    """
+    __slots__ = ("element_id", "codes", "descriptions")
+
+    def __init__(self, element_id, rows):
+        descriptions = {}
+        for value, description in rows:
+            descriptions.setdefault(value, description)
+
+        self.element_id = element_id
+        self.codes = frozenset(descriptions)
+        self.descriptions = MappingProxyType(descriptions)
+
+    def __contains__(self, code):
+        return code in self.codes
+
+    def __len__(self):
+        return len(self.codes)
+
+    def describe(self, code):
+        return self.descriptions.get(code)
+
+    def __repr__(self):
+        return f"CodeList({self.element_id!r}, {len(self.codes)} codes)"
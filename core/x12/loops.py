@@ -0,0 +1,153 @@
+# -------------------------
+# Loop-path state machine
+# -------------------------
+# A transaction set's segment table (transaction_set_segments, in table order) is compiled once
+# into a flat automaton: every segment row of the spec is a state, and each state has a dict of
+# segment_id -> next state. Walking a transaction is then one dict lookup per segment.
+#
+# Transitions follow the usual X12 rule: look forward in the current loop (a segment may repeat,
+# a nested loop is entered on its first segment), and if nothing matches, leave the loop and look
+# forward in the parent from the loop's own position (so its first segment starts a new
+# iteration). A segment the spec does not place keeps the current state and loop path.
+
+START_STATE = 0
+
+class SpecLoop:
+    """One loop of the spec tree (the root has loop_id None). row is its opening marker row."""
+    __slots__ = ("loop_id", "parent", "index", "path", "children", "row")
+
+    def __init__(self, loop_id, parent, index, row=None):
+        self.loop_id = loop_id
+        self.parent = parent
+        self.index = index
+        self.row = row
+        self.children = []  # entry indexes (segments) and nested SpecLoop objects, in spec order
+
+        if parent is None or parent.path is None:
+            self.path = loop_id
+        else:
+            self.path = f"{parent.path}/{loop_id}"
+
+class LoopMachine:
+    """
+    Compiled loop automaton for one transaction set. Immutable once built, so one instance is
+    shared by every parse (see compile_loop_machine).
+
+    loop_path is the "/"-joined chain of loop ids (e.g. "IT1/SLN"), None outside any loop.
+    """
+    __slots__ = ("transitions", "paths")
+
+    def __init__(self, transitions, paths):
+        self.transitions = transitions
+        self.paths = paths
+
+    def step(self, state, segment_id):
+        """Next state after segment_id (unchanged if the spec has no place for it)."""
+        return self.transitions[state].get(segment_id, state)
+
+    def loop_path(self, state):
+        return self.paths[state]
+
+    def assign(self, segments):
+        """Set loop_path on a transaction's segments (dicts or segment objects) in one pass."""
+        transitions = self.transitions
+        paths = self.paths
+        state = START_STATE
+
+        for segment in segments:
+            if isinstance(segment, dict):
+                state = transitions[state].get(segment["segment_id"], state)
+                segment["loop_path"] = paths[state]
+            else:
+                state = transitions[state].get(segment.segment_id, state)
+                segment.loop_path = paths[state]
+
+        return segments
+
+def build_spec_tree(rows):
+    """
+    Nest transaction_set_segments rows (dicts or sqlite3.Row with segment_id and
+    segment_loop_id), ordered by transaction_set_segment_id. Loop marker rows have no
+    segment_id; the same loop id opens and then closes the loop.
+
+    Returns (root, entries): entries[n] is (segment_id, loop, index in loop.children, row) for
+    the n-th segment row of the spec.
+    """
+    root = SpecLoop(None, None, None)
+    entries = []
+
+    stack = [root]
+    for row in rows:
+        segment_id = row["segment_id"]
+        loop_id = row["segment_loop_id"]
+
+        if segment_id is None:
+            if loop_id is None:
+                continue
+
+            top = stack[-1]
+            if top.loop_id != loop_id:
+                loop = SpecLoop(loop_id, top, len(top.children), row)
+                top.children.append(loop)
+                stack.append(loop)
+            else:
+                stack.pop()
+            continue
+
+        top = stack[-1]
+        entries.append((segment_id, top, len(top.children), row))
+        top.children.append(len(entries) - 1)
+
+    if len(stack) > 1:
+        raise ValueError(f"Unclosed loops found: {[loop.loop_id for loop in stack[1:]]}")
+
+    return root, entries
+
+def first_entry(loop):
+    """Index of the first segment entry in loop (its trigger), or None for an empty loop."""
+    for child in loop.children:
+        if isinstance(child, int):
+            return child
+        entry = first_entry(child)
+        if entry is not None:
+            return entry
+    return None
+
+def compile_loop_machine(rows):
+    """Build a LoopMachine from transaction_set_segments rows (see build_spec_tree)."""
+    root, entries = build_spec_tree(rows)
+
+    def _next_entry(loop, index, segment_id):
+        while loop is not None:
+            for child in loop.children[index:]:
+                if not isinstance(child, int):
+                    child = first_entry(child)
+                if child is not None and entries[child][0] == segment_id:
+                    return child
+            index = loop.index
+            loop = loop.parent
+        return None
+
+    segment_ids = {entry[0] for entry in entries}
+
+    # state 0 is the start (before the first segment), state n + 1 is entry n
+    positions = [(root, 0)] + [(loop, index) for _, loop, index, _ in entries]
+
+    transitions = []
+    for loop, index in positions:
+        table = {}
+        for segment_id in segment_ids:
+            entry = _next_entry(loop, index, segment_id)
+            if entry is not None:
+                table[segment_id] = entry + 1
+        transitions.append(table)
+
+    paths = (None,) + tuple(loop.path for _, loop, _, _ in entries)
+
+    return LoopMachine(tuple(transitions), paths)
+
+def release_version(x12_release):
+    """Spec DB version for a GS08 release code, e.g. '004010X091A1' -> '004010'."""
+    if not x12_release:
+        return None
+    return x12_release.strip()[:6] or None
@@ -0,0 +1,332 @@
+# -------------------------
+# Compact segment model
+# -------------------------
+# Per-segment/per-element dicts cost several hundred bytes each before any EDI text is stored.
+# These __slots__ classes hold the same data with no per-instance __dict__; components are a
+# plain tuple of strings (component_pos is the 1-based index). to_dict() gives back the exact
+# shape the dict parser produces, for callers and the ingest path that still expect it.
+
+class _ElementAccess:
+    """Shared accessors; subclasses provide element_pos, repetition_index, value_text, components."""
+    __slots__ = ()
+
+    @property
+    def is_composite(self):
+        return 1 if self.components is not None else 0
+
+    def component(self, component_pos):
+        """1-based component value, or None if not present."""
+        components = self.components
+        if components is None or component_pos < 1 or component_pos > len(components):
+            return None
+        return components[component_pos - 1]
+
+    def to_dict(self):
+        return {
+            'element_pos': self.element_pos,
+            'is_composite': self.is_composite,
+            'value_text': self.value_text,
+            'present': 1,
+            'repetition_index': self.repetition_index,
+            'components': [
+                {'component_pos': component_pos, 'value_text': cval}
+                for component_pos, cval in enumerate(self.components or (), start=1)
+            ],
+        }
+
+    def __repr__(self):
+        name = type(self).__name__
+        if self.components is not None:
+            return f"{name}({self.element_pos}, {self.repetition_index}, components={self.components!r})"
+        return f"{name}({self.element_pos}, {self.repetition_index}, {self.value_text!r})"
+
+class _SegmentAccess:
+    """Shared accessors; subclasses provide segment_id, position, loop_path, raw_segment, elements."""
+    __slots__ = ()
+
+    def element(self, element_pos, repetition_index=1):
+        """Element at a 1-based position (first repetition by default), or None."""
+        for element in self.elements:
+            if element.element_pos == element_pos and element.repetition_index == repetition_index:
+                return element
+        return None
+
+    def value(self, element_pos, component_pos=None):
+        """Shortcut for the text of an element (or one of its components)."""
+        element = self.element(element_pos)
+        if element is None:
+            return None
+        if component_pos is not None:
+            return element.component(component_pos)
+        return element.value_text
+
+    def element_values(self, separators):
+        """
+        (element_pos, repetition_index, value_text, components) tuples straight from the raw text,
+        without building element objects. separators is the interchange/sep dict.
+        """
+        return iter_element_values(
+            self.raw_segment.split(separators["element_sep"])[1:],
+            separators["repetition_sep"],
+            separators["component_sep"],
+        )
+
+    def to_dict(self, transaction_id=None, separators=None):
+        """
+        Dict shape of the segment. When the separators dict is passed, elements are rebuilt from
+        the raw text in one pass (much cheaper than walking element objects).
+        """
+        raw_segment = self.raw_segment
+
+        if separators is not None:
+            elements = build_element_dicts(
+                raw_segment.split(separators["element_sep"])[1:],
+                separators["repetition_sep"],
+                separators["component_sep"],
+            )
+        else:
+            elements = [element.to_dict() for element in self.elements]
+
+        return {
+            'transaction_id': transaction_id,
+            'position': self.position,
+            'segment_id': self.segment_id,
+            'loop_path': self.loop_path,
+            'raw_segment': raw_segment,
+            'elements': elements,
+        }
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.position}, {self.raw_segment!r})"
+
+def iter_element_values(seg_elements, repetition_sep, component_sep):
+    """
+    Flat (element_pos, repetition_index, value_text, components) tuples for one segment's
+    already-split elements; components is a tuple for composites, else None.
+    Used by the ingest path to build rows without materializing element objects or dicts.
+    """
+    for element_pos, val in enumerate(seg_elements, start=1):
+        reps = val.split(repetition_sep) if repetition_sep and repetition_sep in val else (val,)
+
+        for rep_index, rep_val in enumerate(reps, start=1):
+            if component_sep and component_sep in rep_val:
+                yield element_pos, rep_index, None, tuple(rep_val.split(component_sep))
+            else:
+                yield element_pos, rep_index, rep_val, None
+
+def build_element_dicts(seg_elements, repetition_sep, component_sep):
+    """Element dicts (one per repetition) for the already-split elements of one segment."""
+    elements = []
+
+    for element_pos, val in enumerate(seg_elements, start=1):
+        # val can be "" (blank) and is still "present"
+        if val is None:
+            val = ""
+
+        reps = [val]
+        if repetition_sep and repetition_sep in val:
+            reps = val.split(repetition_sep)
+
+        # one row per repetition
+        for rep_index, rep_val in enumerate(reps, start=1):
+            element_dict = {
+                'element_pos': element_pos,
+                'is_composite': 0,
+                'value_text': None,
+                'present': 1,
+                'repetition_index': rep_index,
+                'components': [],
+            }
+
+            if component_sep and component_sep in rep_val:
+                element_dict['is_composite'] = 1
+
+                components = rep_val.split(component_sep)
+                for component_pos, cval in enumerate(components, start=1):
+                    element_dict['components'].append({
+                        'component_pos': component_pos,
+                        'value_text': cval
+                    })
+            else:
+                element_dict['value_text'] = rep_val
+
+            elements.append(element_dict)
+
+    return elements
+
+class Element(_ElementAccess):
+    __slots__ = ("element_pos", "repetition_index", "value_text", "components")
+
+    def __init__(self, element_pos, repetition_index, value_text, components=None):
+        self.element_pos = element_pos
+        self.repetition_index = repetition_index
+        self.value_text = value_text
+        self.components = components
+
+class Segment(_SegmentAccess):
+    __slots__ = ("segment_id", "position", "loop_path", "raw_segment", "elements")
+
+    def __init__(self, segment_id, position, raw_segment, elements, loop_path=None):
+        self.segment_id = segment_id
+        self.position = position
+        self.loop_path = loop_path
+        self.raw_segment = raw_segment
+        self.elements = elements
+
+    @classmethod
+    def from_parts(cls, segment_id, position, raw_segment, seg_elements, repetition_sep, component_sep):
+        elements = []
+
+        for element_pos, val in enumerate(seg_elements, start=1):
+            reps = val.split(repetition_sep) if repetition_sep and repetition_sep in val else (val,)
+
+            for rep_index, rep_val in enumerate(reps, start=1):
+                if component_sep and component_sep in rep_val:
+                    elements.append(Element(element_pos, rep_index, None, tuple(rep_val.split(component_sep))))
+                else:
+                    elements.append(Element(element_pos, rep_index, rep_val))
+
+        return cls(segment_id, position, raw_segment, tuple(elements))
+
+class LazySegment(_SegmentAccess):
+    """
+    Keeps only the raw segment text; elements (and their components) are split on first access
+    and cached. Routing/summary code that reads a handful of segments never pays for the rest.
+
+    values can carry element_values() output computed elsewhere (the parallel parser does the
+    split in worker processes); elements are then built from it instead of re-splitting.
+    """
+    __slots__ = ("segment_id", "position", "loop_path", "raw_segment", "_sep", "_elements", "_values")
+
+    def __init__(self, segment_id, position, raw_segment, sep, loop_path=None, values=None):
+        self.segment_id = segment_id
+        self.position = position
+        self.loop_path = loop_path
+        self.raw_segment = raw_segment
+        self._sep = sep
+        self._elements = None
+        self._values = values
+
+    @property
+    def elements(self):
+        if self._elements is None:
+            if self._values is not None:
+                self._elements = tuple(Element(*values) for values in self._values)
+            else:
+                sep = self._sep
+                self._elements = Segment.from_parts(
+                    self.segment_id, self.position, self.raw_segment,
+                    self.raw_segment.split(sep["element_sep"])[1:], sep["repetition_sep"], sep["component_sep"],
+                ).elements
+        return self._elements
+
+    def element_values(self, separators):
+        if self._values is not None:
+            return self._values
+        return super().element_values(separators)
+
+    @property
+    def is_materialized(self):
+        return self._elements is not None
+
+    def split_values(self):
+        """Split the raw text once and keep the element values (e.g. before sending to another process)."""
+        if self._values is None:
+            self._values = tuple(super().element_values(self._sep))
+        return self._values
+
+    def __reduce__(self):
+        # plain constructor args pickle several times faster than slot state; elements are rebuilt on access
+        return (LazySegment, (self.segment_id, self.position, self.raw_segment, self._sep, self.loop_path, self._values))
+
+# -------------------------
+# Zero-decode (bytes) variants
+# -------------------------
+# Used by parse_edi_file(..., zero_decode=True) on pure-ASCII input. The segment keeps its raw bytes
+# and is only split into elements on first access; element values stay bytes until read.
+
+class ByteSeparators:
+    """The interchange separators pre-encoded once, so per-segment work never encodes."""
+    __slots__ = ("element_sep", "repetition_sep", "component_sep")
+
+    def __init__(self, sep):
+        self.element_sep = sep["element_sep"].encode("ascii")
+        self.repetition_sep = sep["repetition_sep"].encode("ascii") if sep["repetition_sep"] else None
+        self.component_sep = sep["component_sep"].encode("ascii") if sep["component_sep"] else None
+
+class BytesElement(_ElementAccess):
+    __slots__ = ("element_pos", "repetition_index", "_raw_value", "_raw_components")
+
+    def __init__(self, element_pos, repetition_index, raw_value, raw_components=None):
+        self.element_pos = element_pos
+        self.repetition_index = repetition_index
+        self._raw_value = raw_value
+        self._raw_components = raw_components
+
+    @property
+    def value_text(self):
+        return self._raw_value.decode("ascii") if self._raw_value is not None else None
+
+    @property
+    def components(self):
+        if self._raw_components is None:
+            return None
+        return tuple(cval.decode("ascii") for cval in self._raw_components)
+
+class BytesSegment(_SegmentAccess):
+    __slots__ = ("segment_id", "position", "loop_path", "raw_bytes", "_seps", "_elements")
+
+    def __init__(self, segment_id, position, raw_bytes, seps, loop_path=None):
+        self.segment_id = segment_id
+        self.position = position
+        self.loop_path = loop_path
+        self.raw_bytes = raw_bytes
+        self._seps = seps
+        self._elements = None
+
+    @property
+    def raw_segment(self):
+        return self.raw_bytes.decode("ascii")
+
+    @property
+    def elements(self):
+        if self._elements is None:
+            self._elements = self._split()
+        return self._elements
+
+    @property
+    def is_materialized(self):
+        return self._elements is not None
+
+    def _split(self):
+        seps = self._seps
+        repetition_sep = seps.repetition_sep
+        component_sep = seps.component_sep
+
+        elements = []
+        for element_pos, val in enumerate(self.raw_bytes.split(seps.element_sep)[1:], start=1):
+            reps = val.split(repetition_sep) if repetition_sep and repetition_sep in val else (val,)
+
+            for rep_index, rep_val in enumerate(reps, start=1):
+                if component_sep and component_sep in rep_val:
+                    elements.append(BytesElement(element_pos, rep_index, None, tuple(rep_val.split(component_sep))))
+                else:
+                    elements.append(BytesElement(element_pos, rep_index, rep_val))
+
+        return tuple(elements)
+
+def to_dict_records(db_records):
+    """
+    Convert a compact parse result (parse_edi_file(..., compact=True)) to the dict shape in place.
+    Returns db_records for convenience.
+    """
+    for interchange in db_records.get('interchanges', []):
+        for group in interchange.get('groups', []):
+            for transaction in group.get('transactions', []):
+                transaction['segments'] = [
+                    segment if isinstance(segment, dict)
+                    else segment.to_dict(transaction.get('transaction_set_id'), interchange)
+                    for segment in transaction.get('segments', [])
+                ]
+
+    return db_records
@@ -0,0 +1,175 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from core.x12.loops import release_version
+from core.x12.model import LazySegment, iter_element_values
+from core.x12.parse import ParseTreeBuilder, new_edi_file_dict, parse_edi_file, parse_interchange
+
+# Transactions are shipped to workers in batches of roughly this many bytes, so pickling and
+# task overhead stay small next to the parse work itself
+DEFAULT_BATCH_BYTES = 4 * 1024 * 1024
+
+def get_parse_workers():
+    """Pool size: X12_PARSE_WORKERS if set, otherwise one per core."""
+    return int(os.getenv("X12_PARSE_WORKERS", "0")) or os.cpu_count() or 1
+
+def get_parallel_parse_bytes():
+    """Files at least this big are split across the pool: X12_PARALLEL_PARSE_BYTES if set, otherwise 16 MB (0 never)."""
+    return int(os.getenv("X12_PARALLEL_PARSE_BYTES", str(16 * 1024 * 1024)))
+
+# -------------------------
+# Envelope scan
+# -------------------------
+def _envelope_pattern(sep):
+    # an envelope tag right at the start of the buffer or after a terminator (+ optional line break);
+    # segment ids are alphanumeric, so whatever follows the tag is that interchange's element separator
+    term = re.escape(sep["segment_term"].encode("ascii"))
+    return re.compile(rb"(?:\A|" + term + rb")[ \t\r\n]*(ISA|GS|ST|SE|GE|IEA)(?=[^A-Za-z0-9\s])")
+
+def scan_envelopes(raw_bytes, sep, builder):
+    """
+    One pass over the buffer that only looks at ISA/GS/ST/SE/GE/IEA segments.
+
+    Envelope segments are fed to builder, so the interchange/group/transaction dicts are built
+    here. Returns [(start, end, transaction_dict, sep)] where raw_bytes[start:end] is the ST...SE
+    body of that transaction (ST included, SE excluded) and sep its interchange's separators.
+    """
+    term = sep["segment_term"].encode("ascii")
+    find = raw_bytes.find
+
+    ranges = []
+    tx_start = None
+
+    for match in _envelope_pattern(sep).finditer(raw_bytes):
+        seg_start = match.start(1)
+        seg_end = find(term, match.end())
+        if seg_end < 0:
+            seg_end = len(raw_bytes)
+
+        tag = match.group(1)
+        if tag == b"ST":
+            tx_start = seg_start
+        elif tag == b"SE" and tx_start is not None:
+            ranges.append((tx_start, seg_start, builder.current_transaction, builder.sep))
+            tx_start = None
+
+        builder.add_segment(raw_bytes[seg_start:seg_end].decode("utf-8", errors="replace").strip())
+
+    return ranges
+
+# -------------------------
+# Worker
+# -------------------------
+def _parse_transaction_batch(batch, offsets, sep):
+    """
+    Runs in a worker process. For each (start, end) slice of batch returns a list of
+    (segment_id, raw_segment, element_values) tuples.
+
+    Only plain tuples/strings cross the process boundary: pickling slot objects back costs more
+    than the parse itself.
+    """
+    element_sep = sep["element_sep"]
+    segment_term = sep["segment_term"]
+    repetition_sep = sep["repetition_sep"]
+    component_sep = sep["component_sep"]
+
+    results = []
+    for start, end in offsets:
+        text = batch[start:end].decode("utf-8", errors="replace")
+
+        segments = []
+        for seg in text.split(segment_term):
+            seg = seg.strip()
+            if not seg:
+                continue
+
+            parts = seg.split(element_sep)
+            segments.append((
+                parts[0].strip(),
+                seg,
+                tuple(iter_element_values(parts[1:], repetition_sep, component_sep)),
+            ))
+
+        results.append(segments)
+
+    return results
+
+def _batches(ranges, batch_bytes):
+    """Group consecutive transaction ranges of one interchange's separators into contiguous byte batches."""
+    current = []
+    for tx_range in ranges:
+        if current and tx_range[3] is not current[0][3]:
+            yield current
+            current = []
+        current.append(tx_range)
+        if tx_range[1] - current[0][0] >= batch_bytes:
+            yield current
+            current = []
+    if current:
+        yield current
+
+# -------------------------
+# Parallel parse
+# -------------------------
+def parse_edi_file_parallel(raw_bytes, source="manual upload", workers=None, executor=None,
+                            batch_bytes=DEFAULT_BATCH_BYTES, loop_resolver=None, file_hash=None):
+    """
+    Parse with transaction bodies split across processes; same tree as parse_edi_file(lazy=True).
+
+    A single envelope scan finds every ST...SE byte range; those ranges are batched and split
+    into elements by a ProcessPoolExecutor (workers processes, default get_parse_workers()).
+    Results are put back into the tree in file order as LazySegment objects carrying the
+    precomputed element values, so neither element access nor ingest re-splits them.
+    Pass executor to reuse a long-lived pool. Files smaller than one batch are parsed inline.
+    loop_resolver and file_hash work as in parse_edi_file; loop paths are assigned in the parent
+    after the merge.
+    """
+    if len(raw_bytes) < batch_bytes:
+        return parse_edi_file(raw_bytes, source, lazy=True, file_hash=file_hash, loop_resolver=loop_resolver)
+
+    if isinstance(raw_bytes, (bytearray, memoryview)):
+        raw_bytes = bytes(raw_bytes)
+
+    edi_file_dict = new_edi_file_dict(raw_bytes, source, file_hash)
+    sep = parse_interchange(raw_bytes)
+
+    builder = ParseTreeBuilder(sep, lazy=True)
+    ranges = scan_envelopes(raw_bytes, sep, builder)
+    batches = list(_batches(ranges, batch_bytes))
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers or get_parse_workers())
+
+    try:
+        futures = []
+        for batch in batches:
+            base = batch[0][0]
+            offsets = [(start - base, end - base) for start, end, _, _ in batch]
+            futures.append(executor.submit(_parse_transaction_batch, raw_bytes[base:batch[-1][1]], offsets, batch[0][3]))
+
+        # merge in file order
+        for batch, future in zip(batches, futures):
+            for (_, _, transaction_dict, tx_sep), segments in zip(batch, future.result()):
+                transaction_dict["segments"] = [
+                    LazySegment(segment_id, position, raw_segment, tx_sep, values=values)
+                    for position, (segment_id, raw_segment, values) in enumerate(segments, start=1)
+                ]
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    if loop_resolver is not None:
+        for interchange in builder.interchanges:
+            for group in interchange["groups"]:
+                version = release_version(group.get("x12_release"))
+                for transaction_dict in group["transactions"]:
+                    loops = loop_resolver(version, transaction_dict.get("transaction_set_id")) if version else None
+                    if loops is not None:
+                        loops.assign(transaction_dict["segments"])
+
+    return {
+        'edi_file_dict': edi_file_dict,
+        'interchanges': builder.interchanges,
+    }
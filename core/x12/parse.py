@@ -1,10 +1,19 @@
 import hashlib
+import io
+import os
 from datetime import datetime, timezone
 
+from core.x12.loops import START_STATE, release_version
+from core.x12.model import ByteSeparators, BytesSegment, LazySegment, Segment, build_element_dicts
+from core.x12.stream import DEFAULT_CHUNK_SIZE, ByteSegmentTokenizer, SegmentTokenizer, read_chunks
+
+# ISA is fixed width, terminator included
+ISA_LENGTH = 106
+
 # -------------------------
 # Separator detection
 # -------------------------
-def parse_interchange(x12_text: str):
+def parse_interchange(x12_text):
     """
     Detect element/component/repetition separators + segment terminator from the ISA header.
     Kind of have to do this first to be able to parse any other segmet. It's consistently 106 chars and that should never change
@@ -12,17 +21,24 @@ def parse_interchange(x12_text: str):
     - element_sep is the 4th character (after "ISA")
     - segment terminator is typically the char right before the next "GS{element_sep}" token
       (works well for real-world files, including your sample.edi)
+
+    Accepts str or bytes; only the first 106 characters are ever looked at.
     """
+    if isinstance(x12_text, (bytes, bytearray, memoryview)):
+        x12_text = bytes(x12_text[:ISA_LENGTH]).decode("utf-8", errors="replace")
+
     if not x12_text.startswith("ISA"):
         raise ValueError("File does not start with ISA segment")
 
-    if len(x12_text) < 106:
+    if len(x12_text) < ISA_LENGTH:
         raise ValueError("File does not contain a full ISA segment")
 
     # ISA*00*          *00*          *ZZ*SENDER         *ZZ*RECEIVER       *231117*0041*^*00403*000000001*0*T*>~
-    element_sep = x12_text[3]
-    segment_term = x12_text[105]
-    raw_isa = x12_text[0:106]
+    return isa_separators(x12_text[0:ISA_LENGTH], x12_text[ISA_LENGTH - 1])
+
+def isa_separators(raw_isa, segment_term):
+    """The separators dict (see parse_interchange) of one ISA segment, terminator included."""
+    element_sep = raw_isa[3]
     isa_parts = raw_isa.split(element_sep)
 
     # ISA has 16 elements (plus 'ISA' tag at index 0 => total len 17)
@@ -30,8 +46,8 @@ def parse_interchange(x12_text: str):
     repetition_sep = isa_parts[11] if len(isa_parts) > 11 else None  # ISA11 (5010 repetition separator)
     component_sep = isa_parts[16][0] if len(isa_parts) > 16 else None   # ISA16
 
-    # normalize blanks
-    repetition_sep = repetition_sep if repetition_sep else None
+    # normalize blanks; before 00402 ISA11 is the standards identifier ('U'), not a separator
+    repetition_sep = repetition_sep if repetition_sep and not repetition_sep.isalnum() else None
     component_sep = component_sep if component_sep else None
 
     return {
@@ -43,233 +59,514 @@ def parse_interchange(x12_text: str):
         "isa_parts": isa_parts,
     }
 
+def check_isa_header(header):
+    """
+    Stricter check of the first bytes of an upload than parse_interchange's best effort, so a
+    streamed upload can be refused after 106 bytes: the ISA tag, 16 elements, and separators
+    that can't be data. Accepts a prefix: with fewer than 106 bytes only what is there is
+    checked. Returns the separators dict once the whole header is in, else None. Raises ValueError.
+    """
+    if isinstance(header, (bytes, bytearray, memoryview)):
+        header = bytes(header[:ISA_LENGTH]).decode("utf-8", errors="replace")
+
+    if not "ISA".startswith(header[:3]):
+        raise ValueError("File does not start with ISA segment")
+
+    if len(header) < ISA_LENGTH:
+        return None
+
+    element_sep, segment_term = header[3], header[ISA_LENGTH - 1]
+    if element_sep.isalnum() or element_sep.isspace():
+        raise ValueError(f"Invalid ISA header: element separator {element_sep!r}")
+    if segment_term.isalnum() or segment_term == element_sep:
+        raise ValueError(f"Invalid ISA header: segment terminator {segment_term!r}")
+
+    elements = header[:ISA_LENGTH - 1].split(element_sep)[1:]
+    if len(elements) != 16 or len(elements[15]) != 1:
+        raise ValueError(f"Invalid ISA header: expected 16 fixed-width elements, got {len(elements)}")
+
+    return parse_interchange(header)
+
+def read_interchange_header(stream):
+    """
+    Read just the fixed-width ISA header off a binary stream and detect separators.
+
+    Returns (separators dict, header bytes). The header has been consumed from the stream,
+    so feed it to the tokenizer before the rest.
+    """
+    header = b""
+    while len(header) < ISA_LENGTH:
+        chunk = stream.read(ISA_LENGTH - len(header))
+        if not chunk:
+            break
+        header += chunk
+
+    return parse_interchange(header), header
+
 # -------------------------
-# Main parse + populate
+# Streaming segment split
 # -------------------------
-def parse_edi_file(raw_bytes, source="manual upload"):
+def iter_segments(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield segments from a file path or binary stream, reading chunk_size bytes at a time.
 
-    # decode best-effort; EDI is usually ASCII, but utf-8 decode works for most
-    x12_text = raw_bytes.decode("utf-8", errors="replace")
+    Only the current chunk plus one partial segment are held, so peak memory stays flat
+    no matter how big the interchange is.
+    """
+    if isinstance(stream, (str, os.PathLike)):
+        with open(stream, "rb") as f:
+            yield from iter_segments(f, chunk_size)
+        return
 
-    sha256 = hashlib.sha256(raw_bytes).hexdigest()
-    # filename = os.path.basename(file_path)
-    filename = ''
-    try:
-        filename = raw_bytes.filename
-    except AttributeError:
-        filename = 'raw text'
+    sep, header = read_interchange_header(stream)
+    tokenizer = SegmentTokenizer(sep["segment_term"])
 
-    processed_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    yield from tokenizer.feed(header)
 
-    sep = parse_interchange(x12_text)
-    element_sep = sep["element_sep"]
-    segment_term = sep["segment_term"]
-    repetition_sep = sep["repetition_sep"]
-    component_sep = sep["component_sep"]
-    isa_parts = sep["isa_parts"]
-    raw_isa = sep["raw_isa"]
+    for chunk in read_chunks(stream, chunk_size):
+        yield from tokenizer.feed(chunk)
 
-    # Parse ISA fields (index names based on standard positions)
-    # NOTE: after split: ['ISA', ISA01, ISA02, ..., ISA16]
-    isa_sender_qual = isa_parts[5] if len(isa_parts) > 5 else None
-    isa_sender_id = isa_parts[6] if len(isa_parts) > 6 else None
-    isa_receiver_qual = isa_parts[7] if len(isa_parts) > 7 else None
-    isa_receiver_id = isa_parts[8] if len(isa_parts) > 8 else None
-    isa_date = isa_parts[9] if len(isa_parts) > 9 else None
-    isa_time = isa_parts[10] if len(isa_parts) > 10 else None
-    isa_control = isa_parts[13] if len(isa_parts) > 13 else None
-    usage_indicator = isa_parts[15] if len(isa_parts) > 15 else None
-    version = isa_parts[12] if len(isa_parts) > 12 else None
-    
-    # Split into segments (trim whitespace/newlines around segments)
-    segments = [s.strip() for s in x12_text.split(segment_term)]
-    segments = [s for s in segments if s]  # drop empties
-
-    edi_file_dict = {
-        "partner_id": None,
-        "interchange_id": None,
-        "processed_at": processed_at,
-        "filename": filename,
-        "file_hash": sha256,
-        "raw_bytes": raw_bytes,
-        "parse_status": "new",
-        "parse_error": None,
-        "processing_state": "new",
-        "source": source,
-    }
+    yield from tokenizer.close()
 
-    db_records = {
-        'edi_file_dict': edi_file_dict,
-        'interchange_dict': {},
-        'group_dict': {},
-        'transaction_dict': {},
-        'segments': [],
-    }
+def iter_segments_bytes(raw_bytes, segment_term):
+    """
+    Zero-decode split of an in-memory buffer: yields each segment as stripped bytes, walking the
+    buffer with find() so no list of every segment is built. Each segment is its own bytes object,
+    i.e. a copy of that slice of the buffer (the same size as the str a decode would have made).
+    """
+    term = segment_term.encode("ascii")
+    term_len = len(term)
+    find = raw_bytes.find
+
+    start = 0
+    while True:
+        end = find(term, start)
+        if end < 0:
+            break
+
+        seg = raw_bytes[start:end].strip()
+        if seg:
+            yield seg
+        start = end + term_len
+
+    last = raw_bytes[start:].strip()
+    if last:
+        yield last
+
+# Envelope segments always go through the str path (there are only a handful per file)
+ENVELOPE_SEGMENT_IDS = frozenset(("ISA", "GS", "ST", "SE", "GE", "IEA"))
+
+# -------------------------
+# Envelope tree builder
+# -------------------------
+class ParseTreeBuilder:
+    """
+    Builds the interchange -> group -> transaction -> segment tree one segment at a time.
+
+    Any number of ISA/GS/ST envelopes can follow each other in one file; each one is appended
+    to its parent instead of overwriting the previous one. Segments are fed in order with
+    add_segment(), so the tree can be built straight off the streaming tokenizer.
+
+    With compact=True business segments are core.x12.model.Segment objects instead of dicts;
+    with lazy=True they are LazySegment objects that only split their elements when read.
+    add_segment_bytes() takes ASCII bytes and stores business segments as BytesSegment.
+
+    loop_resolver(version, transaction_set_id) -> core.x12.loops.LoopMachine (or None) turns on
+    loop_path assignment: the machine is fetched once per ST and stepped once per segment.
+    """
+
+    def __init__(self, sep, compact=False, lazy=False, loop_resolver=None):
+        self.sep = sep
+        self.compact = compact
+        self.lazy = lazy
+        self.loop_resolver = loop_resolver
+        self.interchanges = []
+
+        self._loops = None
+        self._loop_state = START_STATE
+
+        self._byte_seps = None
+
+        self._interchange = None
+        self._group = None
+        self._transaction = None
+        self._tx_pos = 0
 
-    current_group_id = None
-    current_tx_id = None
-    current_tx_pos = 0
-    for seg in segments:
-        parts = seg.split(element_sep)
+    @property
+    def current_transaction(self):
+        """The open (ST seen, SE not yet) transaction dict, or None."""
+        return self._transaction
+
+    def add_segment(self, seg):
+        isa = seg.lstrip()
+        if isa[:3] == "ISA" and isa[3:4] and not isa[3:4].isalnum():
+            # every interchange brings its own separators
+            self.sep = self._interchange_separators(isa)
+            self._byte_seps = None
+
+        sep = self.sep
+
+        if self.lazy and self._transaction is not None:
+            # only the tag is needed to route the segment; everything else waits for first access
+            tag_end = seg.find(sep["element_sep"])
+            seg_id = (seg if tag_end < 0 else seg[:tag_end]).strip()
+
+            if seg_id not in ENVELOPE_SEGMENT_IDS:
+                self._tx_pos += 1
+                self._transaction["segments"].append(LazySegment(seg_id, self._tx_pos, seg, sep, self._loop_path(seg_id)))
+                return
+
+        parts = seg.split(sep["element_sep"])
         seg_id = parts[0].strip() if parts else ""
         seg_elements = parts[1:] if len(parts) > 1 else []
 
         if seg_id == "ISA":
-            db_records['interchange_dict'] = {
-                "file_id": None,
-                "partner_id": None,
-                "interchange_id": None,
-                "isa_control_number": isa_control,
-                "isa_sender_qualifier": isa_sender_qual,
-                "isa_sender_id": isa_sender_id,
-                "isa_receiver_qualifier": isa_receiver_qual,
-                "isa_receiver_id": isa_receiver_id,
-                "isa_date": isa_date,
-                "isa_time": isa_time,
-                "usage_indicator": usage_indicator,
-                "version": version,
-                "element_sep": element_sep,
-                "component_sep": component_sep,
-                "segment_term": segment_term,
-                "repetition_sep": repetition_sep,
-                "raw_isa": raw_isa,
-            }
-            continue
+            self._interchange = _interchange_dict(parts, seg, sep)
+            self.interchanges.append(self._interchange)
+            self._group = None
+            self._transaction = None
+            return
 
         if seg_id == "GS":
-            # GS*PO*SENDERGS*RECEIVERGS*20231117*004114*000000001*X*004030
-            functional_id_code = seg_elements[0] if len(seg_elements) > 0 else None
-            gs_sender_id = seg_elements[1] if len(seg_elements) > 1 else None
-            gs_receiver_id = seg_elements[2] if len(seg_elements) > 2 else None
-            group_control_number = seg_elements[5] if len(seg_elements) > 5 else None
-            x12_release = seg_elements[7] if len(seg_elements) > 7 else None
-
-            current_group_id = functional_id_code
-
-            db_records['group_dict'] = {
-                "edi_interchange_id": None,
-                "functional_id_code": functional_id_code,
-                "gs_sender_id": gs_sender_id,
-                "gs_receiver_id": gs_receiver_id,
-                "group_control_number": group_control_number,
-                "x12_release": x12_release,
-                "raw_gs_segment": seg,
-            }
-            continue
+            if self._interchange is None:
+                raise ValueError("Encountered GS before ISA")
+
+            self._group = _group_dict(seg_elements, seg)
+            self._interchange["groups"].append(self._group)
+            return
 
         if seg_id == "ST":
             # ST*850*01403001*...
-            if current_group_id is None:
+            if self._group is None:
                 raise ValueError("Encountered ST before GS")
 
-            transaction_set_id = seg_elements[0] if len(seg_elements) > 0 else None
-            control_number = seg_elements[1] if len(seg_elements) > 1 else None
-            impl_version = seg_elements[2] if len(seg_elements) > 2 else None
-
-            current_tx_id = transaction_set_id
-            
-            db_records['transaction_dict'] = {
-                "group_id": None,
-                "transaction_set_id": transaction_set_id,
-                "control_number": control_number,
-                "implementation_version": impl_version,
-                "segment_count_reported": None,
-                "raw_st_segment": seg,
-                "raw_se_segment": None,
-                "ack_status": "none",
-            }
-            
-            current_tx_pos = 0
+            self._transaction = _transaction_dict(seg_elements, seg)
+            self._group["transactions"].append(self._transaction)
+            self._tx_pos = 0
+            self._start_loops()
 
         if seg_id == "SE":
             # SE*21*01403001
-            if current_tx_id is None:
+            if self._transaction is None:
                 raise ValueError("Encountered SE but no active transaction")
 
             seg_count = None
             if len(seg_elements) > 0 and seg_elements[0].isdigit():
                 seg_count = int(seg_elements[0])
 
-            # store SE segment into segment table
-            current_tx_pos += 1
-
             # update transaction with SE info
-            db_records['transaction_dict']['segment_count_reported'] = seg_count
-            db_records['transaction_dict']['raw_se_segment'] = seg
+            self._transaction["segment_count_reported"] = seg_count
+            self._transaction["raw_se_segment"] = seg
 
             # close tx
-            current_tx_id = None
-            current_tx_pos = 0
-            continue
+            self._transaction = None
+            self._tx_pos = 0
+            return
 
         if seg_id == "GE":
-            current_group_id = None
-            continue
+            self._group = None
+            return
 
         if seg_id == "IEA":
             # done with interchange
-            continue
+            self._interchange = None
+            return
 
-        
         # Normal business segments: only store if inside a transaction
-        if current_tx_id is not None:
-            current_tx_pos += 1
-
-            segment_dict = {
-                'transaction_id': current_tx_id,
-                'position': current_tx_pos,
-                'segment_id': seg_id,
-                'loop_path': None,
-                'raw_segment': seg,
-                'elements': []
-            }
-
-            for element_pos, val in enumerate(seg_elements, start=1):
-                # val can be "" (blank) and is still "present"
-                if val is None:
-                    val = ""
-                
-                reps = [val]
-                if repetition_sep and repetition_sep in val:
-                    reps = val.split(repetition_sep)
-
-                element_dict = {
-                    'element_pos': element_pos,
-                    'is_composite': None,
-                    'value_text': None,
-                    'present': 1,
-                    'repetition_index': None,
-                    'components': [],
-                }
-
-                for rep_index, rep_val in enumerate(reps, start=1):
-                    element_dict['repetition_index'] = rep_index
-
-                    if component_sep and component_sep in rep_val:
-                        element_dict['is_composite'] = 1
-                        
-                        components = rep_val.split(component_sep)
-                        for component_pos, cval in enumerate(components, start=1):
-                            component_dict = {
-                                'component_pos': component_pos,
-                                'value_text': cval
-                            }
-                            element_dict['components'].append(component_dict)
-                        
-                        segment_dict['elements'].append(element_dict)
-
-                    else:
-                        element_dict['is_composite'] = 0
-                        element_dict['value_text'] = rep_val
-                        segment_dict['elements'].append(element_dict)
-
-            db_records['transaction_dict']['segments'].append(segment_dict)
+        if self._transaction is not None:
+            self._tx_pos += 1
+            segment = self.make_segment(seg_id, self._tx_pos, seg, seg_elements, self._transaction["transaction_set_id"])
+
+            loop_path = self._loop_path(seg_id)
+            if loop_path is not None:
+                if isinstance(segment, dict):
+                    segment['loop_path'] = loop_path
+                else:
+                    segment.loop_path = loop_path
+
+            self._transaction["segments"].append(segment)
         else:
             # segments outside transaction (rare) => ignore for now
             pass
 
+    def _interchange_separators(self, seg):
+        """
+        Separators of an ISA met in the file. Element, component and repetition separators may
+        change from one interchange to the next; the segment terminator can't, since the file
+        was split into segments on the first one.
+        """
+        term = self.sep["segment_term"]
+        if seg.count(seg[3]) > 16:
+            raise ValueError(
+                f"Interchange {len(self.interchanges) + 1} does not end its segments with {term!r} like the "
+                "first one; files mixing segment terminators are not supported"
+            )
+        return isa_separators(seg + term, term)
+
+    def make_segment(self, seg_id, position, seg, seg_elements, transaction_set_id=None):
+        """One business segment in this builder's representation (dict, Segment or LazySegment)."""
+        sep = self.sep
+
+        if self.lazy:
+            return LazySegment(seg_id, position, seg, sep)
+
+        if self.compact:
+            return Segment.from_parts(seg_id, position, seg, seg_elements, sep["repetition_sep"], sep["component_sep"])
+
+        return {
+            'transaction_id': transaction_set_id,
+            'position': position,
+            'segment_id': seg_id,
+            'loop_path': None,
+            'raw_segment': seg,
+            'elements': build_element_dicts(seg_elements, sep["repetition_sep"], sep["component_sep"]),
+        }
+
+    def add_segment_bytes(self, seg):
+        """Same as add_segment, for an ASCII bytes segment; business segments are kept undecoded."""
+        if self._byte_seps is None:
+            self._byte_seps = ByteSeparators(self.sep)
+
+        tag_end = seg.find(self._byte_seps.element_sep)
+        seg_id = (seg if tag_end < 0 else seg[:tag_end]).strip().decode("ascii")
+
+        if self._transaction is None or seg_id in ENVELOPE_SEGMENT_IDS or seg.lstrip()[:3] == b"ISA":
+            self.add_segment(seg.decode("ascii"))
+            return
+
+        self._tx_pos += 1
+        self._transaction["segments"].append(BytesSegment(seg_id, self._tx_pos, seg, self._byte_seps, self._loop_path(seg_id)))
+
+    def _start_loops(self):
+        self._loops = None
+        self._loop_state = START_STATE
+
+        if self.loop_resolver is None:
+            return
+
+        version = release_version(self._group.get("x12_release"))
+        transaction_set_id = self._transaction.get("transaction_set_id")
+        if version and transaction_set_id:
+            self._loops = self.loop_resolver(version, transaction_set_id)
+
+    def _loop_path(self, seg_id):
+        loops = self._loops
+        if loops is None:
+            return None
+
+        self._loop_state = state = loops.transitions[self._loop_state].get(seg_id, self._loop_state)
+        return loops.paths[state]
+
+def _interchange_dict(isa_parts, raw_isa_segment, sep):
+    # Parse ISA fields (index names based on standard positions)
+    # NOTE: after split: ['ISA', ISA01, ISA02, ..., ISA16]
+    def _part(index):
+        return isa_parts[index] if len(isa_parts) > index else None
+
+    return {
+        "file_id": None,
+        "partner_id": None,
+        "interchange_id": None,
+        "isa_control_number": _part(13),
+        "isa_sender_qualifier": _part(5),
+        "isa_sender_id": _part(6),
+        "isa_receiver_qualifier": _part(7),
+        "isa_receiver_id": _part(8),
+        "isa_date": _part(9),
+        "isa_time": _part(10),
+        "usage_indicator": _part(15),
+        "version": _part(12),
+        "element_sep": sep["element_sep"],
+        "component_sep": sep["component_sep"],
+        "segment_term": sep["segment_term"],
+        "repetition_sep": sep["repetition_sep"],
+        "raw_isa": raw_isa_segment + sep["segment_term"],
+        "groups": [],
+    }
+
+def _group_dict(seg_elements, seg):
+    # GS*PO*SENDERGS*RECEIVERGS*20231117*004114*000000001*X*004030
+    def _element(index):
+        return seg_elements[index] if len(seg_elements) > index else None
+
+    return {
+        "edi_interchange_id": None,
+        "functional_id_code": _element(0),
+        "gs_sender_id": _element(1),
+        "gs_receiver_id": _element(2),
+        "group_control_number": _element(5),
+        "x12_release": _element(7),
+        "raw_gs_segment": seg,
+        "transactions": [],
+    }
+
+def _transaction_dict(seg_elements, seg):
+    def _element(index):
+        return seg_elements[index] if len(seg_elements) > index else None
+
+    return {
+        "group_id": None,
+        "transaction_set_id": _element(0),
+        "control_number": _element(1),
+        "implementation_version": _element(2),
+        "segment_count_reported": None,
+        "raw_st_segment": seg,
+        "raw_se_segment": None,
+        "ack_status": "none",
+        "segments": [],
+    }
+
+# -------------------------
+# Main parse + populate
+# -------------------------
+def new_edi_file_dict(raw_bytes, source, file_hash=None):
+    sha256 = file_hash or hashlib.sha256(raw_bytes).hexdigest()
+    # filename = os.path.basename(file_path)
+    filename = ''
+    try:
+        filename = raw_bytes.filename
+    except AttributeError:
+        filename = 'raw text'
+
+    processed_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+    return {
+        "partner_id": None,
+        "interchange_id": None,
+        "processed_at": processed_at,
+        "filename": filename,
+        "file_hash": sha256,
+        "raw_bytes": raw_bytes,
+        "parse_status": "new",
+        "parse_error": None,
+        "processing_state": "new",
+        "source": source,
+    }
+
+def parse_edi_file(raw_bytes, source="manual upload", compact=False, zero_decode=False, lazy=False, file_hash=None,
+                   loop_resolver=None):
+    """
+    Parse a whole file into db_records:
+
+        {
+            'edi_file_dict': {...},
+            'interchanges': [
+                {...ISA fields, 'groups': [
+                    {...GS fields, 'transactions': [
+                        {...ST/SE fields, 'segments': [...]}
+                    ]}
+                ]}
+            ],
+        }
+
+    compact=True stores segments as slot-based Segment objects (see core.x12.model), which take a
+    fraction of the memory; core.x12.model.to_dict_records converts back.
+
+    zero_decode=True tokenizes straight on the bytes buffer when it is pure ASCII: business segments
+    become BytesSegment objects that split on first access and decode values only when read.
+    Non-ASCII input falls back to the normal path. Implies compact. This skips decoding, not
+    copying: a memoryview is copied to bytes first (find/strip/isascii need it), and every
+    segment is sliced out into its own bytes object.
+
+    lazy=True keeps each business segment as its raw text (LazySegment) and splits elements and
+    components on first access, cached. Parsing costs little more than segment splitting, which
+    suits routing/summary callers that read a few segments. Implies compact.
+
+    file_hash skips re-hashing when the caller already has the SHA-256 (duplicate check).
+
+    loop_resolver fills in loop_path while parsing (see ParseTreeBuilder and
+    app.services.loop_paths.get_loop_machine); without it loop_path stays None.
+    """
+    edi_file_dict = new_edi_file_dict(raw_bytes, source, file_hash)
+
+    sep = parse_interchange(raw_bytes)
+
+    if zero_decode and isinstance(raw_bytes, memoryview):
+        raw_bytes = raw_bytes.tobytes()
+
+    if zero_decode and raw_bytes.isascii():
+        # BytesSegment is lazy already
+        builder = ParseTreeBuilder(sep, compact=True, loop_resolver=loop_resolver)
+        for seg in iter_segments_bytes(raw_bytes, sep["segment_term"]):
+            builder.add_segment_bytes(seg)
+    else:
+        # Split into segments lazily (trimmed, empties dropped) instead of building full lists up front.
+        # decode is best-effort utf-8 per chunk; EDI is usually ASCII
+        builder = ParseTreeBuilder(sep, compact=compact or zero_decode or lazy, lazy=lazy, loop_resolver=loop_resolver)
+        for seg in iter_segments(io.BytesIO(raw_bytes)):
+            builder.add_segment(seg)
+
+    db_records = {
+        'edi_file_dict': edi_file_dict,
+        'interchanges': builder.interchanges,
+    }
+
     return db_records
 
+class StreamingParser:
+    """
+    parse_edi_file for data that arrives in pieces: feed() chunks in order as they come in,
+    close() for the db_records. Each complete segment is parsed as soon as its terminator
+    arrives, into the zero-decode representation (BytesSegment; non-ASCII segments fall back to
+    Segment). The SHA-256 and size are kept as data goes by, and the ISA header is checked
+    (check_isa_header) as soon as its 106 bytes are in, so a bad upload fails early.
+
+    The returned edi_file_dict has no raw_bytes; set it before ingesting.
+    """
+
+    def __init__(self, source="manual upload", loop_resolver=None):
+        self.source = source
+        self.loop_resolver = loop_resolver
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.sep = None
+        self._header = b""
+        self._tokenizer = None
+        self._builder = None
+
+    def feed(self, chunk):
+        if not chunk:
+            return
+
+        self.sha256.update(chunk)
+        self.size += len(chunk)
+
+        if self.sep is None:
+            self._header += chunk
+            self.sep = check_isa_header(self._header)
+            if self.sep is None:
+                return
+
+            self._tokenizer = ByteSegmentTokenizer(self.sep["segment_term"])
+            self._builder = ParseTreeBuilder(self.sep, compact=True, loop_resolver=self.loop_resolver)
+            chunk, self._header = self._header, b""
+
+        self._add(self._tokenizer.feed(chunk))
+
+    def _add(self, segments):
+        builder = self._builder
+        for seg in segments:
+            if seg.isascii():
+                builder.add_segment_bytes(seg)
+            else:
+                builder.add_segment(seg.decode("utf-8", errors="replace"))
+
+    def close(self, file_hash=None):
+        """Finish the parse; raises ValueError if not even a full ISA header came in."""
+        if self.sep is None:
+            parse_interchange(self._header)
+            raise ValueError("File does not contain a full ISA segment")
+
+        self._add(self._tokenizer.close())
+
+        edi_file_dict = new_edi_file_dict(b"", self.source, file_hash or self.sha256.hexdigest())
+        edi_file_dict["raw_bytes"] = None
+
+        return {
+            'edi_file_dict': edi_file_dict,
+            'interchanges': self._builder.interchanges,
+        }
+
 def main():
     # default to your sample file
     file_id = parse_edi_file("sample.edi")
@@ -277,4 +574,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
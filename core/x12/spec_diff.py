@@ -0,0 +1,174 @@
+from core.x12.loops import build_spec_tree
+
+# -------------------------
+# Cross-version spec diff
+# -------------------------
+# A transaction set spec is reduced to a "view" of comparable records, then two views are
+# compared key by key:
+#   loops     (area, loop path, n)              requirement, repeat, sequence
+#   segments  (area, loop path, segment_id, n)  requirement, max use, sequence
+#   elements  (segment_id, position)            element id/name, requirement, type, lengths, repetition
+#   codes     (element_id, code)                description
+# n numbers repeats of the same key (e.g. two REF in the header), so an inserted segment only
+# shows up as added instead of shifting everything after it. Element definitions and code
+# lists are shared by every use of a segment/element, so they are reported once, and only for
+# segments/elements used by the set in both versions. Code lists are not copied into the view;
+# it references the caller's per-version lists, and their diffs can be memoized per version
+# pair (code_diffs), which is what keeps a batch over every set cheap.
+
+LOOP_FIELDS = (
+    ("requirement", "segment_requirement"),
+    ("repeat", "segment_loop_repeat"),
+    ("sequence", "segment_sequence"),
+)
+
+SEGMENT_FIELDS = (
+    ("requirement", "segment_requirement"),
+    ("max_use", "segment_maximum_use"),
+    ("sequence", "segment_sequence"),
+)
+
+ELEMENT_FIELDS = (
+    ("element_id", "element_id"),
+    ("name", "element_name"),
+    ("requirement", "segment_element_requirement"),
+    ("type", "element_type"),
+    ("min_length", "element_min_length"),
+    ("max_length", "element_max_length"),
+    ("repetition", "segment_element_repetition_count"),
+)
+
+def _project(row, fields):
+    return {name: row[column] for name, column in fields}
+
+def _same(a, b):
+    # the spec DBs mix 12 / '12' between versions
+    return a == b or (a is not None and b is not None and str(a).strip() == str(b).strip())
+
+def build_spec_view(segment_rows, element_rows, code_lists):
+    """
+    Comparable view of one transaction set from get_transaction_set_spec_rows output and
+    code_lists (anything with .get(element_id) -> {code: description} or None):
+    {'loops': {key: attrs}, 'segments': {key: attrs}, 'elements': {segment_id: {position: attrs}},
+    'codes': {element_id: {code: description}}}.
+    """
+    root, entries = build_spec_tree(segment_rows)
+
+    loops = {}
+    segments = {}
+    seen = {}
+
+    def _numbered(key):
+        n = seen.get(key, 0)
+        seen[key] = n + 1
+        return key + (n,)
+
+    def _walk(loop):
+        for child in loop.children:
+            if isinstance(child, int):
+                segment_id, _, _, row = entries[child]
+                segments[_numbered((row["segment_area"], loop.path, segment_id))] = _project(row, SEGMENT_FIELDS)
+            else:
+                loops[_numbered((child.row["segment_area"], child.path))] = _project(child.row, LOOP_FIELDS)
+                _walk(child)
+
+    _walk(root)
+
+    elements = {}
+    codes = {}
+    for row in element_rows:
+        elements.setdefault(row["segment_id"], {})[int(row["segment_element_sequence"])] = _project(row, ELEMENT_FIELDS)
+
+        element_id = row["element_id"]
+        if element_id is not None and element_id not in codes:
+            codes[element_id] = code_lists.get(element_id) or {}
+
+    return {"loops": loops, "segments": segments, "elements": elements, "codes": codes}
+
+def _diff_records(old, new, ref):
+    """added/removed/changed lists for two {key: attrs} dicts; ref(key) gives the identifying fields."""
+    added = [dict(ref(key), **attrs) for key, attrs in new.items() if key not in old]
+    removed = [dict(ref(key), **attrs) for key, attrs in old.items() if key not in new]
+
+    changed = []
+    for key, old_attrs in old.items():
+        new_attrs = new.get(key)
+        if new_attrs is None:
+            continue
+
+        changes = {
+            field: {"from": value, "to": new_attrs[field]}
+            for field, value in old_attrs.items()
+            if not _same(value, new_attrs[field])
+        }
+        if changes:
+            changed.append(dict(ref(key), changes=changes))
+
+    return {"added": added, "removed": removed, "changed": changed}
+
+def _loop_ref(key):
+    return {"area": key[0], "loop_path": key[1], "occurrence": key[2] + 1}
+
+def _segment_ref(key):
+    return {"area": key[0], "loop_path": key[1], "segment_id": key[2], "occurrence": key[3] + 1}
+
+def diff_code_lists(element_id, old_codes, new_codes):
+    """added/removed/changed codes of one element between two {code: description} lists."""
+    diff = {"added": [], "removed": [], "changed": []}
+    if old_codes == new_codes:
+        return diff
+
+    for code, description in new_codes.items():
+        if code not in old_codes:
+            diff["added"].append({"element_id": element_id, "code": code, "description": description})
+
+    for code, description in old_codes.items():
+        if code not in new_codes:
+            diff["removed"].append({"element_id": element_id, "code": code, "description": description})
+        elif not _same(description, new_codes[code]):
+            diff["changed"].append({"element_id": element_id, "code": code, "changes": {"description": {"from": description, "to": new_codes[code]}}})
+
+    return diff
+
+def diff_spec_views(old, new, code_diffs=None):
+    """
+    Differences between two views of the same transaction set (old -> new). Each section has
+    added/removed/changed lists; 'changed' items carry {field: {'from', 'to'}}. code_diffs is
+    an optional {element_id: diff_code_lists result} memo, only valid for one version pair.
+    """
+    loops = _diff_records(old["loops"], new["loops"], _loop_ref)
+    segments = _diff_records(old["segments"], new["segments"], _segment_ref)
+
+    elements = {"added": [], "removed": [], "changed": []}
+    for segment_id, old_elements in old["elements"].items():
+        new_elements = new["elements"].get(segment_id)
+        if new_elements is None:
+            continue
+
+        diff = _diff_records(old_elements, new_elements, lambda position, segment_id=segment_id: {"segment_id": segment_id, "position": position})
+        for section, items in diff.items():
+            elements[section].extend(items)
+
+    old_element_ids = {attrs["element_id"] for by_position in old["elements"].values() for attrs in by_position.values()}
+    new_element_ids = {attrs["element_id"] for by_position in new["elements"].values() for attrs in by_position.values()}
+
+    codes = {"added": [], "removed": [], "changed": []}
+    for element_id in sorted(element_id for element_id in old_element_ids & new_element_ids if element_id is not None):
+        if code_diffs is not None and element_id in code_diffs:
+            diff = code_diffs[element_id]
+        else:
+            diff = diff_code_lists(element_id, old["codes"].get(element_id, {}), new["codes"].get(element_id, {}))
+            if code_diffs is not None:
+                code_diffs[element_id] = diff
+
+        for section, items in diff.items():
+            codes[section].extend(items)
+
+    diff = {"loops": loops, "segments": segments, "elements": elements, "codes": codes}
+    diff["summary"] = {
+        f"{section}_{change}": len(items)
+        for section, changes in diff.items()
+        for change, items in changes.items()
+    }
+
+    return diff
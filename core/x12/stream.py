@@ -0,0 +1,122 @@
+import codecs
+import os
+
+# Big enough that split() does real work per call, small enough that memory stays flat
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+def get_max_segment_length():
+    """Longest segment the tokenizers accept: X12_MAX_SEGMENT_LENGTH if set, otherwise 16 MB."""
+    return int(os.getenv("X12_MAX_SEGMENT_LENGTH", str(16 * 1024 * 1024)))
+
+# -------------------------
+# Chunked segment tokenizer
+# -------------------------
+class _SegmentSplitter:
+    """
+    Carry-over shared by the tokenizers. The unfinished segment is kept as a list of pieces and
+    only the new chunk is searched for a terminator, so a segment spanning many chunks (a big
+    BIN/BDS payload) is joined once, when it ends, rather than copied again on every chunk.
+    """
+
+    def __init__(self, segment_term, max_segment_length=None):
+        self.segment_term = segment_term
+        self.max_segment_length = max_segment_length or get_max_segment_length()
+        self._pending = []
+        self._pending_length = 0
+
+    def _split(self, data):
+        term = self.segment_term
+        # a terminator straddling earlier chunks starts at most len(term) - 1 back
+        overlap = len(term) - 1
+        probe = data
+        for piece in reversed(self._pending):
+            if len(probe) - len(data) >= overlap:
+                break
+            probe = piece + probe
+
+        if term not in probe:
+            self._pending.append(data)
+            self._pending_length += len(data)
+            self._check_length()
+            return []
+
+        if self._pending:
+            self._pending.append(data)
+            data = term[:0].join(self._pending)
+
+        parts = data.split(term)
+        tail = parts.pop()
+        self._pending = [tail] if tail else []
+        self._pending_length = len(tail)
+        self._check_length()
+
+        return [seg for seg in (part.strip() for part in parts) if seg]
+
+    def _check_length(self):
+        if self._pending_length > self.max_segment_length:
+            term = self.segment_term
+            if isinstance(term, bytes):
+                term = term.decode("utf-8")
+            raise ValueError(
+                f"No segment terminator {term!r} within {self.max_segment_length} characters; "
+                f"the file is missing terminators or has a segment longer than X12_MAX_SEGMENT_LENGTH"
+            )
+
+    def _rest(self):
+        rest = self.segment_term[:0].join(self._pending)
+        self._pending = []
+        self._pending_length = 0
+        return rest
+
+class SegmentTokenizer(_SegmentSplitter):
+    """
+    Push-style tokenizer: feed() it raw byte chunks in order, get back the segments that completed.
+
+    Whatever follows the last terminator in a chunk is carried over, so a terminator (or a multi-byte
+    character) straddling two chunks is handled. Segments are stripped and empties dropped, the same
+    as the old split-everything path. ValueError once a segment outgrows max_segment_length.
+    """
+
+    def __init__(self, segment_term, encoding="utf-8", errors="replace", max_segment_length=None):
+        super().__init__(segment_term, max_segment_length)
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors=errors)
+
+    def feed(self, chunk):
+        text = self._decoder.decode(chunk)
+        if not text:
+            return []
+
+        return self._split(text)
+
+    def close(self):
+        """Flush the trailing segment (a file doesn't have to end with a terminator)."""
+        last = (self._rest() + self._decoder.decode(b"", final=True)).strip()
+
+        return [last] if last else []
+
+class ByteSegmentTokenizer(_SegmentSplitter):
+    """
+    SegmentTokenizer for the zero-decode path: same push API, but segments come back as stripped
+    bytes (no decoding), so ASCII segments can go straight to ParseTreeBuilder.add_segment_bytes.
+    """
+
+    def __init__(self, segment_term, max_segment_length=None):
+        super().__init__(segment_term.encode("utf-8"), max_segment_length)
+
+    def feed(self, chunk):
+        if not chunk:
+            return []
+
+        return self._split(bytes(chunk))
+
+    def close(self):
+        last = self._rest().strip()
+
+        return [last] if last else []
+
+def read_chunks(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
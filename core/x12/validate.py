@@ -0,0 +1,463 @@
+import re
+
+from core.x12.loops import START_STATE, build_spec_tree, compile_loop_machine, first_entry
+
+# -------------------------
+# Spec-driven validation
+# -------------------------
+# compile_validation_plan() turns one transaction set's spec rows into flat tuples indexed by the
+# loop machine's states (see core.x12.loops), so validate_segments() is a single pass with one
+# dict lookup per segment and tuple indexing per element; no spec queries while validating.
+
+# X12 numeric length counts digits only (no sign, no decimal point)
+_NUMERIC_RE = re.compile(r"-?\d+\Z")
+_DECIMAL_RE = re.compile(r"-?(?:\d+\.?\d*|\.\d+)(?:E-?\d+)?\Z")
+_DATE_RE = re.compile(r"(?:\d\d)?\d\d(0[1-9]|1[0-2])(0[1-9]|[12]\d|3[01])\Z")
+_TIME_RE = re.compile(r"([01]\d|2[0-3])[0-5]\d(?:[0-5]\d\d{0,2})?\Z")
+
+class ElementRule:
+    __slots__ = ("element_pos", "element_id", "mandatory", "element_type", "min_length", "max_length", "codes")
+
+    def __init__(self, element_pos, element_id, mandatory, element_type, min_length, max_length, codes=None):
+        self.element_pos = element_pos
+        self.element_id = element_id
+        self.mandatory = mandatory
+        self.element_type = element_type
+        self.min_length = min_length
+        self.max_length = max_length
+        self.codes = codes  # frozenset of allowed values, or None when not code-checked
+
+class SegmentRule:
+    __slots__ = ("segment_id", "max_use", "elements", "mandatory_positions", "conditions")
+
+    def __init__(self, segment_id, max_use, elements, conditions=()):
+        self.segment_id = segment_id
+        self.max_use = max_use
+        self.elements = elements  # tuple of ElementRule (None for a gap in the spec), element_pos - 1 indexed
+        self.mandatory_positions = tuple(rule.element_pos for rule in elements if rule is not None and rule.mandatory)
+        self.conditions = conditions  # tuple of RelationalCondition
+
+# -------------------------
+# Relational conditions
+# -------------------------
+# X12 syntax notes (P/R/E/C/L) name a few element positions of a segment. Each one is compiled to
+# bitmasks over element positions (bit n - 1 = element n), so checking a segment is a handful of
+# integer ANDs against the mask of its non-empty elements.
+
+class RelationalCondition:
+    __slots__ = ("condition_type", "mask", "first_mask", "rest_mask", "positions")
+
+    def __init__(self, condition_type, positions):
+        self.condition_type = condition_type
+        self.positions = positions
+        self.mask = 0
+        for element_pos in positions:
+            self.mask |= 1 << (element_pos - 1)
+        self.first_mask = 1 << (positions[0] - 1)
+        self.rest_mask = self.mask & ~self.first_mask
+
+    def is_satisfied(self, present):
+        """present is the bitmask of non-empty element positions."""
+        hits = present & self.mask
+        condition_type = self.condition_type
+
+        if condition_type == "P":    # paired: all or none
+            return hits == 0 or hits == self.mask
+        if condition_type == "R":    # required: at least one
+            return hits != 0
+        if condition_type == "E":    # exclusion: not more than one
+            return hits & (hits - 1) == 0
+        if condition_type == "C":    # conditional: if the first, then all the others
+            return not hits & self.first_mask or hits & self.rest_mask == self.rest_mask
+        if condition_type == "L":    # list conditional: if the first, then at least one other
+            return not hits & self.first_mask or hits & self.rest_mask != 0
+        return True
+
+    def describe(self, segment_id):
+        names = [f"{segment_id}{element_pos:02d}" for element_pos in self.positions]
+        first, rest = names[0], ", ".join(names[1:])
+        condition_type = self.condition_type
+
+        if condition_type == "P":
+            return f"If any of {', '.join(names)} is present, all are required"
+        if condition_type == "R":
+            return f"At least one of {', '.join(names)} is required"
+        if condition_type == "E":
+            return f"Only one of {', '.join(names)} may be present"
+        if condition_type == "C":
+            return f"If {first} is present, {rest} {'is' if len(names) == 2 else 'are'} required"
+        return f"If {first} is present, at least one of {rest} is required"
+
+def compile_relational_conditions(condition_rows):
+    """
+    transaction_set_segment_relational_conditions rows -> {transaction_set_segment_id: tuple of
+    RelationalCondition}. rc_elements is the raw '05,04' string (first position first).
+    """
+    conditions = {}
+    for row in condition_rows:
+        positions = tuple(int(element_pos) for element_pos in row["transaction_set_segment_rc_elements"].split(",") if element_pos.strip())
+        if not positions:
+            continue
+        conditions.setdefault(row["transaction_set_segment_id"], []).append(
+            RelationalCondition(row["transaction_set_segment_rc_type"].strip(), positions)
+        )
+
+    return {segment_row_id: tuple(items) for segment_row_id, items in conditions.items()}
+
+class ValidationPlan:
+    """
+    Compiled rules for one (version, transaction set). Index 0 of the per-state tuples is the
+    start state; state n + 1 is the n-th segment row of the spec.
+
+    loop_chains[state] - loop numbers from the root (0) down to the segment's loop
+    triggers[state]    - loop number the segment starts (its first segment), else None
+    mandatory[loop]    - (state, label) of every mandatory segment / first segment of a mandatory
+                         child loop that must appear in each iteration of that loop
+    codes              - element_id -> frozenset of code values, for coded (ID) elements
+    """
+    __slots__ = ("machine", "segments", "loop_chains", "triggers", "loop_triggers", "mandatory", "segment_ids", "codes")
+
+    def __init__(self, machine, segments, loop_chains, triggers, loop_triggers, mandatory, segment_ids, codes):
+        self.machine = machine
+        self.segments = segments
+        self.loop_chains = loop_chains
+        self.triggers = triggers
+        self.loop_triggers = loop_triggers
+        self.mandatory = mandatory
+        self.segment_ids = segment_ids
+        self.codes = codes
+
+def _max_use(value):
+    # '>1' means unbounded
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def compile_validation_plan(segment_rows, element_rows, code_rows, condition_rows=()):
+    """
+    Build a ValidationPlan from app.db.transaction_sets.get_transaction_set_rule_rows output.
+    """
+    machine = compile_loop_machine(segment_rows)
+    root, entries = build_spec_tree(segment_rows)
+    conditions = compile_relational_conditions(condition_rows)
+
+    codes = {}
+    for row in code_rows:
+        codes.setdefault(row["element_id"], set()).add(row["element_code_value"])
+    codes = {element_id: frozenset(values) for element_id, values in codes.items()}
+
+    element_rules = {}
+    for row in element_rows:
+        element_id = row["element_id"]
+        rules = element_rules.setdefault(row["segment_id"], [])
+        rules.append(ElementRule(
+            int(row["segment_element_sequence"]),
+            element_id,
+            row["segment_element_requirement"] == "M",
+            row["element_type"],
+            row["element_min_length"],
+            row["element_max_length"],
+            codes.get(element_id) if row["element_type"] == "ID" else None,
+        ))
+
+    def _by_position(rules):
+        by_position = [None] * max(rule.element_pos for rule in rules)
+        for rule in rules:
+            by_position[rule.element_pos - 1] = rule
+        return tuple(by_position)
+
+    segment_rules = {
+        segment_id: SegmentRule(segment_id, None, _by_position(rules))
+        for segment_id, rules in element_rules.items()
+    }
+
+    # number the loops; the root is 0
+    loops = [root]
+    loop_numbers = {id(root): 0}
+
+    def _number(loop):
+        for child in loop.children:
+            if not isinstance(child, int):
+                loop_numbers[id(child)] = len(loops)
+                loops.append(child)
+                _number(child)
+    _number(root)
+
+    def _chain(loop):
+        chain = []
+        while loop is not None:
+            chain.append(loop_numbers[id(loop)])
+            loop = loop.parent
+        return tuple(reversed(chain))
+
+    loop_triggers = tuple(
+        (first_entry(loop) + 1) if loop is not root and first_entry(loop) is not None else None
+        for loop in loops
+    )
+
+    segments = [None]
+    loop_chains = [(0,)]
+    triggers = [None]
+    for index, (segment_id, loop, _, row) in enumerate(entries):
+        shared = segment_rules.get(segment_id) or SegmentRule(segment_id, None, ())
+        segments.append(SegmentRule(
+            segment_id,
+            _max_use(row["segment_maximum_use"]),
+            shared.elements,
+            conditions.get(row["transaction_set_segment_id"], ()),
+        ))
+        loop_chains.append(_chain(loop))
+
+        loop_number = loop_numbers[id(loop)]
+        triggers.append(loop_number if loop is not root and loop_triggers[loop_number] == index + 1 else None)
+
+    mandatory = []
+    for loop in loops:
+        required = []
+        for child in loop.children:
+            if isinstance(child, int):
+                segment_id, _, _, row = entries[child]
+                # SE is checked by the envelope parser and never stored as a segment
+                if row["segment_requirement"] == "M" and segment_id != "SE":
+                    required.append((child + 1, segment_id))
+            elif child.row is not None and child.row["segment_requirement"] == "M":
+                trigger = loop_triggers[loop_numbers[id(child)]]
+                if trigger is not None:
+                    required.append((trigger, f"{child.loop_id} loop"))
+        mandatory.append(tuple(required))
+
+    return ValidationPlan(
+        machine,
+        tuple(segments),
+        tuple(loop_chains),
+        tuple(triggers),
+        loop_triggers,
+        tuple(mandatory),
+        frozenset(entry[0] for entry in entries),
+        codes,
+    )
+
+# -------------------------
+# Element checks
+# -------------------------
+def _error(code, message, position=None, segment_id=None, element_pos=None):
+    return {
+        'code': code,
+        'message': message,
+        'position': position,
+        'segment_id': segment_id,
+        'element_pos': element_pos,
+    }
+
+def check_element_value(rule, value):
+    """(code, message) problems for one non-empty simple element value against its rule."""
+    problems = []
+    element_type = rule.element_type or ""
+
+    if element_type.startswith("N"):
+        if not _NUMERIC_RE.match(value):
+            problems.append(("data_type", f"'{value}' is not a valid {element_type} number"))
+        length = len(value) - value.startswith("-")
+    elif element_type == "R":
+        if not _DECIMAL_RE.match(value):
+            problems.append(("data_type", f"'{value}' is not a valid decimal number"))
+        length = sum(ch.isdigit() for ch in value)
+    elif element_type == "DT":
+        if not _DATE_RE.match(value):
+            problems.append(("data_type", f"'{value}' is not a valid date"))
+        length = len(value)
+    elif element_type == "TM":
+        if not _TIME_RE.match(value):
+            problems.append(("data_type", f"'{value}' is not a valid time"))
+        length = len(value)
+    else:
+        length = len(value)
+
+    if rule.min_length and length < rule.min_length:
+        problems.append(("min_length", f"'{value}' is shorter than the minimum length {rule.min_length}"))
+    if rule.max_length and length > rule.max_length:
+        problems.append(("max_length", f"'{value}' is longer than the maximum length {rule.max_length}"))
+
+    if rule.codes and value not in rule.codes:
+        problems.append(("code_value", f"'{value}' is not a valid code for element {rule.element_id}"))
+
+    return problems
+
+def _segment_values(segment, separators):
+    if isinstance(segment, dict):
+        return (
+            (
+                element.get('element_pos'),
+                element.get('repetition_index'),
+                element.get('value_text'),
+                tuple(component.get('value_text') for component in element.get('components') or ()) or None,
+            )
+            for element in segment.get('elements', [])
+        )
+    return segment.element_values(separators)
+
+def _check_elements(rule, segment_id, position, values, errors):
+    rules = rule.elements
+    element_count = len(rules)
+    present = 0
+
+    for element_pos, _, value, components in values:
+        if element_pos > element_count:
+            if value or (components and any(components)):
+                errors.append(_error("too_many_elements", f"{segment_id} has no element {element_pos:02d}",
+                                     position, segment_id, element_pos))
+            continue
+
+        if components is not None:
+            # composites are not broken down in the spec DBs; only presence is checked
+            if any(components):
+                present |= 1 << (element_pos - 1)
+            continue
+
+        if not value:
+            continue
+        present |= 1 << (element_pos - 1)
+
+        element_rule = rules[element_pos - 1]
+        if element_rule is None:
+            continue
+
+        for code, message in check_element_value(element_rule, value):
+            errors.append(_error(code, f"{segment_id}{element_pos:02d}: {message}", position, segment_id, element_pos))
+
+    for element_pos in rule.mandatory_positions:
+        if not present & (1 << (element_pos - 1)):
+            errors.append(_error("missing_element", f"Mandatory element {segment_id}{element_pos:02d} is missing",
+                                 position, segment_id, element_pos))
+
+    _check_conditions(rule.conditions, segment_id, position, present, errors)
+
+def _check_conditions(conditions, segment_id, position, present, errors):
+    for condition in conditions:
+        if not condition.is_satisfied(present):
+            errors.append(_error("relational_condition", condition.describe(segment_id),
+                                 position, segment_id, condition.positions[0]))
+
+def presence_mask(values):
+    """Bitmask of the non-empty element positions in element_values() tuples."""
+    present = 0
+    for element_pos, _, value, components in values:
+        if value or (components is not None and any(components)):
+            present |= 1 << (element_pos - 1)
+    return present
+
+# -------------------------
+# Transaction walk
+# -------------------------
+def validate_segments(plan, segments, separators=None):
+    """
+    Validate one transaction's segments (dicts or segment objects, ST first, SE excluded) against
+    a ValidationPlan. separators (the interchange dict) is needed for segment objects.
+
+    Returns a list of error dicts: code, message, position, segment_id, element_pos.
+    """
+    transitions = plan.machine.transitions
+    rules = plan.segments
+    loop_chains = plan.loop_chains
+    triggers = plan.triggers
+    loop_triggers = plan.loop_triggers
+    mandatory = plan.mandatory
+
+    errors = []
+    state = START_STATE
+    use_count = 0
+
+    # one (loop number, seen states) per open loop iteration, the root first
+    open_loops = [(0, set())]
+
+    def _close(loop_number, seen, position):
+        for required_state, label in mandatory[loop_number]:
+            if required_state not in seen:
+                errors.append(_error("missing_segment", f"Mandatory segment {label} is missing", position))
+
+    for segment in segments:
+        if isinstance(segment, dict):
+            segment_id = segment.get('segment_id')
+            position = segment.get('position')
+        else:
+            segment_id = segment.segment_id
+            position = segment.position
+
+        next_state = transitions[state].get(segment_id)
+        if next_state is None:
+            if segment_id in plan.segment_ids:
+                errors.append(_error("segment_order", f"{segment_id} is not allowed here", position, segment_id))
+            else:
+                errors.append(_error("unknown_segment", f"{segment_id} is not defined in this transaction set",
+                                     position, segment_id))
+            continue
+
+        old_chain = loop_chains[state]
+        new_chain = loop_chains[next_state]
+        trigger = triggers[next_state]
+
+        if old_chain != new_chain or trigger is not None:
+            common = 0
+            for old_loop, new_loop in zip(old_chain, new_chain):
+                if old_loop != new_loop:
+                    break
+                common += 1
+            # the first segment of a loop we are already in starts a new iteration
+            if trigger is not None and common == len(new_chain):
+                common -= 1
+
+            while len(open_loops) > common:
+                _close(*open_loops.pop(), position)
+
+            for loop_number in new_chain[common:]:
+                open_loops[-1][1].add(loop_triggers[loop_number])
+                open_loops.append((loop_number, set()))
+
+        use_count = use_count + 1 if next_state == state and trigger is None else 1
+        state = next_state
+        open_loops[-1][1].add(state)
+
+        rule = rules[state]
+        if rule.max_use and use_count > rule.max_use:
+            errors.append(_error("max_use", f"{segment_id} exceeds its maximum use of {rule.max_use}",
+                                 position, segment_id))
+
+        _check_elements(rule, segment_id, position, _segment_values(segment, separators), errors)
+
+    while open_loops:
+        _close(*open_loops.pop(), None)
+
+    return errors
+
+def check_relational_conditions(plan, segments, separators=None):
+    """
+    Only the relational conditions of a ValidationPlan, for every segment of a transaction.
+    Segments are placed with the loop machine so each is checked against the conditions of its
+    own spec row. Returns error dicts like validate_segments.
+    """
+    transitions = plan.machine.transitions
+    rules = plan.segments
+
+    errors = []
+    state = START_STATE
+
+    for segment in segments:
+        if isinstance(segment, dict):
+            segment_id = segment.get('segment_id')
+            position = segment.get('position')
+        else:
+            segment_id = segment.segment_id
+            position = segment.position
+
+        state = transitions[state].get(segment_id, state)
+        if state == START_STATE:
+            continue
+
+        conditions = rules[state].conditions
+        if conditions and rules[state].segment_id == segment_id:
+            _check_conditions(conditions, segment_id, position, presence_mask(_segment_values(segment, separators)), errors)
+
+    return errors
@@ -0,0 +1,46 @@
+"""
+Compare peak memory of the dict parse result against the compact (slot-based) one.
+
+Usage:
+    python scripts/bench_parse_memory.py              # 2000 invoices x 20 line items
+    python scripts/bench_parse_memory.py 5000 40
+"""
+
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.x12.parse import parse_edi_file
+from synthetic_x12 import make_synthetic_810
+
+def measure(raw_bytes, **kwargs):
+    tracemalloc.start()
+    started = time.perf_counter()
+
+    parsed = parse_edi_file(raw_bytes, **kwargs)
+
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # keep parsed alive until after the snapshot
+    del parsed
+    return current, peak, elapsed
+
+def main():
+    transactions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    line_items = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    raw_bytes = make_synthetic_810(transactions, line_items)
+    print(f"Synthetic 810: {transactions} transactions x {line_items} line items, {len(raw_bytes) / 1e6:.1f} MB")
+    print()
+
+    for label, kwargs in (("dict", {}), ("compact", {"compact": True})):
+        current, peak, elapsed = measure(raw_bytes, **kwargs)
+        print(f"{label:8} retained {current / 1e6:8.1f} MB   peak {peak / 1e6:8.1f} MB   {elapsed:6.2f} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Throughput of the compiled (bitmask) relational-condition evaluator against a straightforward
+per-row version that re-reads the '05,04' element lists for every segment.
+
+Needs the spec DBs (EDI_DB_BASE_PATH, e.g. ./edi_db).
+
+Usage:
+    python scripts/bench_relational_conditions.py              # 2000 invoices x 20 line items
+    python scripts/bench_relational_conditions.py 5000 40
+"""
+
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db.transaction_sets import get_transaction_set_rule_rows
+from app.services.validate_x12 import get_validation_plan
+from core.x12.parse import parse_edi_file
+from core.x12.validate import check_relational_conditions
+from synthetic_x12 import make_synthetic_810
+
+load_dotenv()
+
+def naive_check(segment_rows, condition_rows, machine, segments, separators):
+    """Baseline: conditions kept as rows, element lists split and compared as sets per segment."""
+    by_segment_row = {}
+    for row in condition_rows:
+        by_segment_row.setdefault(row["transaction_set_segment_id"], []).append(row)
+
+    spec_rows = [row for row in segment_rows if row["segment_id"] is not None]
+
+    violations = 0
+    state = 0
+    for segment in segments:
+        state = machine.transitions[state].get(segment.segment_id, state)
+        if state == 0:
+            continue
+
+        spec_row = spec_rows[state - 1]
+        present = {
+            element_pos
+            for element_pos, _, value, components in segment.element_values(separators)
+            if value or (components is not None and any(components))
+        }
+
+        for row in by_segment_row.get(spec_row["transaction_set_segment_id"], []):
+            positions = [int(element_pos) for element_pos in row["transaction_set_segment_rc_elements"].split(",")]
+            hits = [element_pos in present for element_pos in positions]
+            condition_type = row["transaction_set_segment_rc_type"]
+
+            if condition_type == "P":
+                ok = all(hits) or not any(hits)
+            elif condition_type == "R":
+                ok = any(hits)
+            elif condition_type == "E":
+                ok = sum(hits) <= 1
+            elif condition_type == "C":
+                ok = not hits[0] or all(hits[1:])
+            else:
+                ok = not hits[0] or any(hits[1:])
+
+            violations += not ok
+
+    return violations
+
+def main():
+    transactions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    line_items = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    plan = get_validation_plan("004010", "810")
+    if plan is None:
+        print("No 004010 spec DB found; set EDI_DB_BASE_PATH")
+        sys.exit(1)
+
+    segment_rows, _, _, condition_rows = get_transaction_set_rule_rows("004010", "810")
+
+    raw_bytes = make_synthetic_810(transactions, line_items)
+    parsed = parse_edi_file(raw_bytes, lazy=True)
+    interchange = parsed["interchanges"][0]
+    all_transactions = [tx for group in interchange["groups"] for tx in group["transactions"]]
+
+    # split once so both runs measure the evaluation, not element splitting
+    for tx in all_transactions:
+        for segment in tx["segments"]:
+            segment.split_values()
+
+    segment_count = sum(len(tx["segments"]) for tx in all_transactions)
+    condition_count = sum(
+        len(plan.segments[state].conditions)
+        for tx in all_transactions
+        for state in _states(plan, tx["segments"])
+    )
+    print(f"Synthetic 810: {transactions} transactions x {line_items} line items, "
+          f"{segment_count} segments, {condition_count} condition checks")
+    print()
+
+    started = time.perf_counter()
+    violations = sum(len(check_relational_conditions(plan, tx["segments"], interchange)) for tx in all_transactions)
+    compiled = time.perf_counter() - started
+
+    started = time.perf_counter()
+    naive_violations = sum(
+        naive_check(segment_rows, condition_rows, plan.machine, tx["segments"], interchange)
+        for tx in all_transactions
+    )
+    naive = time.perf_counter() - started
+
+    print(f"{'':10} {'seconds':>8} {'segments/s':>12} {'checks/s':>12} {'violations':>10}")
+    for label, elapsed, found in (("bitmask", compiled, violations), ("per-row", naive, naive_violations)):
+        print(f"{label:10} {elapsed:8.3f} {segment_count / elapsed:12,.0f} {condition_count / elapsed:12,.0f} {found:10}")
+
+def _states(plan, segments):
+    state = 0
+    for segment in segments:
+        state = plan.machine.transitions[state].get(segment.segment_id, state)
+        if state:
+            yield state
+
+if __name__ == "__main__":
+    main()
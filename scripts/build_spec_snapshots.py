@@ -0,0 +1,49 @@
+"""
+Build the precompiled spec snapshots (SPEC_SNAPSHOT_PATH, default <EDI_DB_BASE_PATH>/snapshots)
+ahead of time, so workers never pay for the SQLite walk on first use. Snapshots that still
+match their spec DB are left alone unless --force is given.
+
+Usage:
+    python scripts/build_spec_snapshots.py                 # every x12-*.db
+    python scripts/build_spec_snapshots.py 004010 005010
+    python scripts/build_spec_snapshots.py --force
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db.conn import edi_db_exists
+from app.db.spec_snapshot import build_snapshot, list_versions, read_snapshot, write_snapshot
+
+load_dotenv()
+
+def main():
+    parser = argparse.ArgumentParser(description="Build spec snapshots from the edi_db spec DBs.")
+    parser.add_argument("versions", nargs="*", help="versions to build (default: all)")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the snapshot is up to date")
+    args = parser.parse_args()
+
+    versions = args.versions or list_versions()
+    missing = [version for version in versions if not edi_db_exists(version)]
+    if missing:
+        print(f"No spec DB for: {', '.join(missing)}")
+        sys.exit(1)
+
+    for version in versions:
+        if not args.force and read_snapshot(version) is not None:
+            print(f"{version}: up to date")
+            continue
+
+        started = time.perf_counter()
+        path = write_snapshot(version, build_snapshot(version))
+        print(f"{version}: built in {time.perf_counter() - started:.2f}s ({os.path.getsize(path) / 1024:,.0f} KiB) -> {path}")
+
+if __name__ == "__main__":
+    main()
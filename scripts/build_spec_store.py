@@ -0,0 +1,48 @@
+"""
+Merge the edi_db spec DBs into one deduplicated store (SPEC_STORE_PATH, default
+<EDI_DB_BASE_PATH>/spec_store.db). Each segment/element definition, code list and transaction
+set structure is kept once, with per-version membership. Serve from it with SPEC_BACKEND=store.
+
+Usage:
+    python scripts/build_spec_store.py                   # every x12-*.db
+    python scripts/build_spec_store.py 003050 004010 004030
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db.conn import edi_db_exists, get_edi_db_path
+from app.db.spec_snapshot import list_versions
+from app.db.spec_store import build_spec_store
+
+load_dotenv()
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the consolidated spec store.")
+    parser.add_argument("versions", nargs="*", help="versions to include (default: all)")
+    parser.add_argument("--output", default=None, help="store file (default SPEC_STORE_PATH)")
+    args = parser.parse_args()
+
+    versions = args.versions or list_versions()
+    missing = [version for version in versions if not edi_db_exists(version)]
+    if missing:
+        print(f"No spec DB for: {', '.join(missing)}")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    stats = build_spec_store(versions, args.output)
+
+    sources = sum(os.path.getsize(os.path.join(get_edi_db_path(), f"x12-{version}.db")) for version in versions)
+    print(f"{len(versions)} versions in {time.perf_counter() - started:.2f}s: "
+          f"{stats['definitions_stored']:,} definitions stored, {stats['definitions_reused']:,} reused; "
+          f"{sources / 1024 / 1024:.1f} MiB -> {stats['size'] / 1024 / 1024:.1f} MiB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Offline bulk ingest of a directory of X12 files straight into the database (no API).
+
+Usage:
+    python scripts/bulk_ingest.py /data/edi/archive
+    python scripts/bulk_ingest.py /data/edi/archive --workers 8 --pattern "*.edi"
+    python scripts/bulk_ingest.py /data/edi/archive --checkpoint archive.done   # rerun to resume
+    python scripts/bulk_ingest.py /data/edi/month-end --parallel-bytes 8000000  # split files of 8 MB+
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db.schema import create_tables
+from app.services.bulk_ingest import bulk_ingest_directory
+
+load_dotenv()
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse and ingest every X12 file under a directory.")
+    parser.add_argument("directory")
+    parser.add_argument("--workers", type=int, default=None, help="parse processes (default X12_PARSE_WORKERS or one per core)")
+    parser.add_argument("--checkpoint", default=None, help="file of completed paths; skipped on rerun")
+    parser.add_argument("--pattern", default="*", help="glob for files to pick up (default: all)")
+    parser.add_argument("--source", default="bulk ingest")
+    parser.add_argument("--duplicates", choices=("reject", "link", "force"), default=None,
+                        help="already-stored files: reject (count as failed), link (skip) or force (re-ingest)")
+    parser.add_argument("--parallel-bytes", type=int, default=None,
+                        help="split files at least this big across all workers (default X12_PARALLEL_PARSE_BYTES or 16 MB, 0 never)")
+    args = parser.parse_args()
+
+    if not Path(args.directory).is_dir():
+        print(f"Not a directory: {args.directory}")
+        sys.exit(1)
+
+    create_tables()
+
+    stats = bulk_ingest_directory(
+        args.directory,
+        workers=args.workers,
+        checkpoint_path=args.checkpoint,
+        pattern=args.pattern,
+        source=args.source,
+        duplicate_policy=args.duplicates,
+        parallel_bytes=args.parallel_bytes,
+    )
+
+    print(
+        f"Ingested {stats['files']} files ({stats['failed']} failed, {stats['duplicates']} duplicates, "
+        f"{stats['skipped']} skipped) "
+        f"in {stats['elapsed_s']:.1f}s: {stats['files_per_s']:.1f} files/s, "
+        f"{stats['segments_per_s']:.0f} segments/s"
+    )
+
+    if stats['failed']:
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Batch cross-version diff of transaction set specs. Writes one JSON line per (transaction set,
+version pair) with the summary counts (or the whole diff with --full).
+
+Needs the spec DBs (EDI_DB_BASE_PATH, e.g. ./edi_db).
+
+Usage:
+    python scripts/diff_spec_versions.py                                  # consecutive versions, every set
+    python scripts/diff_spec_versions.py 003050 004010 004030 --all-pairs
+    python scripts/diff_spec_versions.py --transaction-set 810 --transaction-set 850 --full -o diffs.ndjson
+"""
+
+import argparse
+import itertools
+import json
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db.conn import edi_db_exists
+from app.db.spec_snapshot import list_versions
+from app.db.transaction_sets import get_all_transaction_sets
+from app.services.spec_diff import SpecDiffBatch
+
+load_dotenv()
+
+def main():
+    parser = argparse.ArgumentParser(description="Diff transaction set specs between X12 versions.")
+    parser.add_argument("versions", nargs="*", help="versions to compare, oldest first (default: all)")
+    parser.add_argument("--all-pairs", action="store_true", help="every pair of versions, not just consecutive ones")
+    parser.add_argument("--transaction-set", action="append", default=None, help="only these sets (repeatable)")
+    parser.add_argument("--full", action="store_true", help="write whole diffs instead of summaries")
+    parser.add_argument("-o", "--output", default=None, help="NDJSON output file (default: stdout)")
+    args = parser.parse_args()
+
+    versions = args.versions or list_versions()
+    missing = [version for version in versions if not edi_db_exists(version)]
+    if missing:
+        print(f"No spec DB for: {', '.join(missing)}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.all_pairs:
+        pairs = list(itertools.combinations(versions, 2))
+    else:
+        pairs = list(zip(versions, versions[1:]))
+
+    sets_by_version = {
+        version: {row["transaction_set_id"] for row in get_all_transaction_sets(version)}
+        for version in versions
+    }
+    transaction_set_ids = sorted(set(args.transaction_set) if args.transaction_set else set().union(*sets_by_version.values()))
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    started = time.perf_counter()
+    diffs = 0
+
+    try:
+        # pair by pair, so the batch only holds two versions' views and code lists at a time
+        batch = SpecDiffBatch()
+        for from_version, to_version in pairs:
+            common = sets_by_version[from_version] & sets_by_version[to_version]
+
+            for transaction_set_id in transaction_set_ids:
+                if transaction_set_id not in common:
+                    continue
+
+                diff = batch.diff(from_version, to_version, transaction_set_id)
+                if not args.full:
+                    diff = {key: diff[key] for key in ("transaction_set_id", "from_version", "to_version", "summary")}
+
+                out.write(json.dumps(diff) + "\n")
+                diffs += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"{diffs} diffs ({len(transaction_set_ids)} transaction sets, {len(pairs)} version pairs) in {elapsed:.2f}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Maintenance for the edi_db spec DBs: add lookup indexes, run ANALYZE and switch them out of WAL
+so the app can open them read-only/immutable. Safe to rerun. Run while the app is stopped (or
+call POST /api/transaction-sets/cache/invalidate afterwards).
+
+Usage:
+    python scripts/index_edi_db.py                 # every x12-*.db
+    python scripts/index_edi_db.py 004010 004030
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db.conn import edi_db_exists, get_edi_db_path
+from app.db.schema import create_edi_indexes
+from app.db.spec_snapshot import list_versions
+
+load_dotenv()
+
+def main():
+    parser = argparse.ArgumentParser(description="Index the edi_db spec databases.")
+    parser.add_argument("versions", nargs="*", help="versions to index (default: all)")
+    args = parser.parse_args()
+
+    versions = args.versions or list_versions()
+    missing = [version for version in versions if not edi_db_exists(version)]
+    if missing:
+        print(f"No spec DB for: {', '.join(missing)}")
+        sys.exit(1)
+
+    for version in versions:
+        path = os.path.join(get_edi_db_path(), f"x12-{version}.db")
+        before = os.path.getsize(path)
+
+        started = time.perf_counter()
+        create_edi_indexes(version)
+
+        print(f"{version}: indexed in {time.perf_counter() - started:.2f}s "
+              f"({before / 1024:,.0f} KiB -> {os.path.getsize(path) / 1024:,.0f} KiB)")
+
+if __name__ == "__main__":
+    main()
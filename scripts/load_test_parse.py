@@ -0,0 +1,170 @@
+"""
+Load test for /api/x12/parse: measure /health latency at rest, then again while large synthetic
+810 files are uploaded in parallel. With parse/ingest off the event loop the two should match;
+exits 1 if /health p95 under load exceeds --max-p95-ms.
+
+Targets DRAFTEDI_BASE_URL with API_KEY, or starts its own uvicorn with --serve (uses the
+current .env / environment, so point DB_PATH at a scratch database).
+
+Usage:
+    python scripts/load_test_parse.py --serve
+    python scripts/load_test_parse.py --serve --uploads 8 --parallel 4 --transactions 5000
+    python scripts/load_test_parse.py --base-url http://localhost:8000
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from synthetic_x12 import make_synthetic_810
+
+load_dotenv()
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(port):
+    """uvicorn app.main:app in a subprocess; returns it once /health answers."""
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=Path(__file__).resolve().parents[1],
+    )
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline and server.poll() is None:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1).read()
+            return server
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+
+    server.terminate()
+    raise RuntimeError("server did not come up (see its output above)")
+
+def probe_health(base_url, stop, interval, samples):
+    """GET /health every interval seconds until stop is set; latencies (ms) go to samples."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        urllib.request.urlopen(f"{base_url}/health", timeout=60).read()
+        samples.append((time.perf_counter() - started) * 1000)
+        stop.wait(interval)
+
+def upload(base_url, api_key, data, results):
+    request = urllib.request.Request(
+        f"{base_url}/api/x12/parse?duplicate_policy=force",
+        data=data,
+        headers={"Content-Type": "text/plain", "x-api-key": api_key},
+        method="POST",
+    )
+
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=600) as response:
+            response.read()
+            results.append((response.status, (time.perf_counter() - started) * 1000, response.headers.get("Server-Timing")))
+    except urllib.error.HTTPError as e:
+        results.append((e.code, (time.perf_counter() - started) * 1000, e.read()[:200].decode("utf-8", errors="replace")))
+
+def summarize(label, samples):
+    ordered = sorted(samples)
+    p95 = ordered[int(len(ordered) * 0.95) - 1] if len(ordered) >= 20 else ordered[-1]
+    print(f"{label:14} n={len(ordered):5}  p50 {statistics.median(ordered):7.1f} ms  p95 {p95:7.1f} ms  max {ordered[-1]:7.1f} ms")
+    return p95
+
+def main():
+    parser = argparse.ArgumentParser(description="Check /health latency while large files are ingested.")
+    parser.add_argument("--base-url", default=os.getenv("DRAFTEDI_BASE_URL"))
+    parser.add_argument("--serve", action="store_true", help="start a local uvicorn for the test")
+    parser.add_argument("--uploads", type=int, default=4, help="files to upload (default 4)")
+    parser.add_argument("--parallel", type=int, default=2, help="uploads in flight at once (default 2)")
+    parser.add_argument("--transactions", type=int, default=1000, help="810s per file (default 1000, ~2 MB)")
+    parser.add_argument("--line-items", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.02, help="seconds between /health probes")
+    parser.add_argument("--baseline", type=float, default=3.0, help="seconds of /health probing before uploading")
+    parser.add_argument("--max-p95-ms", type=float, default=250.0, help="fail if /health p95 under load is above this")
+    args = parser.parse_args()
+
+    api_key = os.getenv("API_KEY")
+    if not api_key:
+        print("API_KEY is not set")
+        sys.exit(1)
+
+    server = None
+    base_url = args.base_url
+    if args.serve:
+        port = _free_port()
+        server = start_server(port)
+        base_url = f"http://127.0.0.1:{port}"
+    elif not base_url:
+        print("Pass --base-url, set DRAFTEDI_BASE_URL or use --serve")
+        sys.exit(1)
+
+    try:
+        data = make_synthetic_810(args.transactions, args.line_items)
+        print(f"{args.uploads} uploads of {len(data) / 1e6:.1f} MB, {args.parallel} at a time, against {base_url}")
+
+        stop = threading.Event()
+        baseline = []
+        prober = threading.Thread(target=probe_health, args=(base_url, stop, args.interval, baseline))
+        prober.start()
+        time.sleep(args.baseline)
+        stop.set()
+        prober.join()
+
+        stop = threading.Event()
+        loaded = []
+        prober = threading.Thread(target=probe_health, args=(base_url, stop, args.interval, loaded))
+        prober.start()
+
+        results = []
+        started = time.perf_counter()
+        for first in range(0, args.uploads, args.parallel):
+            uploaders = [
+                threading.Thread(target=upload, args=(base_url, api_key, data, results))
+                for _ in range(min(args.parallel, args.uploads - first))
+            ]
+            for uploader in uploaders:
+                uploader.start()
+            for uploader in uploaders:
+                uploader.join()
+        elapsed = time.perf_counter() - started
+
+        stop.set()
+        prober.join()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print()
+    for status, ms, detail in results:
+        print(f"upload  HTTP {status}  {ms:8.0f} ms  {detail}")
+    print(f"{len(results)} uploads in {elapsed:.1f}s")
+    print()
+
+    summarize("/health idle", baseline)
+    p95 = summarize("/health load", loaded)
+
+    failed = [result for result in results if result[0] != 200]
+    if failed or p95 > args.max_p95_ms:
+        print(f"FAIL: {len(failed)} failed uploads, /health p95 {p95:.1f} ms (limit {args.max_p95_ms:.0f} ms)")
+        sys.exit(1)
+
+    print("OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Synthetic X12 generator for local benchmarks.
+
+Usage:
+    python scripts/synthetic_x12.py 1000 20 > big_810.edi    # 1000 invoices, 20 line items each
+"""
+
+import sys
+
+def make_synthetic_810(transactions=1, line_items=10, interchanges=1, groups=1, version="004010"):
+    """Build an 810 batch as bytes: interchanges x groups x transactions, each with line_items IT1 loops."""
+    out = []
+
+    for ic in range(1, interchanges + 1):
+        out.append(
+            f"ISA*00*          *00*          *ZZ*SENDER         *ZZ*RECEIVER       *231117*0041*U*00401*{ic:09d}*0*T*>"
+        )
+
+        for gs in range(1, groups + 1):
+            out.append(f"GS*IN*SENDERGS*RECEIVERGS*20231117*0041*{gs}*X*{version}")
+
+            for tx in range(1, transactions + 1):
+                segments = [
+                    f"ST*810*{tx:04d}",
+                    f"BIG*20231117*INV{tx}**PO{tx}",
+                    "REF*DP*123",
+                    "N1*ST*SHIP TO*92*0001",
+                    "N3*1 MAIN ST",
+                    "N4*CITY*ST*12345",
+                    "N1*BT*BILL TO*92*0002",
+                    "ITD*01*3",
+                    "DTM*011*20231117",
+                ]
+                for item in range(1, line_items + 1):
+                    segments += [
+                        f"IT1*{item}*10*EA*1.25**UP*0123456789{item % 10}*VN*SKU{item}",
+                        f"PID*F****DESCRIPTION OF ITEM {item}",
+                        "SAC*C*D240***500",
+                    ]
+                segments += [f"TDS*{line_items * 1250}", f"CTT*{line_items}"]
+                segments.append(f"SE*{len(segments) + 1}*{tx:04d}")
+
+                out += segments
+
+            out.append(f"GE*{transactions}*{gs}")
+
+        out.append(f"IEA*{groups}*{ic:09d}")
+
+    return ("~\n".join(out) + "~\n").encode("ascii")
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    sys.stdout.buffer.write(make_synthetic_810(*args))